@@ -2,8 +2,19 @@ from flask import Flask, render_template_string, jsonify, request
 import os
 import json
 from datetime import datetime
+import sys
+
+# 共用模組位於專案根目錄
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
+from chicken_json import init_app
+import chicken_compression
 
 app = Flask(__name__)
+init_app(app)
+compression = chicken_compression.init_app(app)
 
 # 雞排價格配置
 CHICKEN_PRICES = {
@@ -396,6 +407,10 @@ def generate_report():
         "report_url": "/reports/chicken_report.xlsx"
     })
 
+# 首頁內容固定，啟動時預先壓縮
+if compression is not None:
+    compression.precompress(app, ['/'])
+
 # Vercel 需要這個作為入口點
 def handler(request):
     return app(request.environ, lambda *args: None)
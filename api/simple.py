@@ -1,6 +1,18 @@
 from flask import Flask, jsonify
+import os
+import sys
+
+# 共用模組位於專案根目錄
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
+from chicken_json import init_app
+import chicken_compression
 
 app = Flask(__name__)
+init_app(app)
+compression = chicken_compression.init_app(app)
 
 @app.route('/')
 def home():
@@ -165,6 +177,10 @@ def test():
         }
     })
 
+# 首頁內容固定，啟動時預先壓縮
+if compression is not None:
+    compression.precompress(app, ['/'])
+
 # Vercel 需要這個作為入口點
 def handler(request):
     return app(request.environ, lambda *args: None)
@@ -2,9 +2,12 @@ from flask import Flask, render_template_string, jsonify, request
 import os
 import json
 from datetime import datetime
-import requests
+from chicken_json import init_app
+import chicken_compression
 
 app = Flask(__name__)
+init_app(app)
+compression = chicken_compression.init_app(app)
 
 # 雞排價格配置
 CHICKEN_PRICES = {
@@ -397,5 +400,9 @@ def generate_report():
         "report_url": "/reports/chicken_report.xlsx"
     })
 
+# 首頁內容固定，啟動時預先壓縮
+if compression is not None:
+    compression.precompress(app, ['/'])
+
 if __name__ == '__main__':
     app.run(debug=True)
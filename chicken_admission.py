@@ -0,0 +1,382 @@
+"""
+炸雞對帳系統請求准入控制
+成本高的 API（下載整份 Google Sheet、pandas 計算、產生 Excel）以令牌桶限制
+每個用戶端與每個 API 的請求速率，超過時回應 429 與 Retry-After；
+CPU 密集的 API 另有同時執行數上限，超過時排隊等待，排隊已滿或等待逾時回應 503
+
+限制在每個程序內計算（預先 fork 的多個工作程序各自限制）
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import logging
+from flask import g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# 拒絕原因
+REJECT_CLIENT_RATE = 'client_rate'
+REJECT_ENDPOINT_RATE = 'endpoint_rate'
+REJECT_QUEUE_FULL = 'queue_full'
+REJECT_QUEUE_TIMEOUT = 'queue_timeout'
+
+class AdmissionRejected(Exception):
+    """請求未獲准執行"""
+
+    def __init__(self, reason: str, status: int, retry_after: float, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After 標頭值（整數秒，至少 1 秒）"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+class TokenBucket:
+    """令牌桶：每秒補充 rate 個令牌，最多累積 burst 個"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        取得一個令牌需要等待的秒數（0 表示目前就有令牌）
+
+        Args:
+            now (float): 目前時間（單調時鐘）
+
+        Returns:
+            float: 等待秒數
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self):
+        """取走一個令牌（須先以 wait_time 確認有令牌）"""
+        self.tokens -= 1
+
+class ChickenAdmissionController:
+    """請求准入控制類別"""
+
+    def __init__(self, endpoints: Dict[str, Dict], max_concurrent: int = 2, max_queue: int = 8,
+                 queue_timeout_seconds: float = 15, max_tracked_clients: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化准入控制
+
+        Args:
+            endpoints (Dict[str, Dict]): 受限制的 API 路由規則與設定，每項包含
+                CLIENT_RATE / CLIENT_BURST（每個用戶端每秒請求數與可累積的請求數）、
+                RATE / BURST（所有用戶端合計）、HEAVY（是否計入同時執行數上限）
+            max_concurrent (int): CPU 密集 API 的同時執行數上限
+            max_queue (int): 等待執行的請求數上限
+            queue_timeout_seconds (float): 排隊等待的最長時間（秒）
+            max_tracked_clients (int): 保留的用戶端令牌桶數量上限（超過時移除最久未使用的）
+            clock (Callable[[], float]): 令牌桶使用的時鐘（單調時鐘，測試時可替換）；
+                排隊等待以實際經過的時間計算，不受此時鐘影響
+        """
+        self.endpoints = endpoints
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_tracked_clients = max_tracked_clients
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._client_buckets = OrderedDict()
+        self._endpoint_buckets = {}
+        self._in_flight = 0
+        self._queued = 0
+        # 統計
+        self._admitted = {}
+        self._rejected = {}
+        self._queued_total = 0
+        self._queue_wait_total = 0.0
+        self._service_seconds = None
+
+    def limits(self, endpoint: str) -> Optional[Dict]:
+        """取得 API 的限制設定，不受限制時回傳 None"""
+        return self.endpoints.get(endpoint)
+
+    # 速率限制
+
+    def check_rate(self, client: str, endpoint: str):
+        """
+        檢查並扣除用戶端與 API 的令牌（兩者都有令牌時才扣除）
+
+        Args:
+            client (str): 用戶端識別（IP 位址）
+            endpoint (str): API 路由規則
+
+        Raises:
+            AdmissionRejected: 超過速率限制（429）
+        """
+        settings = self.endpoints[endpoint]
+        with self._lock:
+            now = self.clock()
+            key = (client, endpoint)
+            client_bucket = self._client_buckets.get(key)
+            if client_bucket is None:
+                client_bucket = TokenBucket(settings['CLIENT_RATE'], settings['CLIENT_BURST'], now)
+                self._client_buckets[key] = client_bucket
+                while len(self._client_buckets) > self.max_tracked_clients:
+                    self._client_buckets.popitem(last=False)
+            else:
+                self._client_buckets.move_to_end(key)
+            endpoint_bucket = self._endpoint_buckets.get(endpoint)
+            if endpoint_bucket is None:
+                endpoint_bucket = TokenBucket(settings['RATE'], settings['BURST'], now)
+                self._endpoint_buckets[endpoint] = endpoint_bucket
+
+            client_wait = client_bucket.wait_time(now)
+            if client_wait > 0:
+                self._count_rejected(endpoint, REJECT_CLIENT_RATE)
+                raise AdmissionRejected(REJECT_CLIENT_RATE, 429, client_wait, "請求過於頻繁，請稍後再試")
+            endpoint_wait = endpoint_bucket.wait_time(now)
+            if endpoint_wait > 0:
+                self._count_rejected(endpoint, REJECT_ENDPOINT_RATE)
+                raise AdmissionRejected(REJECT_ENDPOINT_RATE, 429, endpoint_wait, "系統忙碌中，請稍後再試")
+            client_bucket.take()
+            endpoint_bucket.take()
+
+    # 同時執行數
+
+    def acquire(self, endpoint: str) -> float:
+        """
+        取得 CPU 密集 API 的執行名額，額滿時依序排隊等待
+
+        Args:
+            endpoint (str): API 路由規則
+
+        Returns:
+            float: 排隊等待的秒數
+
+        Raises:
+            AdmissionRejected: 排隊已滿或等待逾時（503）
+        """
+        with self._lock:
+            if self._in_flight < self.max_concurrent and self._queued == 0:
+                self._in_flight += 1
+                return 0.0
+            if self._queued >= self.max_queue:
+                self._count_rejected(endpoint, REJECT_QUEUE_FULL)
+                raise AdmissionRejected(REJECT_QUEUE_FULL, 503, self._estimated_wait(),
+                                        "系統忙碌中，等待處理的請求已滿，請稍後再試")
+            # Condition.wait 以實際時間等待，逾時也以實際時間計算
+            started = time.monotonic()
+            deadline = started + self.queue_timeout_seconds
+            self._queued += 1
+            self._queued_total += 1
+            try:
+                while self._in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count_rejected(endpoint, REJECT_QUEUE_TIMEOUT)
+                        raise AdmissionRejected(REJECT_QUEUE_TIMEOUT, 503, self._estimated_wait(),
+                                                "系統忙碌中，等待逾時，請稍後再試")
+                    self._slot_freed.wait(remaining)
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+            waited = time.monotonic() - started
+            self._queue_wait_total += waited
+            return waited
+
+    def release(self, service_seconds: float = None):
+        """
+        釋放執行名額
+
+        Args:
+            service_seconds (float): 請求的執行時間（秒），用於估計 Retry-After
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if service_seconds is not None:
+                # 指數移動平均
+                self._service_seconds = (service_seconds if self._service_seconds is None
+                                         else 0.8 * self._service_seconds + 0.2 * service_seconds)
+            self._slot_freed.notify()
+
+    def _estimated_wait(self) -> float:
+        """依平均執行時間估計排隊中的請求處理完畢所需秒數"""
+        service_seconds = self._service_seconds or 1.0
+        return service_seconds * (self._queued + 1) / self.max_concurrent
+
+    # 准入
+
+    def admit(self, client: str, endpoint: str, limit_concurrency: bool = True) -> bool:
+        """
+        檢查速率限制並取得執行名額
+
+        Args:
+            client (str): 用戶端識別
+            endpoint (str): API 路由規則
+            limit_concurrency (bool): 是否計入同時執行數上限（ASGI 以執行緒池上限控制時為 False）
+
+        Returns:
+            bool: 是否取得執行名額（是時須在請求結束後呼叫 release）
+
+        Raises:
+            AdmissionRejected: 未獲准執行
+        """
+        self.check_rate(client, endpoint)
+        heavy = limit_concurrency and bool(self.endpoints[endpoint].get('HEAVY'))
+        if heavy:
+            self.acquire(endpoint)
+        with self._lock:
+            self._admitted[endpoint] = self._admitted.get(endpoint, 0) + 1
+        return heavy
+
+    def _count_rejected(self, endpoint: str, reason: str):
+        """記錄拒絕次數（呼叫端須持有鎖）"""
+        counts = self._rejected.setdefault(endpoint, {})
+        counts[reason] = counts.get(reason, 0) + 1
+
+    def metrics(self) -> Dict:
+        """
+        取得准入統計
+
+        Returns:
+            Dict: 目前執行中與排隊中的請求數、各 API 的准入與拒絕次數、平均排隊時間等
+        """
+        with self._lock:
+            admitted_total = sum(self._admitted.values())
+            rejected = {}
+            for counts in self._rejected.values():
+                for reason, count in counts.items():
+                    rejected[reason] = rejected.get(reason, 0) + count
+            return {
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': admitted_total,
+                'rejected': rejected,
+                'queued_total': self._queued_total,
+                'avg_queue_wait_ms': (round(self._queue_wait_total / self._queued_total * 1000, 1)
+                                      if self._queued_total else 0),
+                'avg_service_seconds': (round(self._service_seconds, 3)
+                                        if self._service_seconds is not None else None),
+                'tracked_clients': len(self._client_buckets),
+                'endpoints': {
+                    endpoint: {'admitted': self._admitted.get(endpoint, 0),
+                               'rejected': dict(self._rejected.get(endpoint, {}))}
+                    for endpoint in self.endpoints
+                }
+            }
+
+class ChickenAdmission:
+    """Flask 請求准入處理類別"""
+
+    def __init__(self, controller: ChickenAdmissionController, app=None, trust_proxy: bool = False):
+        """
+        初始化請求准入處理
+
+        Args:
+            controller (ChickenAdmissionController): 准入控制
+            app (Flask): Flask 應用程式，None 表示稍後以 init_app 設定
+            trust_proxy (bool): 是否以 X-Forwarded-For 判斷用戶端（部署在反向代理之後時使用）
+        """
+        self.controller = controller
+        self.trust_proxy = trust_proxy
+        # 暫停限制（效能測試時使用）
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        在 Flask 應用程式註冊准入處理
+
+        Args:
+            app (Flask): Flask 應用程式
+        """
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+        app.extensions['chicken_admission'] = self
+
+    def client_key(self, remote_addr: Optional[str], forwarded_for: Optional[str] = None) -> str:
+        """
+        取得用戶端識別
+
+        Args:
+            remote_addr (Optional[str]): 連線的 IP 位址
+            forwarded_for (Optional[str]): X-Forwarded-For 標頭
+
+        Returns:
+            str: 用戶端識別
+        """
+        if self.trust_proxy and forwarded_for:
+            return forwarded_for.split(',')[0].strip()
+        return remote_addr or 'unknown'
+
+    def before_request(self):
+        """before_request 處理：受限制的 API 檢查速率並取得執行名額，未獲准時直接回應"""
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        if not self.enabled or rule is None or self.controller.limits(rule) is None:
+            return None
+        client = self.client_key(request.remote_addr, request.headers.get('X-Forwarded-For'))
+        try:
+            heavy = self.controller.admit(client, rule)
+        except AdmissionRejected as rejected:
+            logger.warning(f"拒絕 {client} 的 {rule} 請求: {rejected.reason}")
+            return rejection_response(rejected)
+        if heavy:
+            g.chicken_admission_started = time.perf_counter()
+        return None
+
+    def teardown_request(self, error=None):
+        """teardown_request 處理：釋放執行名額"""
+        started = g.pop('chicken_admission_started', None)
+        if started is not None:
+            self.controller.release(time.perf_counter() - started)
+
+def rejection_response(rejected: AdmissionRejected):
+    """
+    未獲准執行的回應
+
+    Args:
+        rejected (AdmissionRejected): 拒絕原因
+
+    Returns:
+        tuple: Flask 回應
+    """
+    return (jsonify({'success': False, 'error': str(rejected), 'reason': rejected.reason}),
+            rejected.status, {'Retry-After': rejected.retry_after_header})
+
+def init_app(app, config: dict = None) -> Optional[ChickenAdmission]:
+    """
+    依設定為 Flask 應用程式啟用請求准入控制
+
+    Args:
+        app (Flask): Flask 應用程式
+        config (dict): 准入設定，None 表示使用 ADMISSION_CONFIG
+
+    Returns:
+        Optional[ChickenAdmission]: 准入處理物件，設定停用時回傳 None
+    """
+    if config is None:
+        from chicken_config import ADMISSION_CONFIG
+        config = ADMISSION_CONFIG
+    if not config['ENABLED']:
+        return None
+    controller = ChickenAdmissionController(
+        config['ENDPOINTS'],
+        max_concurrent=config['MAX_CONCURRENT'],
+        max_queue=config['MAX_QUEUE'],
+        queue_timeout_seconds=config['QUEUE_TIMEOUT_SECONDS'],
+        max_tracked_clients=config['MAX_TRACKED_CLIENTS']
+    )
+    return ChickenAdmission(controller, app, trust_proxy=config['TRUST_PROXY'])
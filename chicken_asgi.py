@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+炸雞對帳系統 ASGI 網頁服務
+與 simple_chicken_web 相同的路由與 JSON 格式，以 asyncio 處理請求：
+等待 Google Sheet 下載時不佔用工作執行緒，pandas 計算在有上限的執行緒池中進行。
+資料查詢路由（real_data、test_data、sales_details、current_prices）與即時更新（live_updates）
+以非同步方式處理，
+其他路由（報告生成、下載、價格更新等）轉交原本的 Flask 應用程式。
+
+啟動方式: uvicorn chicken_asgi:app --port 8083（或 python chicken_asgi.py）
+"""
+import asyncio
+import functools
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+import logging
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from chicken_config import ASGI_CONFIG, DETAIL_API_CONFIG, LIVE_UPDATES_CONFIG
+from chicken_json import FRAME_SHAPES, SHAPE_RECORDS, dumps
+from chicken_response_cache import response_fingerprint
+from chicken_sales_details import CursorError, fetch_page, stream_ndjson
+from chicken_live_updates import LiveUpdatesBusyError, keepalive
+from chicken_admission import AdmissionRejected
+from chicken_timing import span, timer
+import simple_chicken_web as web
+
+logger = logging.getLogger(__name__)
+
+class ChickenASGIApp:
+    """炸雞對帳系統 ASGI 應用程式類別"""
+
+    def __init__(self, wsgi_app, max_workers: int = 4):
+        """
+        初始化 ASGI 應用程式
+
+        Args:
+            wsgi_app (Flask): 處理其他路由的 Flask 應用程式
+            max_workers (int): pandas 計算與 Flask 路由使用的執行緒數上限
+        """
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgi-worker')
+        self.routes = {
+            '/api/real_data': self.real_data,
+            '/api/test_data': self.test_data,
+            '/api/sales_details': self.sales_details,
+            '/api/current_prices': self.current_prices,
+            '/api/live_updates': self.live_updates
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get(scope['path']) if scope['method'] in ('GET', 'HEAD') else None
+        if handler is None:
+            await self._call_wsgi(scope, receive, send)
+            return
+        request = _Request(scope, receive)
+        if not await self._admit(scope, request, send):
+            return
+        # 請求期間與其他協程交錯執行，只記錄經過時間；
+        # 轉交 Flask 的路由由 Flask 的請求計時記錄
+        started_at, started = time.time(), time.perf_counter()
+        error = False
+        try:
+            await handler(request, send)
+        except Exception as handler_error:
+            error = True
+            logger.error(f"處理 {scope['path']} 時發生錯誤: {handler_error}")
+            await self._send_json(request, send, {'success': False, 'error': str(handler_error)})
+        finally:
+            timer.record(f"asgi {scope['method']} {scope['path']}", started_at,
+                         (time.perf_counter() - started) * 1000, error=error)
+
+    async def _lifespan(self, receive, send):
+        """處理 ASGI lifespan 事件"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.run(web.sync_report_store)
+                web.start_background_refresh()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                web.data_service.stop_refresher()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _admit(self, scope, request, send) -> bool:
+        """
+        檢查請求速率限制（與 Flask 相同的令牌桶）；同時執行數已由執行緒池上限控制，
+        轉交 Flask 的路由則由 Flask 的准入處理排隊
+
+        Returns:
+            bool: 是否准許執行（否時已送出 429 回應）
+        """
+        admission = web.admission
+        if admission is None or not admission.enabled or admission.controller.limits(scope['path']) is None:
+            return True
+        client = admission.client_key((scope.get('client') or ('', 0))[0], request.headers.get('x-forwarded-for'))
+        try:
+            admission.controller.admit(client, scope['path'], limit_concurrency=False)
+        except AdmissionRejected as rejected:
+            logger.warning(f"拒絕 {client} 的 {scope['path']} 請求: {rejected.reason}")
+            body = dumps({'success': False, 'error': str(rejected), 'reason': rejected.reason})
+            await self._send(request, send, rejected.status, body, [
+                (b'content-type', b'application/json'),
+                (b'retry-after', rejected.retry_after_header.encode('latin-1'))
+            ])
+            return False
+        return True
+
+    async def run(self, func, *args, **kwargs):
+        """在有上限的執行緒池中執行同步函式（pandas 計算、JSON 編碼）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def response_entry(self, fingerprint: str, build_payload) -> Dict:
+        """
+        取得快取的回應，沒有時在執行緒池中產生並序列化（與 json_response_entry 相同，
+        相同指紋的並行請求只產生一次）
+        """
+        def encode():
+            payload = build_payload()
+            with span('json.encode'):
+                return dumps(payload)
+
+        async def build():
+            return await self.run(encode)
+
+        if web.response_cache is None:
+            return {'body': await build(), 'etag': fingerprint}
+        return await web.response_cache.get_or_build_async(fingerprint, build)
+
+    # 資料查詢路由
+
+    async def real_data(self, request, send):
+        """取得真實 Google Sheet 資料（與 /api/real_data 相同）"""
+        start_date, end_date, date_range = request.date_range()
+        shape = request.frame_shape()
+        # 下載與轉換由資料服務在背景執行緒進行，並行的請求共用同一次下載
+        df, data_version = await web.data_service.get_sales_view_async()
+        fingerprint = response_fingerprint('real_data', data_version, shape, *date_range)
+        # 共用資料表不可修改，計算前複製
+        entry = await self.response_entry(
+            fingerprint, lambda: web.build_real_data_payload(df.copy(), start_date, end_date, shape)
+        )
+        await self._send_cached(request, send, entry, web.data_freshness_headers())
+
+    async def test_data(self, request, send):
+        """取得測試資料（與 /api/test_data 相同）"""
+        start_date, end_date, date_range = request.date_range()
+        shape = request.frame_shape()
+        fingerprint = response_fingerprint('test_data', _today(), shape, *date_range)
+        entry = await self.response_entry(
+            fingerprint, lambda: web.build_test_data_payload(start_date, end_date, shape)
+        )
+        await self._send_cached(request, send, entry)
+
+    async def sales_details(self, request, send):
+        """取得銷售明細（與 /api/sales_details 相同，format=ndjson 時逐段串流）"""
+        try:
+            start_date = request.arg('start_date')
+            end_date = request.arg('end_date')
+            items = request.args.get('item') or None
+            cursor = request.arg('cursor')
+            output_format = request.arg('format') or 'json'
+            if output_format not in ('json', 'ndjson'):
+                raise ValueError(f"不支援的輸出格式: {output_format}")
+            limit = request.arg('limit')
+            limit = int(limit) if limit else None
+            if limit is not None and limit <= 0:
+                raise ValueError("limit 必須大於 0")
+
+            df, data_version = await web.data_service.get_sales_view_async()
+            if output_format == 'ndjson':
+                chunks = await self.run(stream_ndjson, df, data_version, start_date, end_date, items, cursor,
+                                        limit, chunk_rows=DETAIL_API_CONFIG['CHUNK_ROWS'])
+                await self._send_stream(request, send, chunks, 'application/x-ndjson',
+                                        [(b'x-data-version', data_version.encode('latin-1'))])
+                return
+
+            limit = min(limit or DETAIL_API_CONFIG['DEFAULT_LIMIT'], DETAIL_API_CONFIG['MAX_LIMIT'])
+            page = await self.run(fetch_page, df, data_version, start_date, end_date, items, limit, cursor,
+                                  chunk_rows=DETAIL_API_CONFIG['CHUNK_ROWS'])
+            await self._send_json(request, send, {'success': True, 'version': data_version, **page})
+        except CursorError as error:
+            await self._send_json(request, send, {'success': False, 'error': str(error)}, status=409)
+        except ValueError as error:
+            await self._send_json(request, send, {'success': False, 'error': str(error)}, status=400)
+
+    async def current_prices(self, request, send):
+        """取得目前價格設定（與 /api/current_prices 相同）"""
+        snapshot = await self.run(web.data_service.get_price_snapshot)
+        await self._send_json(request, send, {'success': True, 'prices': snapshot.prices,
+                                              'price_version': snapshot.digest,
+                                              'cache': web.data_service.cache_info()})
+
+    async def live_updates(self, request, send):
+        """
+        即時更新（與 /api/live_updates 相同）；以 asyncio 等待資料版本變更，連線不佔用工作執行緒，
+        事件內容很小，不壓縮
+        """
+        live = web.live_updates
+        if live is None:
+            await self._send_json(request, send, {'success': False, 'error': '即時更新未啟用'}, status=404)
+            return
+        try:
+            session = await self.run(live.open_session, request.arg('start_date'), request.arg('end_date'))
+        except LiveUpdatesBusyError as error:
+            body = dumps({'success': False, 'error': str(error)})
+            await self._send(request, send, 503, body, [(b'content-type', b'application/json'),
+                                                        (b'retry-after', b'30')])
+            return
+        except ValueError as error:
+            await self._send_json(request, send, {'success': False, 'error': str(error)}, status=400)
+            return
+
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')
+            ]})
+            if request.method == 'HEAD':
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            disconnected = asyncio.Event()
+            watcher = asyncio.ensure_future(_watch_disconnect(request.receive, disconnected))
+            try:
+                await self._live_events(session, request.headers.get('last-event-id'), send, disconnected)
+            finally:
+                watcher.cancel()
+            if not disconnected.is_set():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            session.close()
+
+    async def _live_events(self, session, last_event_id: Optional[str], send, disconnected: asyncio.Event):
+        """送出即時更新事件，直到用戶端中斷或超過單一連線最長時間"""
+        live = web.live_updates
+        data_service = web.data_service
+        poll_seconds = LIVE_UPDATES_CONFIG['POLL_SECONDS']
+        loop = asyncio.get_running_loop()
+        await send({'type': 'http.response.body', 'body': session.head(last_event_id), 'more_body': True})
+        deadline = loop.time() + live.max_stream_seconds
+        while loop.time() < deadline:
+            # 資料版本只在記憶體中比較，等待期間不佔用執行緒
+            heartbeat_at = loop.time() + live.heartbeat_seconds
+            while data_service.current_version() == session.version and loop.time() < heartbeat_at:
+                try:
+                    await asyncio.wait_for(disconnected.wait(), poll_seconds)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            if data_service.current_version() == session.version:
+                # 沒有背景更新時由此觸發到期資料的重新下載（與其他請求共用同一次下載）
+                try:
+                    await data_service.get_sales_view_async()
+                except Exception as error:
+                    logger.warning(f"即時更新讀取銷售資料失敗: {error}")
+                if data_service.current_version() == session.version:
+                    await send({'type': 'http.response.body', 'body': keepalive(), 'more_body': True})
+                    continue
+            event = await self.run(session.update)
+            if event is not None:
+                await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+
+    # 回應
+
+    def _encode(self, request, body: bytes, mimetype: str) -> Tuple[bytes, List[Tuple[bytes, bytes]]]:
+        """依 Accept-Encoding 壓縮回應內容（與 Flask 的壓縮設定相同）"""
+        headers = []
+        compression = web.compression
+        if compression is None or mimetype not in compression.mimetypes:
+            return body, headers
+        headers.append((b'vary', b'Accept-Encoding'))
+        encoding = compression.negotiated_encoding(mimetype, request.accept_encodings)
+        if encoding is None or len(body) < compression.min_size:
+            return body, headers
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+        return compression.compress(body, encoding), headers
+
+    async def _send(self, request, send, status: int, body: bytes, headers: List[Tuple[bytes, bytes]]):
+        headers = headers + [(b'content-length', str(len(body)).encode('latin-1'))]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if request.method == 'HEAD' else body})
+
+    async def _send_json(self, request, send, payload: Dict, status: int = 200):
+        body, headers = self._encode(request, dumps(payload), 'application/json')
+        await self._send(request, send, status, body, [(b'content-type', b'application/json')] + headers)
+
+    async def _send_cached(self, request, send, entry: Dict, extra_headers: Dict = None):
+        """以回應快取項目回應，If-None-Match 符合時回應 304（與 cached_json_response 相同）"""
+        cache_control = f"private, max-age={web.RESPONSE_CACHE_CONFIG['MAX_AGE_SECONDS']}, must-revalidate"
+        headers = [(b'cache-control', cache_control.encode('latin-1'))]
+        headers += [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                    for key, value in (extra_headers or {}).items()]
+        # 協商出壓縮方式時 200 與 304 回應都帶弱 ETag
+        compression = web.compression
+        weak = compression is not None and \
+            compression.negotiated_encoding('application/json', request.accept_encodings) is not None
+        if request.if_none_match.contains_weak(entry['etag']):
+            if compression is not None:
+                headers.append((b'vary', b'Accept-Encoding'))
+            headers.append((b'etag', quote_etag(entry['etag'], weak=weak).encode('latin-1')))
+            await self._send(request, send, 304, b'', headers)
+            return
+        body, encoding_headers = self._encode(request, entry['body'], 'application/json')
+        headers.append((b'etag', quote_etag(entry['etag'], weak=weak).encode('latin-1')))
+        await self._send(request, send, 200, body, [(b'content-type', b'application/json')] + headers + encoding_headers)
+
+    async def _send_stream(self, request, send, chunks: Iterator[bytes], mimetype: str,
+                           headers: List[Tuple[bytes, bytes]]):
+        """逐段送出串流回應（每段在執行緒池中產生，不阻塞事件迴圈）"""
+        headers = [(b'content-type', mimetype.encode('latin-1'))] + headers
+        compression = web.compression
+        if compression is not None and mimetype in compression.mimetypes:
+            headers.append((b'vary', b'Accept-Encoding'))
+            encoding = compression.choose_encoding(request.accept_encodings)
+            if encoding is not None:
+                chunks = compression.compress_stream(chunks, encoding)
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        try:
+            while True:
+                chunk = await self.run(next, chunks, None)
+                if chunk is None:
+                    break
+                if request.method != 'HEAD':
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        await send({'type': 'http.response.body', 'body': b''})
+
+    # 轉交 Flask
+
+    async def _call_wsgi(self, scope, receive, send):
+        """將請求轉交 Flask 應用程式，在執行緒池中執行"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        status, headers, content = await self.run(self._run_wsgi, scope, bytes(body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    def _run_wsgi(self, scope, body: bytes):
+        """執行 WSGI 應用程式並收集完整回應"""
+        environ = _wsgi_environ(scope, body)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for key, value in headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+        return response['status'], response['headers'], content
+
+async def _watch_disconnect(receive, disconnected: asyncio.Event):
+    """等待用戶端中斷連線"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+def _today() -> str:
+    """今天日期（沒有日期參數時的預設期間與測試資料依今天日期而不同）"""
+    return datetime.now().date().isoformat()
+
+def _wsgi_environ(scope, body: bytes) -> Dict:
+    """由 ASGI scope 建立 WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        elif f'HTTP_{name}' in environ:
+            environ[f'HTTP_{name}'] += f',{value}'
+        else:
+            environ[f'HTTP_{name}'] = value
+    environ.setdefault('CONTENT_LENGTH', str(len(body)))
+    return environ
+
+class _Request:
+    """ASGI 請求的查詢參數與標頭"""
+
+    def __init__(self, scope, receive=None):
+        self.method = scope['method']
+        self.receive = receive
+        self.args = parse_qs(scope['query_string'].decode('utf-8'), keep_blank_values=True)
+        headers = {}
+        for key, value in scope['headers']:
+            name = key.decode('latin-1').lower()
+            headers[name] = f"{headers[name]},{value.decode('latin-1')}" if name in headers else value.decode('latin-1')
+        self.headers = headers
+        self.accept_encodings = parse_accept_header(headers.get('accept-encoding'))
+        self.if_none_match = parse_etags(headers.get('if-none-match'))
+
+    def arg(self, name: str) -> Optional[str]:
+        """取得查詢參數（空字串視為未提供）"""
+        values = self.args.get(name)
+        return values[0] if values and values[0] else None
+
+    def date_range(self):
+        """與 simple_chicken_web.request_date_range 相同"""
+        start_date = self.arg('start_date')
+        end_date = self.arg('end_date')
+        if start_date and end_date:
+            return start_date, end_date, (start_date, end_date)
+        return start_date, end_date, ('recent', _today())
+
+    def frame_shape(self) -> str:
+        """與 simple_chicken_web.request_frame_shape 相同"""
+        shape = self.arg('shape') or SHAPE_RECORDS
+        if shape not in FRAME_SHAPES:
+            raise ValueError(f"不支援的資料輸出形式: {shape}")
+        return shape
+
+app = ChickenASGIApp(web.app, max_workers=ASGI_CONFIG['EXECUTOR_WORKERS'])
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ 需要安裝 ASGI 伺服器: pip install uvicorn")
+        print("   或使用: hypercorn chicken_asgi:app")
+        sys.exit(1)
+    print(f"🍗 啟動炸雞對帳系統 ASGI 服務: http://localhost:{ASGI_CONFIG['PORT']}")
+    uvicorn.run(app, host=ASGI_CONFIG['HOST'], port=ASGI_CONFIG['PORT'])
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+炸雞對帳系統效能測試工具
+使用模擬資料量測報告生成等流程的耗時
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import pandas as pd
+from chicken_settlement_calculator import ChickenSettlementCalculator
+from chicken_report_generator import ChickenReportGenerator
+from chicken_report_exporters import REPORT_FORMATS
+from chicken_report_orchestrator import ChickenReportOrchestrator, EXECUTOR_PROCESS, EXECUTOR_THREAD
+from chicken_config import CHICKEN_PRODUCTS_CONFIG, REPORT_PROFILES
+import chicken_json
+
+def create_benchmark_sales_data(days: int = 14, start_date: datetime = datetime(2025, 4, 29)) -> pd.DataFrame:
+    """
+    建立模擬的炸雞銷售資料（每天每個品項一筆）
+
+    Args:
+        days (int): 天數
+        start_date (datetime): 開始日期
+
+    Returns:
+        pd.DataFrame: 銷售資料
+    """
+    items = list(CHICKEN_PRODUCTS_CONFIG.keys())
+    rows = []
+    for day in range(days):
+        date = start_date + timedelta(days=day)
+        for index, item in enumerate(items):
+            rows.append({'日期': date, '品項': item, '數量': (day + index) % 9 + 1})
+    return pd.DataFrame(rows)
+
+def create_benchmark_report(days: int = 14, start_date: datetime = datetime(2025, 4, 29)) -> dict:
+    """
+    建立模擬的炸雞對帳報告
+
+    Args:
+        days (int): 天數
+        start_date (datetime): 開始日期
+
+    Returns:
+        dict: 炸雞對帳報告資料
+    """
+    calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG)
+    df = create_benchmark_sales_data(days, start_date)
+    end_date = start_date + timedelta(days=days - 1)
+    return calculator.generate_chicken_settlement_report(df, start_date, end_date)
+
+def benchmark_formats(days: int, repeat: int):
+    """比較各報告格式的生成時間與檔案大小"""
+    report = create_benchmark_report(days)
+    print(f"📊 報告格式效能比較（{days} 天，{len(report['詳細資料'])} 筆明細，重複 {repeat} 次）")
+    print("-" * 60)
+    print(f"{'格式':<10}{'平均時間 (ms)':>16}{'檔案大小 (KB)':>18}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = ChickenReportGenerator(output_dir, use_cache=False)
+        for report_format in REPORT_FORMATS:
+            try:
+                elapsed = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    filepath = generator.generate_report(report, report_format)
+                    elapsed.append(time.perf_counter() - start)
+            except ImportError as error:
+                print(f"{report_format:<10}略過：{error}")
+                continue
+            size_kb = os.path.getsize(filepath) / 1024
+            average_ms = sum(elapsed) / len(elapsed) * 1000
+            print(f"{report_format:<10}{average_ms:>16.1f}{size_kb:>18.1f}")
+
+def benchmark_excel_template(days: int, repeat: int):
+    """比較 openpyxl 逐一建立與預先編譯樣板的 Excel 生成時間"""
+    report = create_benchmark_report(days)
+    print(f"📊 Excel 生成方式比較（{days} 天，{len(report['詳細資料'])} 筆明細，重複 {repeat} 次）")
+    print("-" * 60)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for label, use_template in (('openpyxl', False), ('樣板', True)):
+            generator = ChickenReportGenerator(output_dir, use_cache=False, use_template=use_template)
+            # 第一次生成包含樣板編譯時間，不列入平均
+            generator.generate_excel_report(report)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                generator.generate_excel_report(report)
+            average_ms = (time.perf_counter() - start) / repeat * 1000
+            print(f"{label:<10}{average_ms:>16.1f} ms")
+
+def benchmark_batch(periods: int, days: int, workers: int):
+    """量測多期間批次生成 Excel 報告的吞吐量（每秒報告數）"""
+    start_date = datetime(2025, 1, 1)
+    reports = [create_benchmark_report(days, start_date + timedelta(days=days * i)) for i in range(periods)]
+    print(f"📊 多期間批次生成（{periods} 個期間，每期 {days} 天）")
+    print("-" * 60)
+    print(f"{'方式':<16}{'總時間 (s)':>14}{'報告/秒':>14}")
+
+    modes = [
+        ('逐一生成', {'max_workers': 1}),
+        (f'程序池 x{workers or os.cpu_count()}', {'max_workers': workers}),
+        ('單一工作簿', {'combine': True})
+    ]
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = ChickenReportGenerator(output_dir, use_cache=False)
+        for label, options in modes:
+            start = time.perf_counter()
+            generator.generate_batch_excel_reports(reports, **options)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<16}{elapsed:>14.2f}{periods / elapsed:>14.1f}")
+
+def benchmark_fan_out(days: int, formats: list):
+    """比較依序生成與平行生成多種格式報告的總耗時"""
+    report = create_benchmark_report(days)
+    print(f"📊 多格式報告生成（{days} 天，格式: {', '.join(formats)}，CPU {os.cpu_count()} 核）")
+    print("-" * 60)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = ChickenReportGenerator(output_dir, use_cache=False)
+        # 先編譯 Excel 樣板，避免計入第一次的編譯時間
+        generator.generate_excel_report(report)
+
+        start = time.perf_counter()
+        timings = {}
+        for report_format in formats:
+            format_start = time.perf_counter()
+            generator.generate_report(report, report_format)
+            timings[report_format] = time.perf_counter() - format_start
+        serial = time.perf_counter() - start
+        print(f"{'依序生成':<14}{serial * 1000:>10.1f} ms  " +
+              ', '.join(f"{fmt} {elapsed * 1000:.1f}" for fmt, elapsed in timings.items()))
+
+        for label, executor in (('執行緒池', EXECUTOR_THREAD), ('程序池', EXECUTOR_PROCESS)):
+            orchestrator = ChickenReportOrchestrator(generator, executor=executor)
+            # 先生成一次建立池，只計算沿用池時的耗時
+            orchestrator.generate(report, formats)
+            result = orchestrator.generate(report, formats)
+            orchestrator.shutdown()
+            print(f"{label:<14}{result['elapsed'] * 1000:>10.1f} ms  " +
+                  ', '.join(f"{fmt} {elapsed * 1000:.1f}" for fmt, elapsed in result['timings'].items()))
+
+def benchmark_profiles(days: int, repeat: int):
+    """比較各報告設定檔的 Excel 生成時間與檔案大小（含詳細資料附件）"""
+    report = create_benchmark_report(days)
+    print(f"📊 報告設定檔比較（{days} 天，{len(report['詳細資料'])} 筆明細，重複 {repeat} 次）")
+    print("-" * 60)
+    print(f"{'設定檔':<12}{'生成方式':<10}{'平均時間 (ms)':>14}{'檔案大小 (KB)':>16}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for use_template in (False, True):
+            generator = ChickenReportGenerator(output_dir, use_cache=False, use_store=False,
+                                               use_template=use_template)
+            for profile, options in REPORT_PROFILES.items():
+                # 第一次生成包含樣板編譯時間，不列入平均
+                generator.generate_excel_report(report, profile=profile)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    filepaths = [generator.generate_excel_report(report, profile=profile)]
+                    if options['DETAIL_ATTACHMENT']:
+                        filepaths.append(generator.generate_report(report, 'detail_csv'))
+                average_ms = (time.perf_counter() - start) / repeat * 1000
+                size_kb = sum(os.path.getsize(filepath) for filepath in filepaths) / 1024
+                label = '樣板' if use_template else 'openpyxl'
+                print(f"{profile:<12}{label:<10}{average_ms:>14.1f}{size_kb:>16.1f}")
+
+def benchmark_json(days: int, repeat: int):
+    """比較舊的字串轉換與逐欄 JSON 序列化，每個 API 回應的序列化耗時與大小"""
+    report = create_benchmark_report(days)
+    frames = {name: report[name] for name in ('每日摘要', '品項摘要', '詳細資料')}
+    print(f"📊 JSON 序列化比較（{days} 天，{len(report['詳細資料'])} 筆明細，重複 {repeat} 次）")
+    print(f"   JSON 編碼器: {'orjson' if chicken_json.orjson is not None else '標準函式庫 json'}")
+    print("-" * 60)
+
+    def legacy(frame):
+        # 原本的做法：整個資料表轉字串後再以 Flask 預設設定編碼
+        return json.dumps(frame.astype(str).to_dict('records'), sort_keys=True).encode('utf-8')
+
+    methods = {
+        '字串轉換': legacy,
+        'records': lambda frame: chicken_json.dumps(chicken_json.frame_to_records(frame)),
+        'columns': lambda frame: chicken_json.dumps(chicken_json.frame_to_columns(frame))
+    }
+    print(f"{'資料表':<10}{'方式':<10}{'平均時間 (ms)':>14}{'大小 (KB)':>12}")
+    for name, frame in frames.items():
+        for label, serialize in methods.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                body = serialize(frame)
+            average_ms = (time.perf_counter() - start) / repeat * 1000
+            print(f"{name:<10}{label:<10}{average_ms:>14.2f}{len(body) / 1024:>12.1f}")
+
+def create_benchmark_sheet(days: int = 14, start_date: datetime = datetime(2025, 4, 29)) -> pd.DataFrame:
+    """
+    建立模擬的 Google Sheet 表單回應（每天一筆，與實際工作表欄位相同）
+
+    Args:
+        days (int): 天數
+        start_date (datetime): 開始日期
+
+    Returns:
+        pd.DataFrame: 工作表資料
+    """
+    rows = []
+    for day in range(days):
+        rows.append({
+            '日期': (start_date + timedelta(days=day)).strftime('%Y/%m/%d'),
+            '炸物的訂購 [雞排]': f"{day % 9 + 1}份",
+            '炸物的訂購 [地瓜]': str(day % 4 + 1),
+            '炸物的訂購 [棒腿*2]': str(day % 3),
+            '炸物的訂購 [雞翅 *3]': f"{day % 5}份"
+        })
+    return pd.DataFrame(rows)
+
+class SlowSheetsReader:
+    """模擬回應緩慢的 Google Sheet（下載固定延遲後回傳模擬資料）"""
+
+    def __init__(self, delay: float, days: int):
+        from direct_sheets_reader import DirectSheetsReader
+        self._reader = DirectSheetsReader('benchmark')
+        self.delay = delay
+        self.sheet = create_benchmark_sheet(days, datetime.now() - timedelta(days=days - 1))
+
+    def read_sheet_as_csv(self, sheet_name=None, gid='0'):
+        time.sleep(self.delay)
+        return self.sheet.copy()
+
+    def _convert_to_chicken_sales_format_with_prices(self, main_data, prices):
+        return self._reader._convert_to_chicken_sales_format_with_prices(main_data, prices)
+
+async def _asgi_get(app, path: str, query: str = ''):
+    """在程序內對 ASGI 應用程式發出 GET 請求，回傳狀態碼"""
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode('latin-1'),
+             'headers': [], 'http_version': '1.1', 'scheme': 'http'}
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await app(scope, receive, send)
+    return status['code']
+
+def benchmark_load(clients: int, requests_per_client: int, delay: float, threads: int):
+    """
+    比較 Flask（固定執行緒數）與 ASGI 服務在 Google Sheet 回應緩慢時的並行處理能力
+
+    每次測試都從空的資料快取開始，一半請求需要 Google Sheet 資料（/api/real_data），
+    一半不需要（/api/test_data）；Flask 以固定大小的執行緒池模擬多執行緒 WSGI 伺服器。
+    """
+    logging.getLogger().setLevel(logging.ERROR)
+    import simple_chicken_web as web
+    import chicken_asgi
+    from chicken_data_service import ChickenDataService
+    # 所有請求來自同一個用戶端，測試伺服器處理能力時不限制速率與同時執行數
+    if web.admission is not None:
+        web.admission.enabled = False
+
+    end = datetime.now()
+    query = urlencode({'start_date': (end - timedelta(days=13)).strftime('%Y-%m-%d'),
+                       'end_date': end.strftime('%Y-%m-%d')})
+    plan = [('/api/real_data', query) if index % 2 == 0 else ('/api/test_data', '')
+            for index in range(clients * requests_per_client)]
+
+    print(f"📊 並行處理比較（{clients} 個用戶端 × {requests_per_client} 個請求，"
+          f"Google Sheet 延遲 {delay:.1f} 秒，Flask 執行緒 {threads}，"
+          f"ASGI 執行緒池 {chicken_asgi.app.max_workers}）")
+    print("-" * 72)
+    print(f"{'服務':<8}{'總時間 (s)':>12}{'real_data p50/p95 (ms)':>26}{'test_data p50/p95 (ms)':>26}")
+
+    def reset():
+        web.data_service = ChickenDataService(SlowSheetsReader(delay, 28), sales_ttl_seconds=300)
+        if web.response_cache is not None:
+            web.response_cache.clear()
+
+    def percentiles(values):
+        values = sorted(values)
+        if not values:
+            return '-'
+        p50 = values[len(values) // 2] * 1000
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))] * 1000
+        return f"{p50:.0f}/{p95:.0f}"
+
+    def report(label, elapsed, latencies):
+        real = [latency for (path, _), latency in zip(plan, latencies) if path == '/api/real_data']
+        test = [latency for (path, _), latency in zip(plan, latencies) if path == '/api/test_data']
+        print(f"{label:<8}{elapsed:>12.2f}{percentiles(real):>26}{percentiles(test):>26}")
+
+    # 所有請求同時送出，延遲為送出到完成的時間（含等待執行緒的時間）
+    # Flask：每個請求佔用一個執行緒直到完成
+    reset()
+
+    def flask_request(item):
+        path, query_string = item
+        web.app.test_client().get(f"{path}?{query_string}")
+        return time.perf_counter()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        finished = list(pool.map(flask_request, plan))
+    report('Flask', time.perf_counter() - start, [done - start for done in finished])
+
+    # ASGI：等待資料時不佔用執行緒
+    reset()
+
+    async def run_asgi():
+        async def timed(path, query_string):
+            await _asgi_get(chicken_asgi.app, path, query_string)
+            return time.perf_counter()
+        return await asyncio.gather(*(timed(path, query_string) for path, query_string in plan))
+
+    start = time.perf_counter()
+    finished = asyncio.run(run_asgi())
+    report('ASGI', time.perf_counter() - start, [done - start for done in finished])
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='🍗 炸雞對帳系統效能測試')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    formats_parser = subparsers.add_parser('formats', help='比較各報告格式的生成時間與檔案大小')
+    formats_parser.add_argument('--days', type=int, default=14, help='模擬資料天數 (預設14天)')
+    formats_parser.add_argument('--repeat', type=int, default=5, help='重複次數 (預設5次)')
+
+    template_parser = subparsers.add_parser('template', help='比較 openpyxl 與預先編譯樣板的 Excel 生成時間')
+    template_parser.add_argument('--days', type=int, default=14, help='模擬資料天數 (預設14天)')
+    template_parser.add_argument('--repeat', type=int, default=20, help='重複次數 (預設20次)')
+
+    batch_parser = subparsers.add_parser('batch', help='量測多期間批次生成的吞吐量')
+    batch_parser.add_argument('--periods', type=int, default=26, help='期間數 (預設26期，約一年)')
+    batch_parser.add_argument('--days', type=int, default=14, help='每期天數 (預設14天)')
+    batch_parser.add_argument('--workers', type=int, default=None, help='程序池大小 (預設依 CPU 數量)')
+
+    fan_out_parser = subparsers.add_parser('fanout', help='比較依序與平行生成多種格式報告的耗時')
+    fan_out_parser.add_argument('--days', type=int, default=14, help='模擬資料天數 (預設14天)')
+    fan_out_parser.add_argument('--formats', type=str, default='excel,text,csv,json',
+                                help='報告格式，以逗號分隔 (預設 excel,text,csv,json)')
+
+    profiles_parser = subparsers.add_parser('profiles', help='比較各報告設定檔的生成時間與檔案大小')
+    profiles_parser.add_argument('--days', type=int, default=90, help='模擬資料天數 (預設90天)')
+    profiles_parser.add_argument('--repeat', type=int, default=10, help='重複次數 (預設10次)')
+
+    json_parser = subparsers.add_parser('json', help='比較 API 回應的 JSON 序列化耗時與大小')
+    json_parser.add_argument('--days', type=int, default=90, help='模擬資料天數 (預設90天)')
+    json_parser.add_argument('--repeat', type=int, default=50, help='重複次數 (預設50次)')
+
+    load_parser = subparsers.add_parser('load', help='比較 Flask 與 ASGI 服務在 Google Sheet 緩慢時的並行處理能力')
+    load_parser.add_argument('--clients', type=int, default=50, help='並行用戶端數 (預設50)')
+    load_parser.add_argument('--requests', type=int, default=4, help='每個用戶端的請求數 (預設4)')
+    load_parser.add_argument('--delay', type=float, default=2.0, help='Google Sheet 下載延遲秒數 (預設2秒)')
+    load_parser.add_argument('--threads', type=int, default=8, help='Flask 執行緒數 (預設8)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.command == 'formats':
+        benchmark_formats(args.days, args.repeat)
+    elif args.command == 'template':
+        benchmark_excel_template(args.days, args.repeat)
+    elif args.command == 'batch':
+        benchmark_batch(args.periods, args.days, args.workers)
+    elif args.command == 'fanout':
+        benchmark_fan_out(args.days, args.formats.split(','))
+    elif args.command == 'profiles':
+        benchmark_profiles(args.days, args.repeat)
+    elif args.command == 'json':
+        benchmark_json(args.days, args.repeat)
+    elif args.command == 'load':
+        benchmark_load(args.clients, args.requests, args.delay, args.threads)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+雞排結帳系統 - CGI 常駐程序
+以 Unix socket 接收 chicken_app.py 轉交的請求，在同一個程序內處理，
+模組、價格表與銷售資料快取在請求之間保留
+
+訊息格式：4 bytes 長度（big-endian）加上 UTF-8 JSON 內容；
+請求為 {"method", "query_string", "body"}，回應為 {"output"}
+
+本模組的用戶端部分只使用標準函式庫，CGI 程序匯入時不會載入 pandas
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import time
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+
+def _send_message(sock, message: dict):
+    """送出一則訊息"""
+    data = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock, size: int) -> bytes:
+    """讀取指定長度的內容"""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError("連線已中斷")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def _recv_message(sock) -> dict:
+    """讀取一則訊息"""
+    size, = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+def request(method: str, query_string: str, body: str, socket_path: str,
+            connect_timeout: float = 0.5, timeout: float = 120) -> Optional[str]:
+    """
+    將請求轉交常駐程序
+
+    Args:
+        method (str): 請求方法
+        query_string (str): 查詢字串
+        body (str): POST 內容
+        socket_path (str): 常駐程序的 Unix socket 路徑
+        connect_timeout (float): 連線逾時秒數
+        timeout (float): 等待回應的逾時秒數
+
+    Returns:
+        Optional[str]: JSON 回應內容，常駐程序未執行或無法回應時回傳 None
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(connect_timeout)
+            sock.connect(socket_path)
+            sock.settimeout(timeout)
+            _send_message(sock, {'method': method, 'query_string': query_string, 'body': body})
+            return _recv_message(sock)['output']
+    except (OSError, ValueError, KeyError) as error:
+        logger.info(f"無法使用常駐程序，改為直接處理: {error}")
+        return None
+
+def spawn(socket_path: str, log_file: str = None):
+    """
+    在背景啟動常駐程序（已有常駐程序執行時，新程序會自行結束）
+
+    Args:
+        socket_path (str): Unix socket 路徑
+        log_file (str): 日誌檔案
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--socket', socket_path]
+    if log_file:
+        command += ['--log-file', log_file]
+    try:
+        subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True, close_fds=True)
+    except OSError as error:
+        logger.warning(f"無法啟動常駐程序: {error}")
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """處理一個轉交的請求"""
+
+    def handle(self):
+        import chicken_cgi_service
+        started = time.perf_counter()
+        try:
+            message = _recv_message(self.request)
+        except (OSError, ValueError) as error:
+            logger.warning(f"無法讀取請求: {error}")
+            return
+        output = chicken_cgi_service.respond(message.get('method', 'GET'), message.get('query_string', ''),
+                                             message.get('body', ''))
+        try:
+            _send_message(self.request, {'output': output})
+        except OSError as error:
+            logger.warning(f"無法送出回應: {error}")
+            return
+        logger.info(f"{message.get('method')} ?{message.get('query_string')} "
+                    f"處理時間 {(time.perf_counter() - started) * 1000:.0f} ms")
+
+class ChickenCGIDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """CGI 常駐程序伺服器"""
+
+    daemon_threads = True
+
+def _acquire_lock(socket_path: str):
+    """
+    取得單一執行個體鎖
+
+    Returns:
+        file: 鎖定的檔案（程序結束時釋放），已有常駐程序時回傳 None
+    """
+    import fcntl
+    lock_file = open(socket_path + '.lock', 'a+')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+def serve(socket_path: str, background_refresh: bool = True) -> bool:
+    """
+    啟動常駐程序並持續處理請求
+
+    Args:
+        socket_path (str): Unix socket 路徑
+        background_refresh (bool): 是否在背景更新銷售資料
+
+    Returns:
+        bool: 是否已啟動（已有常駐程序執行時回傳 False）
+    """
+    started = time.perf_counter()
+    lock = _acquire_lock(socket_path)
+    if lock is None:
+        logger.info("已有常駐程序執行中")
+        return False
+
+    import chicken_cgi_service
+    chicken_cgi_service.warmup(background_refresh)
+
+    # 舊程序留下的 socket 檔案
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    old_umask = os.umask(0o077)
+    try:
+        server = ChickenCGIDaemon(socket_path, _RequestHandler)
+    finally:
+        os.umask(old_umask)
+    logger.info(f"常駐程序 {os.getpid()} 已啟動於 {socket_path}，啟動花費 {time.perf_counter() - started:.2f} 秒")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        lock.close()
+    return True
+
+def stop(socket_path: str) -> bool:
+    """
+    停止常駐程序（更新程式後使用，下一個 CGI 請求會以新程式重新啟動）
+
+    Args:
+        socket_path (str): Unix socket 路徑
+
+    Returns:
+        bool: 是否找到並通知常駐程序
+    """
+    import signal
+    try:
+        with open(socket_path + '.lock') as lock_file:
+            pid = int(lock_file.read().strip())
+        os.kill(pid, signal.SIGINT)
+    except (OSError, ValueError):
+        return False
+    return True
+
+def main():
+    """主函數"""
+    from chicken_config import CGI_DAEMON_CONFIG, DATA_SERVICE_CONFIG
+
+    parser = argparse.ArgumentParser(description='雞排結帳系統 CGI 常駐程序')
+    parser.add_argument('--socket', default=CGI_DAEMON_CONFIG['SOCKET_PATH'], help='Unix socket 路徑')
+    parser.add_argument('--log-file', default=CGI_DAEMON_CONFIG['LOG_FILE'], help='日誌檔案')
+    parser.add_argument('--stop', action='store_true', help='停止執行中的常駐程序')
+    args = parser.parse_args()
+
+    if args.stop:
+        print("✅ 已通知常駐程序停止" if stop(args.socket) else "❌ 沒有執行中的常駐程序")
+        return
+
+    logging.basicConfig(level=logging.INFO, filename=args.log_file,
+                        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    serve(args.socket, DATA_SERVICE_CONFIG['BACKGROUND_REFRESH'])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+雞排結帳系統 - CGI 請求處理
+chicken_app.py 的處理邏輯；在常駐程序中執行時，模組、價格表與銷售資料快取
+在請求之間保留，不需每次重新載入與下載
+"""
+import sys
+import json
+import threading
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 設定路徑
+sys.path.insert(0, '/home/givingwi')
+
+# 導入模組
+try:
+    from chicken_settlement_calculator import ChickenSettlementCalculator
+    from chicken_report_generator import ChickenReportGenerator
+    from direct_sheets_reader import DirectSheetsReader
+    from chicken_data_service import ChickenDataService, CircuitBreaker
+    from chicken_config import CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG, DATA_SERVICE_CONFIG
+except ImportError as e:
+    logger.error(f"模組導入失敗: {e}")
+    # 使用基本設定
+    CHICKEN_PRODUCTS_CONFIG = {
+        '雞排': 65,
+        '雞翅': 25,
+        '棒腿': 55,
+        '地瓜': 35
+    }
+    GOOGLE_SHEETS_CONFIG = {
+        'SHEET_ID': '1wweNNyclcNn1g_uGj3IBA56OaRrJlAMsr2uxeCB2IZs'
+    }
+
+# 在請求之間共用的物件（第一次使用時建立）
+_lock = threading.Lock()
+_calculator = None
+_report_generator = None
+_data_service = None
+_test_data = None
+
+def get_calculator():
+    """取得共用的對帳計算器"""
+    global _calculator
+    with _lock:
+        if _calculator is None:
+            _calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG)
+        return _calculator
+
+def get_report_generator():
+    """取得共用的報告生成器"""
+    global _report_generator
+    with _lock:
+        if _report_generator is None:
+            _report_generator = ChickenReportGenerator("chicken_reports")
+        return _report_generator
+
+def get_data_service():
+    """取得共用的資料服務（快取 Google Sheet 資料與價格表）"""
+    global _data_service
+    with _lock:
+        if _data_service is None:
+            _data_service = ChickenDataService(
+                DirectSheetsReader(GOOGLE_SHEETS_CONFIG['SHEET_ID']),
+                sales_ttl_seconds=DATA_SERVICE_CONFIG['SALES_TTL_SECONDS'],
+                prices_ttl_seconds=DATA_SERVICE_CONFIG['PRICES_TTL_SECONDS'],
+                refresh_ahead_seconds=DATA_SERVICE_CONFIG['REFRESH_AHEAD_SECONDS'],
+                max_staleness_seconds=DATA_SERVICE_CONFIG['MAX_STALENESS_SECONDS'],
+                slow_fetch_seconds=DATA_SERVICE_CONFIG['SLOW_FETCH_SECONDS'],
+                circuit_breaker=CircuitBreaker(
+                    failure_threshold=DATA_SERVICE_CONFIG['CIRCUIT_FAILURE_THRESHOLD'],
+                    reset_seconds=DATA_SERVICE_CONFIG['CIRCUIT_RESET_SECONDS']
+                )
+            )
+        return _data_service
+
+def warmup(background_refresh: bool = False):
+    """
+    預先載入價格表與銷售資料（常駐程序啟動時使用）
+
+    Args:
+        background_refresh (bool): 是否啟動資料背景更新
+    """
+    get_calculator()
+    data_service = get_data_service()
+    try:
+        data_service.get_prices()
+        data_service.get_sales_view()
+    except Exception as error:
+        logger.warning(f"預先讀取銷售資料失敗，將於收到請求時重新讀取: {error}")
+    if background_refresh:
+        data_service.start_refresher()
+
+def get_test_data():
+    """取得測試資料"""
+    global _test_data
+    try:
+        if _test_data is None:
+            # 建立測試資料
+            test_data = {
+                '日期': [
+                    '2025-04-29', '2025-04-29', '2025-04-29', '2025-04-30', '2025-04-30',
+                    '2025-04-30', '2025-05-01', '2025-05-01', '2025-05-02', '2025-05-02',
+                    '2025-05-02', '2025-05-03', '2025-05-03', '2025-05-04', '2025-05-04',
+                    '2025-05-05', '2025-05-05', '2025-05-06', '2025-05-06', '2025-05-07'
+                ],
+                '品項': [
+                    '雞排', '雞翅', '雞腿', '雞排', '雞塊',
+                    '雞米花', '雞排', '雞柳條', '雞排', '雞翅',
+                    '雞腿', '雞排', '雞塊', '雞排', '雞米花',
+                    '雞排', '雞翅', '雞腿', '雞排', '雞塊'
+                ],
+                '數量': [10, 5, 3, 8, 4, 6, 12, 2, 15, 7, 4, 9, 3, 11, 5, 8, 6, 2, 13, 4],
+                '單價': [65, 25, 55, 65, 40, 35, 65, 45, 65, 25, 55, 65, 40, 65, 35, 65, 25, 55, 65, 40],
+                '小計': [650, 125, 165, 520, 160, 210, 780, 90, 975, 175, 220, 585, 120, 715, 175, 520, 150, 110, 845, 160]
+            }
+
+            df = pd.DataFrame(test_data)
+            df['日期'] = pd.to_datetime(df['日期'])
+            _test_data = df
+
+        # 呼叫端可自由修改
+        return _test_data.copy()
+
+    except Exception as error:
+        logger.error(f"建立測試資料時發生錯誤: {error}")
+        return pd.DataFrame()
+
+def get_real_data(start_date=None, end_date=None):
+    """取得真實資料"""
+    try:
+        # 讀取 Google Sheets 資料（已使用最新價格轉換，由資料服務快取）
+        df = get_data_service().get_sales_data()
+
+        if df.empty:
+            logger.warning("沒有讀取到真實資料，使用測試資料")
+            return get_test_data()
+
+        # 根據日期篩選
+        if start_date and end_date:
+            df['日期'] = pd.to_datetime(df['日期'])
+            start_date = pd.to_datetime(start_date)
+            end_date = pd.to_datetime(end_date)
+            df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
+
+        return df
+
+    except Exception as error:
+        logger.error(f"取得真實資料時發生錯誤: {error}")
+        return get_test_data()
+
+def calculate_settlement(df):
+    """計算對帳"""
+    try:
+        calculator = get_calculator()
+        processed_df = calculator.process_chicken_sales_data(df)
+
+        # 計算摘要
+        daily_summary = calculator.calculate_daily_chicken_summary(processed_df)
+        product_summary = calculator.calculate_chicken_product_summary(processed_df)
+        settlement_info = calculator.calculate_chicken_settlement(processed_df)
+
+        return {
+            'daily_summary': daily_summary.to_dict('records'),
+            'product_summary': product_summary.to_dict('records'),
+            'settlement_info': settlement_info.to_dict(),
+            'raw_data': processed_df.head(10).to_dict('records')
+        }
+
+    except Exception as error:
+        logger.error(f"計算對帳時發生錯誤: {error}")
+        return {}
+
+def generate_report(start_date, end_date):
+    """生成報告"""
+    try:
+        # 取得資料
+        df = get_real_data(start_date, end_date)
+
+        if df.empty:
+            return {'success': False, 'error': '沒有資料可生成報告'}
+
+        # 計算對帳
+        calculator = get_calculator()
+        start_date_obj = pd.to_datetime(start_date)
+        end_date_obj = pd.to_datetime(end_date)
+
+        settlement_report = calculator.generate_chicken_settlement_report(df, start_date_obj, end_date_obj)
+
+        # 生成 Excel 報告
+        report_generator = get_report_generator()
+        excel_file = report_generator.generate_excel_report(settlement_report)
+
+        return {
+            'success': True,
+            'message': '炸雞對帳報告生成成功',
+            'excel_file': excel_file,
+            'report_data': settlement_report
+        }
+
+    except Exception as error:
+        logger.error(f"生成報告時發生錯誤: {error}")
+        return {'success': False, 'error': str(error)}
+
+def parse_query_string(query_string):
+    """
+    解析查詢參數（與原本的 CGI 處理相同：只取有等號的參數，重複時以最後一個為準）
+
+    Args:
+        query_string (str): 查詢字串
+
+    Returns:
+        dict: 查詢參數
+    """
+    params = {}
+    if query_string:
+        for param in query_string.split('&'):
+            if '=' in param:
+                key, value = param.split('=', 1)
+                params[key] = value
+    return params
+
+def handle_request(method, query_string, body=''):
+    """
+    處理一個請求
+
+    Args:
+        method (str): 請求方法
+        query_string (str): 查詢字串
+        body (str): POST 內容
+
+    Returns:
+        dict: 回應資料
+    """
+    params = parse_query_string(query_string)
+
+    # 處理不同的請求
+    if 'test_data' in params:
+        # 測試資料
+        df = get_test_data()
+        result = calculate_settlement(df)
+        result['success'] = True
+        result['data_type'] = 'test'
+
+    elif 'real_data' in params:
+        # 真實資料
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+        df = get_real_data(start_date, end_date)
+        result = calculate_settlement(df)
+        result['success'] = True
+        result['data_type'] = 'real'
+
+    elif method == 'POST':
+        # POST 請求（生成報告）
+        if body:
+            try:
+                data = json.loads(body)
+                start_date = data.get('start_date')
+                end_date = data.get('end_date')
+                result = generate_report(start_date, end_date)
+            except json.JSONDecodeError:
+                result = {'success': False, 'error': '無效的 JSON 資料'}
+        else:
+            result = {'success': False, 'error': '沒有 POST 資料'}
+    else:
+        # 預設回應
+        result = {
+            'success': True,
+            'message': '雞排結帳系統 API',
+            'endpoints': [
+                '?test_data=1 - 取得測試資料',
+                '?real_data=1&start_date=YYYY-MM-DD&end_date=YYYY-MM-DD - 取得真實資料',
+                'POST / - 生成報告'
+            ]
+        }
+    return result
+
+def respond(method, query_string, body=''):
+    """
+    處理一個請求並輸出 JSON 回應內容
+
+    Args:
+        method (str): 請求方法
+        query_string (str): 查詢字串
+        body (str): POST 內容
+
+    Returns:
+        str: JSON 回應內容（不含 HTTP 標頭）
+    """
+    try:
+        result = handle_request(method, query_string, body)
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
+    except Exception as error:
+        logger.error(f"主函數執行時發生錯誤: {error}")
+        error_result = {
+            'success': False,
+            'error': str(error),
+            'message': '系統發生錯誤'
+        }
+        return json.dumps(error_result, ensure_ascii=False, indent=2)
@@ -0,0 +1,241 @@
+"""
+炸雞對帳系統回應壓縮
+Flask 回應依用戶端的 Accept-Encoding 以 brotli（有安裝時）或 gzip 壓縮；
+小於門檻的回應不壓縮，相同內容的壓縮結果會保留重複使用，
+串流回應逐段壓縮並立即送出，不需等待整個回應產生完畢
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional
+import logging
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ENCODING_BROTLI = 'br'
+ENCODING_GZIP = 'gzip'
+
+# 預設壓縮的內容類型
+DEFAULT_MIMETYPES = [
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'text/event-stream',
+    'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml'
+]
+
+class ChickenCompression:
+    """Flask 回應壓縮類別"""
+
+    def __init__(self, app=None, min_size: int = 500, gzip_level: int = 6, brotli_quality: int = 5,
+                 cache_entries: int = 64, mimetypes: List[str] = None):
+        """
+        初始化回應壓縮
+
+        Args:
+            app (Flask): Flask 應用程式，None 表示稍後以 init_app 設定
+            min_size (int): 壓縮門檻 (bytes)，較小的回應直接送出
+            gzip_level (int): gzip 壓縮等級 (1-9)
+            brotli_quality (int): brotli 壓縮品質 (0-11)
+            cache_entries (int): 保留的壓縮結果數量上限（以內容雜湊值為鍵）
+            mimetypes (List[str]): 要壓縮的內容類型，None 表示使用 DEFAULT_MIMETYPES
+        """
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self.mimetypes = set(mimetypes or DEFAULT_MIMETYPES)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        在 Flask 應用程式註冊壓縮處理
+
+        Args:
+            app (Flask): Flask 應用程式
+        """
+        app.after_request(self.compress_response)
+        app.extensions['chicken_compression'] = self
+
+    def choose_encoding(self, accept_encodings) -> Optional[str]:
+        """
+        依 Accept-Encoding 選擇壓縮方式（brotli 優先）
+
+        Returns:
+            Optional[str]: 'br'、'gzip'，都不接受時回傳 None
+        """
+        if brotli is not None and accept_encodings[ENCODING_BROTLI] > 0:
+            return ENCODING_BROTLI
+        if accept_encodings[ENCODING_GZIP] > 0:
+            return ENCODING_GZIP
+        return None
+
+    def negotiated_encoding(self, mimetype: str, accept_encodings) -> Optional[str]:
+        """
+        依內容類型與 Accept-Encoding 決定回應的壓縮方式（不論內容是否達到壓縮門檻）
+
+        協商出壓縮方式的回應一律帶弱 ETag，304 回應才能與對應的 200 回應帶相同的 ETag
+
+        Returns:
+            Optional[str]: 'br'、'gzip'，內容類型不壓縮或用戶端不接受時回傳 None
+        """
+        if mimetype not in self.mimetypes:
+            return None
+        return self.choose_encoding(accept_encodings)
+
+    def compress_response(self, response):
+        """after_request 處理：符合條件的回應改為壓縮內容，304 回應帶與 200 回應相同的 ETag"""
+        if response.status_code == 304:
+            if response.mimetype in self.mimetypes:
+                response.vary.add('Accept-Encoding')
+                if self.negotiated_encoding(response.mimetype, request.accept_encodings) is not None:
+                    self._weaken_etag(response)
+            return response
+        if (response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+                or response.mimetype not in self.mimetypes
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiated_encoding(response.mimetype, request.accept_encodings)
+        if encoding is None:
+            return response
+        # 壓縮後的內容與原始內容不同，ETag 改為弱比對（未達門檻的回應也一樣，與 304 回應一致）
+        self._weaken_etag(response)
+
+        if response.is_streamed:
+            # 串流回應長度未知，逐段壓縮
+            response.response = self.compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        """強 ETag 改為弱 ETag"""
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def compress(self, data: bytes, encoding: str, best: bool = False) -> bytes:
+        """
+        壓縮內容（相同內容與壓縮方式的結果會保留重複使用）
+
+        Args:
+            data (bytes): 原始內容
+            encoding (str): 'br' 或 'gzip'
+            best (bool): 使用最高壓縮等級（預先壓縮靜態頁面使用）
+
+        Returns:
+            bytes: 壓縮後內容
+        """
+        key = (hashlib.sha1(data).digest(), encoding)
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+                return compressed
+
+        if encoding == ENCODING_BROTLI:
+            compressed = brotli.compress(data, quality=11 if best else self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=9 if best else self.gzip_level, mtime=0)
+
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def compress_stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        """逐段壓縮串流內容，每段都立即送出（用戶端可即時解壓縮已收到的部分）"""
+        if encoding == ENCODING_BROTLI:
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress = compressor.process
+            flush = compressor.flush
+            finish = compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compress = compressor.compress
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            finish = compressor.flush
+
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                data = compress(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def precompress(self, app, paths: List[str]) -> int:
+        """
+        啟動時預先以最高壓縮等級壓縮靜態頁面（內容不變的頁面之後直接使用壓縮結果）
+
+        Args:
+            app (Flask): Flask 應用程式
+            paths (List[str]): 頁面路徑
+
+        Returns:
+            int: 預先壓縮的內容數量
+        """
+        encodings = [ENCODING_GZIP] + ([ENCODING_BROTLI] if brotli is not None else [])
+        count = 0
+        with app.test_client() as client:
+            for path in paths:
+                response = client.get(path, headers={'Accept-Encoding': 'identity'})
+                data = response.get_data()
+                if response.status_code != 200 or response.mimetype not in self.mimetypes \
+                        or len(data) < self.min_size:
+                    continue
+                for encoding in encodings:
+                    self.compress(data, encoding, best=True)
+                    count += 1
+        logger.info(f"已預先壓縮 {count} 個靜態頁面內容")
+        return count
+
+def init_app(app, config: dict = None) -> Optional[ChickenCompression]:
+    """
+    依設定為 Flask 應用程式啟用回應壓縮
+
+    Args:
+        app (Flask): Flask 應用程式
+        config (dict): 壓縮設定，None 表示使用 COMPRESSION_CONFIG
+
+    Returns:
+        Optional[ChickenCompression]: 壓縮處理物件，設定停用時回傳 None
+    """
+    if config is None:
+        from chicken_config import COMPRESSION_CONFIG
+        config = COMPRESSION_CONFIG
+    if not config['ENABLED']:
+        return None
+    return ChickenCompression(
+        app,
+        min_size=config['MIN_SIZE'],
+        gzip_level=config['GZIP_LEVEL'],
+        brotli_quality=config['BROTLI_QUALITY'],
+        cache_entries=config['CACHE_ENTRIES']
+    )
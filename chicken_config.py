@@ -84,12 +84,224 @@ CHICKEN_COLUMN_MAPPING = {
 REPORT_CONFIG = {
     # 報告輸出目錄
     'OUTPUT_DIR': 'chicken_reports',
-    # 報告檔案格式 ('excel', 'csv', 'json')
+    # 報告檔案格式 ('excel', 'text', 'csv', 'detail_csv', 'json', 'parquet')
     'FORMAT': 'excel',
+    # 命令列同時生成的報告格式
+    'FAN_OUT_FORMATS': ['excel', 'text', 'csv', 'json'],
+    # 網頁應用程式多格式同時生成的執行方式 ('thread' 執行緒池, 'process' 程序池；程序池啟動工作程序較慢，適合大型報告)；
+    # 命令列 (chicken_main.py) 固定使用程序池
+    'FAN_OUT_EXECUTOR': 'thread',
     # 是否包含詳細明細
     'INCLUDE_DETAILS': True,
     # 是否包含圖表
-    'INCLUDE_CHARTS': True
+    'INCLUDE_CHARTS': True,
+    # 是否以預先編譯的 Excel 樣板生成報告（只填入資料列，不重建版面）
+    'EXCEL_TEMPLATE': True,
+    # 網頁介面生成報告預設使用的設定檔（見 REPORT_PROFILES）；頁面可另外選擇快速版
+    'WEB_PROFILE': 'full'
+}
+
+# 報告設定檔：決定 Excel 報告包含哪些耗時的部分
+REPORT_PROFILES = {
+    # 只有摘要與彙總表，不含圖表與詳細資料
+    'quick': {'INCLUDE_CHARTS': False, 'INCLUDE_DETAILS': False, 'DETAIL_ATTACHMENT': False},
+    # 不含圖表，詳細資料另存為 gzip 壓縮 CSV 附件
+    'accounting': {'INCLUDE_CHARTS': False, 'INCLUDE_DETAILS': False, 'DETAIL_ATTACHMENT': True},
+    # 完整報告
+    'full': {'INCLUDE_CHARTS': True, 'INCLUDE_DETAILS': True, 'DETAIL_ATTACHMENT': False}
+}
+
+# 報告快取設定（相同輸入內容直接回傳既有報告檔案）
+REPORT_CACHE_CONFIG = {
+    # 是否啟用報告快取
+    'ENABLED': True,
+    # 快取索引檔名（存放於報告輸出目錄）
+    'INDEX_FILE': '.report_cache_index.json',
+    # 快取檔案總大小上限 (bytes)
+    'MAX_TOTAL_BYTES': 200 * 1024 * 1024,
+    # 快取檔案最長保存時間 (秒)
+    'MAX_AGE_SECONDS': 30 * 24 * 3600
+}
+
+# 報告檔案索引與保存設定
+REPORT_STORE_CONFIG = {
+    # 是否以索引管理報告檔案
+    'ENABLED': True,
+    # 索引資料庫檔名（存放於報告輸出目錄）
+    'DB_FILE': '.report_store.sqlite3',
+    # 壓縮封存檔目錄（報告輸出目錄下的子目錄）
+    'ARCHIVE_DIR': 'archive',
+    # 報告保存天數，超過後壓縮封存
+    'RETENTION_DAYS': 14,
+    # 自動封存的最短間隔 (秒)
+    'COMPACT_INTERVAL_SECONDS': 3600
+}
+
+# 背景報告工作設定
+REPORT_JOB_CONFIG = {
+    # 同時生成報告的工作執行緒數
+    'MAX_WORKERS': 2,
+    # 等待中與執行中的工作數上限
+    'MAX_PENDING': 20,
+    # 保留的已完成工作筆數（供查詢狀態與下載）
+    'MAX_FINISHED': 200,
+    # 工作狀態存於報告目錄的 SQLite 資料庫（REPORT_STORE_CONFIG['DB_FILE']），
+    # 多個工作程序（PRODUCTION_SERVER_CONFIG['WORKERS'] > 1）可查詢彼此提交的工作；
+    # 關閉時只保存在程序內，須搭配單一工作程序
+    'SHARED_STATE': True
+}
+
+# 網頁資料服務設定（程序內共用的 Google Sheet 資料與價格快取）
+DATA_SERVICE_CONFIG = {
+    # Google Sheet 銷售資料快取時間 (秒)
+    'SALES_TTL_SECONDS': 60,
+    # 檢查價格檔是否變更的間隔 (秒)，價格檔未變更時不重新讀取
+    'PRICES_TTL_SECONDS': 1,
+    # 是否以背景執行緒在快取到期前重新下載（請求一律使用最後一份成功的資料）
+    'BACKGROUND_REFRESH': True,
+    # 快取到期前多久開始背景下載 (秒)
+    'REFRESH_AHEAD_SECONDS': 10,
+    # 資料最長使用時間 (秒)，超過時請求改為同步下載；下載失敗時回應錯誤，不再使用舊資料
+    'MAX_STALENESS_SECONDS': 900,
+    # 連續失敗幾次後斷路器開啟，暫停下載 Google Sheet
+    'CIRCUIT_FAILURE_THRESHOLD': 3,
+    # 斷路器開啟後多久重新嘗試 (秒)
+    'CIRCUIT_RESET_SECONDS': 60,
+    # 下載超過此時間 (秒) 視為 Google 回應過慢，計入失敗次數
+    'SLOW_FETCH_SECONDS': 10
+}
+
+# API 回應快取設定（/api/real_data、/api/test_data）
+RESPONSE_CACHE_CONFIG = {
+    # 是否保存已序列化的回應
+    'ENABLED': True,
+    # 保存的回應數量上限
+    'MAX_ENTRIES': 128,
+    # 瀏覽器可不重新驗證直接使用回應的時間 (秒)；0 表示每次都以 ETag 重新驗證
+    'MAX_AGE_SECONDS': 0
+}
+
+# 銷售明細 API 設定（/api/sales_details）
+DETAIL_API_CONFIG = {
+    # 每頁預設筆數
+    'DEFAULT_LIMIT': 100,
+    # 每頁筆數上限
+    'MAX_LIMIT': 1000,
+    # 每次掃描與編碼的資料列數（決定每個請求的記憶體用量）
+    'CHUNK_ROWS': 500
+}
+
+# 即時更新設定（/api/live_updates，Server-Sent Events）
+LIVE_UPDATES_CONFIG = {
+    # 是否啟用
+    'ENABLED': True,
+    # 沒有更新時送出保持連線註解的間隔（秒），也是檢查資料是否到期的間隔
+    'HEARTBEAT_SECONDS': 15,
+    # 連線中斷後瀏覽器重新連線的等待時間（毫秒）
+    'RETRY_MS': 5000,
+    # 每個程序的同時連線數上限（Flask 每個連線佔用一個處理執行緒，須小於執行緒數）
+    'MAX_CLIENTS': 4,
+    # 單一連線最長時間（秒），到期後由瀏覽器自動重新連線
+    'MAX_STREAM_SECONDS': 300,
+    # ASGI 版本檢查資料版本的間隔（秒，不佔用執行緒）
+    'POLL_SECONDS': 1
+}
+
+# 請求准入控制設定（chicken_admission.py，每個程序各自計算）
+ADMISSION_CONFIG = {
+    # 是否啟用
+    'ENABLED': True,
+    # 以 X-Forwarded-For 判斷用戶端（部署在反向代理之後時設定為 True）
+    'TRUST_PROXY': False,
+    # 受限制的 API：CLIENT_RATE / CLIENT_BURST 為每個用戶端每秒請求數與可累積的請求數，
+    # RATE / BURST 為所有用戶端合計，HEAVY 表示 CPU 密集（計入同時執行數上限）
+    'ENDPOINTS': {
+        '/api/real_data': {'CLIENT_RATE': 1, 'CLIENT_BURST': 5, 'RATE': 5, 'BURST': 20, 'HEAVY': True},
+        '/api/test_data': {'CLIENT_RATE': 2, 'CLIENT_BURST': 10, 'RATE': 10, 'BURST': 40, 'HEAVY': False},
+        '/api/sales_details': {'CLIENT_RATE': 5, 'CLIENT_BURST': 20, 'RATE': 20, 'BURST': 80, 'HEAVY': False},
+        '/api/generate_report': {'CLIENT_RATE': 0.1, 'CLIENT_BURST': 3, 'RATE': 0.5, 'BURST': 5, 'HEAVY': True},
+        '/api/report_jobs': {'CLIENT_RATE': 0.1, 'CLIENT_BURST': 3, 'RATE': 0.5, 'BURST': 5, 'HEAVY': False},
+        '/api/live_updates': {'CLIENT_RATE': 0.2, 'CLIENT_BURST': 3, 'RATE': 1, 'BURST': 10, 'HEAVY': False}
+    },
+    # CPU 密集 API 的同時執行數上限
+    'MAX_CONCURRENT': 2,
+    # 等待執行的請求數上限，超過時回應 503
+    'MAX_QUEUE': 8,
+    # 排隊等待的最長時間（秒），逾時回應 503
+    'QUEUE_TIMEOUT_SECONDS': 15,
+    # 保留的用戶端令牌桶數量上限
+    'MAX_TRACKED_CLIENTS': 10000
+}
+
+# 階段計時設定（chicken_timing.py，每個程序各自記錄，可由 /api/timings 查詢）
+TIMING_CONFIG = {
+    # 是否記錄各階段的經過時間、CPU 時間與資料筆數
+    'ENABLED': True,
+    # 保留的紀錄數（環形緩衝區，超過時捨棄最舊的紀錄）
+    'BUFFER_SIZE': 2048,
+    # 經過時間超過此毫秒數的階段寫入警告日誌，None 表示不寫入
+    'SLOW_MS': 5000
+}
+
+# ASGI 網頁服務設定（chicken_asgi.py）
+ASGI_CONFIG = {
+    # 監聽位址
+    'HOST': '0.0.0.0',
+    # 監聽埠號
+    'PORT': 8083,
+    # pandas 計算與轉交 Flask 路由使用的執行緒數上限
+    'EXECUTOR_WORKERS': 4
+}
+
+# 生產環境伺服器設定
+PRODUCTION_SERVER_CONFIG = {
+    # 監聽位址
+    'HOST': '0.0.0.0',
+    # 監聽埠號
+    'PORT': 5000,
+    # 工作程序數（0 表示依 CPU 數量；不支援 fork 的平台改用單一程序）
+    'WORKERS': 2,
+    # 每個工作程序處理請求的執行緒數
+    'THREADS': 8,
+    # 啟動時在 fork 之前預先載入的模組（工作程序以 copy-on-write 共用）
+    'PRELOAD_MODULES': [
+        'pandas', 'numpy', 'openpyxl',
+        'chicken_settlement_calculator', 'chicken_report_generator', 'simple_chicken_web'
+    ],
+    # 開始接受請求前先讀取銷售資料與價格
+    'WARMUP': True,
+    # 工作程序結束時等待進行中請求的秒數
+    'GRACEFUL_TIMEOUT': 10
+}
+
+# CGI 常駐服務設定（chicken_app.py 將請求轉交常駐程序，不需每次載入模組與下載資料）
+CGI_DAEMON_CONFIG = {
+    # 是否轉交常駐程序（停用時每個請求都在 CGI 程序內處理）
+    'ENABLED': True,
+    # 常駐程序的 Unix socket 路徑
+    'SOCKET_PATH': os.path.join(os.path.expanduser('~'), '.chicken_app.sock'),
+    # 連線逾時秒數（常駐程序未執行時很快改為直接處理）
+    'CONNECT_TIMEOUT': 0.5,
+    # 等待回應的逾時秒數
+    'REQUEST_TIMEOUT': 120,
+    # 常駐程序未執行時是否由 CGI 自動在背景啟動
+    'AUTOSTART': True,
+    # 常駐程序的日誌檔案
+    'LOG_FILE': 'chicken_app_daemon.log'
+}
+
+# 網頁回應壓縮設定
+COMPRESSION_CONFIG = {
+    # 是否壓縮回應（依用戶端支援使用 brotli 或 gzip）
+    'ENABLED': True,
+    # 壓縮門檻 (bytes)，較小的回應直接送出
+    'MIN_SIZE': 500,
+    # gzip 壓縮等級 (1-9)
+    'GZIP_LEVEL': 6,
+    # brotli 壓縮品質 (0-11)，需安裝 brotli 套件
+    'BROTLI_QUALITY': 5,
+    # 保留的壓縮結果數量上限
+    'CACHE_ENTRIES': 64
 }
 
 # 通知設定
@@ -0,0 +1,450 @@
+"""
+炸雞銷售資料服務
+在程序內以 TTL 快取 Google Sheet 原始資料與轉換後的銷售資料（價格表由
+persistent_price_config.price_registry 在價格檔變更時重新讀取），
+所有 API 共用同一份資料，不必每個請求都重新下載與轉換；
+快取過期時並行的請求只觸發一次下載與轉換。
+背景更新執行緒在快取到期前重新下載，請求一律由最後一份成功的資料回應；
+Google 連續失敗或回應過慢時斷路器開啟，暫停下載並繼續使用舊資料，
+舊資料超過最長使用時間後改為回應錯誤
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import logging
+import pandas as pd
+from chicken_single_flight import SingleFlight
+from chicken_timing import span
+
+logger = logging.getLogger(__name__)
+
+# 斷路器狀態
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """斷路器：連續失敗達門檻後暫停呼叫，冷卻後允許一次試探呼叫"""
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 60):
+        """
+        初始化斷路器
+
+        Args:
+            failure_threshold (int): 開啟斷路器的連續失敗次數
+            reset_seconds (float): 開啟後多久允許試探呼叫（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        """目前狀態"""
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return CIRCUIT_CLOSED
+        if time.time() - self._opened_at >= self.reset_seconds:
+            return CIRCUIT_HALF_OPEN
+        return CIRCUIT_OPEN
+
+    def allow(self) -> bool:
+        """
+        是否允許呼叫（半開狀態只允許一次試探，結果回報前其他呼叫仍視為開啟）
+
+        Returns:
+            bool: 是否允許
+        """
+        with self._lock:
+            state = self._state_locked()
+            if state == CIRCUIT_HALF_OPEN:
+                # 試探期間重新計時，避免多個呼叫端同時試探
+                self._opened_at = time.time()
+                return True
+            return state == CIRCUIT_CLOSED
+
+    def record_success(self):
+        """回報呼叫成功"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """回報呼叫失敗"""
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Google Sheet 連續失敗 {self._failures} 次，斷路器開啟")
+                self._opened_at = time.time()
+
+class DataUnavailableError(RuntimeError):
+    """沒有任何可用的資料（首次下載失敗、斷路器開啟，或舊資料已超過最長使用時間）"""
+
+class ChickenDataService:
+    """炸雞銷售資料服務類別"""
+
+    def __init__(self, sheets_reader, sales_ttl_seconds: float = 60, prices_ttl_seconds: float = 5,
+                 main_sheet_gid: str = '0', refresh_ahead_seconds: float = 10,
+                 max_staleness_seconds: float = 900, slow_fetch_seconds: float = 10,
+                 circuit_breaker: CircuitBreaker = None, price_registry=None):
+        """
+        初始化資料服務
+
+        Args:
+            sheets_reader (DirectSheetsReader): Google Sheet 讀取器
+            sales_ttl_seconds (float): Google Sheet 資料的快取時間（秒）
+            prices_ttl_seconds (float): 檢查價格檔是否變更的間隔（秒）；價格檔未變更時不重新讀取
+            main_sheet_gid (str): 主要資料工作表 ID
+            refresh_ahead_seconds (float): 背景更新在快取到期前多久開始下載（秒）
+            max_staleness_seconds (float): 資料超過此時間（秒）時請求改為同步下載；
+                未超過時下載失敗或斷路器開啟仍回傳舊資料，超過時引發 DataUnavailableError
+            slow_fetch_seconds (float): 下載超過此時間（秒）視為 Google 回應過慢，計入斷路器失敗次數
+            circuit_breaker (CircuitBreaker): 斷路器，None 表示使用預設設定
+            price_registry (PriceRegistry): 價格表登錄，None 表示使用共用的 price_registry
+        """
+        self.sheets_reader = sheets_reader
+        self.sales_ttl_seconds = sales_ttl_seconds
+        self.prices_ttl_seconds = prices_ttl_seconds
+        self.main_sheet_gid = main_sheet_gid
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.slow_fetch_seconds = slow_fetch_seconds
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.price_registry = price_registry
+        self._lock = threading.Lock()
+        # 銷售資料版本變更時通知等待中的即時更新串流
+        self._changed = threading.Condition(self._lock)
+        self._raw = None
+        self._sales = None
+        self._last_error = None
+        self._flight = SingleFlight()
+        self._refresher = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _is_fresh(entry: Optional[Dict], ttl_seconds: float) -> bool:
+        """快取項目是否仍在有效期間內"""
+        return entry is not None and time.time() - entry['loaded_at'] < ttl_seconds
+
+    @staticmethod
+    def _content_hash(df: pd.DataFrame) -> str:
+        """計算工作表內容的雜湊值（欄位名稱與所有儲存格）"""
+        hasher = hashlib.sha256(repr(list(df.columns)).encode('utf-8'))
+        if not df.empty:
+            hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return hasher.hexdigest()
+
+    def _get_raw(self) -> Dict:
+        """
+        取得 Google Sheet 原始資料
+
+        - 未過期：直接回傳
+        - 已過期但未超過最長保存時間：回傳舊資料並通知背景更新
+        - 沒有背景更新或超過最長保存時間：同步下載（並行的呼叫端共用同一次下載），
+          失敗時（包含斷路器開啟）回傳未超過最長保存時間的舊資料
+
+        Raises:
+            DataUnavailableError: 下載失敗且沒有資料或資料已超過最長保存時間
+        """
+        with self._lock:
+            entry = self._raw
+        if self._is_fresh(entry, self.sales_ttl_seconds):
+            return entry
+
+        if entry is not None and self._refresher is not None and self._is_fresh(entry, self.max_staleness_seconds):
+            self._wake.set()
+            return entry
+
+        try:
+            return self._flight.do('raw', self._fetch_raw)
+        except Exception as error:
+            if entry is None:
+                raise
+            age = time.time() - entry['loaded_at']
+            if age >= self.max_staleness_seconds:
+                raise DataUnavailableError(
+                    f"Google Sheet 資料已超過最長使用時間（{age:.0f} 秒），且無法重新下載: {error}"
+                ) from error
+            logger.warning(f"下載 Google Sheet 失敗，使用 {age:.0f} 秒前的資料: {error}")
+            return entry
+
+    def _fetch_raw(self, force: bool = False) -> Dict:
+        """
+        下載 Google Sheet 原始資料；內容雜湊值未變更時沿用原本的資料（不必重新轉換）
+
+        Args:
+            force (bool): 未過期也重新下載（背景更新使用）
+        """
+        with self._lock:
+            entry = self._raw
+        # 等待期間其他呼叫端可能剛完成下載
+        if not force and self._is_fresh(entry, self.sales_ttl_seconds):
+            return entry
+        if not self.circuit_breaker.allow():
+            raise DataUnavailableError("Google Sheet 斷路器開啟中，暫停下載")
+
+        start = time.time()
+        try:
+            main_data = self.sheets_reader.read_sheet_as_csv(gid=self.main_sheet_gid)
+        except Exception as error:
+            self.circuit_breaker.record_failure()
+            with self._lock:
+                self._last_error = str(error)
+            raise
+        elapsed = time.time() - start
+        if elapsed > self.slow_fetch_seconds:
+            # 資料仍可使用，但計入失敗次數，持續過慢時改用舊資料
+            logger.warning(f"Google Sheet 回應過慢（{elapsed:.1f} 秒）")
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+        content_hash = self._content_hash(main_data)
+        with self._lock:
+            if self._raw is not None and self._raw['content_hash'] == content_hash:
+                entry = dict(self._raw, loaded_at=time.time())
+            else:
+                entry = {'value': main_data, 'loaded_at': time.time(), 'content_hash': content_hash}
+                logger.info(f"Google Sheet 資料已更新（{len(main_data)} 筆）")
+            self._raw = entry
+            self._last_error = None
+        return entry
+
+    def get_price_snapshot(self):
+        """
+        取得價格表快照（價格檔未變更時不重新讀取）
+
+        Returns:
+            PriceSnapshot: 價格表快照（含價格、版本與內容摘要）
+        """
+        from persistent_price_config import price_registry
+        return (self.price_registry or price_registry).snapshot(self.prices_ttl_seconds)
+
+    def get_prices(self) -> Dict[str, Dict[str, float]]:
+        """
+        取得目前的價格設定
+
+        Returns:
+            Dict[str, Dict[str, float]]: 品項價格對應（呼叫端不可修改）
+        """
+        return self.get_price_snapshot().prices
+
+    def get_sales_data(self) -> pd.DataFrame:
+        """
+        取得以目前價格轉換的炸雞銷售資料（長格式：日期、品項、數量、單價、成本、小計、成本小計）
+
+        原始資料與價格都未變更時直接回傳快取的轉換結果；只有價格變更時以快取的原始資料重新轉換，
+        不必重新下載。
+
+        Returns:
+            pd.DataFrame: 炸雞銷售資料（複本，呼叫端可自由修改）
+        """
+        return self._get_sales_entry()['value'].copy()
+
+    def get_sales_snapshot(self) -> Tuple[pd.DataFrame, str]:
+        """
+        取得銷售資料與其資料版本（兩者來自同一份快取，不會在背景更新時錯開）
+
+        Returns:
+            Tuple[pd.DataFrame, str]: (炸雞銷售資料複本, 資料版本)
+        """
+        entry = self._get_sales_entry()
+        return entry['value'].copy(), entry['version']
+
+    def get_sales_view(self) -> Tuple[pd.DataFrame, str]:
+        """
+        取得依日期排序的共用銷售資料與資料版本（不複製，呼叫端不可修改），
+        供只讀取部分資料列的明細查詢使用
+
+        Returns:
+            Tuple[pd.DataFrame, str]: (炸雞銷售資料, 資料版本)
+        """
+        entry = self._get_sales_entry()
+        return entry['value'], entry['version']
+
+    async def get_sales_view_async(self) -> Tuple[pd.DataFrame, str]:
+        """
+        get_sales_view 的 asyncio 版本：下載與轉換在執行緒池中進行，不阻塞事件迴圈
+
+        Returns:
+            Tuple[pd.DataFrame, str]: (炸雞銷售資料（呼叫端不可修改）, 資料版本)
+        """
+        entry = await self._flight.do_async('sales', self._build_sales_entry)
+        return entry['value'], entry['version']
+
+    def data_version(self) -> str:
+        """
+        取得目前銷售資料的版本（由工作表內容與價格設定決定，內容相同時版本相同），
+        不複製資料，供回應快取判斷是否需要重新計算
+
+        Returns:
+            str: 資料版本
+        """
+        return self._get_sales_entry()['version']
+
+    async def get_sales_data_async(self) -> pd.DataFrame:
+        """
+        get_sales_data 的 asyncio 版本：下載與轉換在執行緒池中進行，
+        並與執行緒呼叫端共用進行中的下載
+
+        Returns:
+            pd.DataFrame: 炸雞銷售資料（複本，呼叫端可自由修改）
+        """
+        entry = await self._flight.do_async('sales', self._build_sales_entry)
+        return entry['value'].copy()
+
+    def _get_sales_entry(self) -> Dict:
+        """取得轉換後的銷售資料快取項目（並行的呼叫端共用同一次轉換）"""
+        return self._flight.do('sales', self._build_sales_entry)
+
+    def _build_sales_entry(self) -> Dict:
+        """依目前的原始資料與價格取得轉換結果，兩者都未變更時沿用快取"""
+        raw = self._get_raw()
+        price_snapshot = self.get_price_snapshot()
+
+        with self._lock:
+            sales = self._sales
+        if (sales is None or sales['content_hash'] != raw['content_hash']
+                or sales['price_version'] != price_snapshot.version):
+            with span('sheets.convert', len(raw['value'])) as convert_span:
+                # 轉換會修改傳入的資料表，使用複本以保留快取的原始資料
+                df = self.sheets_reader._convert_to_chicken_sales_format_with_prices(
+                    raw['value'].copy(), price_snapshot.prices
+                )
+                if not df.empty:
+                    # 依日期排序（同日期維持原本順序），明細 API 以位置分頁
+                    df['日期'] = pd.to_datetime(df['日期'])
+                    df = df.sort_values('日期', kind='stable').reset_index(drop=True)
+                convert_span.rows = len(df)
+            # 以價格內容摘要（而非程序內的版本號）計算，多個工作程序的資料版本一致
+            version = hashlib.sha256(
+                (raw['content_hash'] + price_snapshot.digest).encode('utf-8')
+            ).hexdigest()[:16]
+            sales = {'value': df, 'content_hash': raw['content_hash'], 'price_version': price_snapshot.version,
+                     'version': version, 'loaded_at': time.time()}
+            with self._lock:
+                changed = self._sales is None or self._sales['version'] != version
+                self._sales = sales
+                if changed:
+                    self._changed.notify_all()
+        return sales
+
+    def current_version(self) -> Optional[str]:
+        """
+        取得已快取的銷售資料版本（不下載也不轉換，尚未讀取過資料時回傳 None）
+
+        Returns:
+            Optional[str]: 資料版本
+        """
+        with self._lock:
+            return self._sales['version'] if self._sales is not None else None
+
+    def wait_for_change(self, version: Optional[str], timeout: float) -> bool:
+        """
+        等待銷售資料版本變得與 version 不同（背景更新讀到新資料列或價格變更後重新轉換時）
+
+        Args:
+            version (Optional[str]): 呼叫端目前的資料版本
+            timeout (float): 最多等待秒數
+
+        Returns:
+            bool: 版本是否已變更（逾時回傳 False）
+        """
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self._sales is not None and self._sales['version'] != version, timeout
+            )
+
+    def start_refresher(self):
+        """啟動背景更新執行緒（已啟動時不重複啟動）"""
+        if self._refresher is not None:
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name='sheet-refresher', daemon=True)
+        self._refresher.start()
+        logger.info("Google Sheet 背景更新已啟動")
+
+    def stop_refresher(self):
+        """停止背景更新執行緒"""
+        if self._refresher is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._refresher.join()
+        self._refresher = None
+
+    def _next_refresh_delay(self) -> float:
+        """距離下次背景更新的秒數"""
+        with self._lock:
+            entry = self._raw
+        if entry is None:
+            return 0
+        remaining = entry['loaded_at'] + self.sales_ttl_seconds - self.refresh_ahead_seconds - time.time()
+        return max(remaining, 0)
+
+    def _refresh_loop(self):
+        """背景更新：快取到期前重新下載並預先轉換，失敗時保留舊資料"""
+        while not self._stop.is_set():
+            delay = self._next_refresh_delay()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                if self._next_refresh_delay() > 0:
+                    # 被請求喚醒但資料仍在更新時間之前（例如剛由其他呼叫端下載）
+                    continue
+            try:
+                self._flight.do('raw', self._fetch_raw, True)
+                self._get_sales_entry()
+            except Exception as error:
+                logger.warning(f"背景更新 Google Sheet 失敗，繼續使用舊資料: {error}")
+                # 失敗後稍待再試，避免連續重試
+                self._wake.wait(min(self.circuit_breaker.reset_seconds, self.sales_ttl_seconds))
+                self._wake.clear()
+
+    def invalidate(self, prices_only: bool = False):
+        """
+        清除快取（價格更新後呼叫 prices_only=True，下次讀取時重新讀取價格檔，
+        並以快取的原始資料重新轉換）
+
+        Args:
+            prices_only (bool): 只清除價格設定快取
+        """
+        from persistent_price_config import price_registry
+        (self.price_registry or price_registry).invalidate()
+        with self._lock:
+            if not prices_only:
+                self._raw = None
+                self._sales = None
+
+    def cache_info(self) -> Dict:
+        """
+        取得快取狀態，供 API 回應顯示資料新舊程度
+
+        Returns:
+            Dict: 各項資料的快取時間（秒）、TTL 設定、是否為過期資料與斷路器狀態
+        """
+        now = time.time()
+        with self._lock:
+            raw, last_error = self._raw, self._last_error
+        prices = self.get_price_snapshot()
+        return {
+            'sales_age_seconds': round(now - raw['loaded_at'], 1) if raw else None,
+            'prices_age_seconds': round(now - prices.loaded_at, 1),
+            'prices_version': prices.version,
+            'sales_ttl_seconds': self.sales_ttl_seconds,
+            'prices_ttl_seconds': self.prices_ttl_seconds,
+            'stale': raw is not None and now - raw['loaded_at'] >= self.sales_ttl_seconds,
+            'circuit': self.circuit_breaker.state,
+            'last_error': last_error,
+            'coalesced_requests': self._flight.stats()['shared']
+        }
@@ -0,0 +1,221 @@
+"""
+炸雞對帳系統 JSON 序列化
+資料表逐欄轉換為 Python 原生型別（數值維持數值、日期轉為 ISO 字串），
+再直接編碼為 JSON bytes；有安裝 orjson 時使用 orjson，否則使用標準函式庫 json
+
+pandas 與 NumPy 在轉換資料表時才載入，只編碼一般資料的應用程式（例如 Vercel 的 api/index.py）
+匯入本模組不需要載入 pandas
+"""
+import json
+import math
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List
+import logging
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 資料表的輸出形式
+SHAPE_RECORDS = 'records'    # [{欄位: 值}, ...]
+SHAPE_COLUMNS = 'columns'    # {欄位: [值, ...]}
+FRAME_SHAPES = (SHAPE_RECORDS, SHAPE_COLUMNS)
+
+def _iso(value) -> str:
+    """日期時間轉為 ISO 字串（午夜且無時區的時間只輸出日期）"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None and value.hour == 0 and value.minute == 0 and value.second == 0 \
+                and value.microsecond == 0:
+            return value.strftime('%Y-%m-%d')
+        return value.isoformat()
+    return value.isoformat()
+
+def _column_values(series) -> List[Any]:
+    """
+    將單一欄位轉為 Python 原生型別的列表（整欄一次轉換，不逐格判斷型別）
+
+    Args:
+        series (pd.Series): 欄位資料
+
+    Returns:
+        List[Any]: 欄位值，缺漏值為 None
+    """
+    import numpy as np
+    import pandas as pd
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) and dtype != object and not series.hasnans:
+        return series.tolist()
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+        return series.tolist()
+    if pd.api.types.is_float_dtype(dtype) and isinstance(dtype, np.dtype):
+        if not series.hasnans:
+            return series.tolist()
+        return series.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            return [value.isoformat() if pd.notna(value) else None for value in series.tolist()]
+        values = series.to_numpy()
+        missing = np.isnat(values)
+        present = values[~missing]
+        # 全部是午夜時只輸出日期，否則輸出到秒（有小數秒時輸出到微秒）
+        if (present == present.astype('datetime64[D]')).all():
+            unit = 'D'
+        elif (present == present.astype('datetime64[s]')).all():
+            unit = 's'
+        else:
+            unit = 'us'
+        text = np.datetime_as_string(values, unit=unit).astype(object)
+        text[missing] = None
+        return text.tolist()
+    # 字串、可為空整數與混合型別欄位
+    return [to_native(value) for value in series.astype(object).tolist()]
+
+def frame_to_records(df) -> List[Dict[str, Any]]:
+    """
+    資料表轉為記錄列表 [{欄位: 值}, ...]
+
+    Args:
+        df (pd.DataFrame): 資料表
+
+    Returns:
+        List[Dict[str, Any]]: 記錄列表（值為 Python 原生型別）
+    """
+    columns = [str(column) for column in df.columns]
+    values = [_column_values(df.iloc[:, index]) for index in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+def frame_to_columns(df) -> Dict[str, List[Any]]:
+    """
+    資料表轉為欄位形式 {欄位: [值, ...]}（欄位名稱只出現一次，資料量大時較小）
+
+    Args:
+        df (pd.DataFrame): 資料表
+
+    Returns:
+        Dict[str, List[Any]]: 各欄位的值列表
+    """
+    return {str(column): _column_values(df.iloc[:, index]) for index, column in enumerate(df.columns)}
+
+def serialize_frame(df, shape: str = SHAPE_RECORDS):
+    """
+    依輸出形式轉換資料表
+
+    Args:
+        df (pd.DataFrame): 資料表
+        shape (str): 'records' 或 'columns'
+
+    Returns:
+        記錄列表或欄位形式的資料
+    """
+    if shape == SHAPE_COLUMNS:
+        return frame_to_columns(df)
+    if shape == SHAPE_RECORDS:
+        return frame_to_records(df)
+    raise ValueError(f"不支援的資料輸出形式: {shape}")
+
+def to_native(obj, na_value=None):
+    """
+    將 pandas / NumPy 物件遞迴轉為可直接 JSON 序列化的 Python 原生型別
+
+    Args:
+        obj: 要轉換的物件
+        na_value: 缺漏值（NaN、NaT、pd.NA）的替代值
+
+    Returns:
+        轉換後的物件
+    """
+    if obj is None or isinstance(obj, (str, bool, int)):
+        return obj
+    if isinstance(obj, float):
+        return na_value if math.isnan(obj) else obj
+    if isinstance(obj, dict):
+        return {key if isinstance(key, str) else str(to_native(key)): to_native(value, na_value)
+                for key, value in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [to_native(item, na_value) for item in obj]
+    # 尚未載入 pandas / NumPy 時不可能是它們的物件，不需為此載入
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        if isinstance(obj, pd.DataFrame):
+            return frame_to_records(obj)
+        if isinstance(obj, pd.Series):
+            return dict(zip((str(to_native(key)) for key in obj.index), _column_values(obj)))
+        if obj is pd.NaT or obj is pd.NA:
+            return na_value
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            return to_native(obj.tolist(), na_value)
+        if isinstance(obj, np.generic):
+            return to_native(obj.item(), na_value)
+    if isinstance(obj, (datetime, date)):
+        return _iso(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+def _default(obj):
+    """JSON 編碼器無法處理的型別"""
+    value = to_native(obj)
+    if value is obj:
+        raise TypeError(f"無法序列化為 JSON 的型別: {type(obj).__name__}")
+    return value
+
+def dumps(obj) -> bytes:
+    """
+    編碼為 JSON bytes（UTF-8，中文不跳脫，保留欄位順序）
+
+    Args:
+        obj: 要編碼的物件（可包含 NumPy 數值與日期時間）
+
+    Returns:
+        bytes: JSON 內容
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+                            | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def loads(data):
+    """
+    解碼 JSON
+
+    Args:
+        data (str | bytes): JSON 內容
+
+    Returns:
+        解碼後的物件
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class ChickenJSONProvider(DefaultJSONProvider):
+    """Flask JSON 提供者：jsonify 與 request.json 改用本模組編碼與解碼"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # 直接以 bytes 建立回應，不經過字串轉換
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+def init_app(app):
+    """
+    讓 Flask 應用程式使用本模組的 JSON 編碼
+
+    Args:
+        app (Flask): Flask 應用程式
+    """
+    app.json = ChickenJSONProvider(app)
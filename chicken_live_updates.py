@@ -0,0 +1,319 @@
+"""
+炸雞對帳即時更新
+資料服務讀到新的工作表資料列（或價格變更後重新轉換）時，以 Server-Sent Events 推送
+精簡的差異事件：有變動的每日合計與更新後的應付金額，前端不需定時重新載入整份資料
+
+每個資料版本只彙總一次每日合計，所有連線共用；各連線只比較自己日期範圍內的差異
+"""
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+from chicken_json import dumps
+
+logger = logging.getLogger(__name__)
+
+# 事件類型
+EVENT_SNAPSHOT = 'snapshot'
+EVENT_DELTA = 'delta'
+
+class LiveUpdatesBusyError(RuntimeError):
+    """即時更新連線數已達上限"""
+
+def format_event(event: str, data, event_id: str = None) -> bytes:
+    """
+    產生一則 SSE 事件
+
+    Args:
+        event (str): 事件類型
+        data: 事件內容（轉為單行 JSON）
+        event_id (str): 事件 ID（資料版本，重新連線時由瀏覽器以 Last-Event-ID 帶回）
+
+    Returns:
+        bytes: 事件內容
+    """
+    header = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{header}event: {event}\ndata: ".encode('utf-8') + dumps(data) + b'\n\n'
+
+def keepalive() -> bytes:
+    """保持連線的註解（瀏覽器忽略，避免代理伺服器因閒置中斷連線）"""
+    return b': keepalive\n\n'
+
+def resolve_date_range(start_date: str = None, end_date: str = None) -> Tuple[str, str]:
+    """
+    取得日期範圍（與 /api/real_data 相同：沒有提供日期時為最近一週）
+
+    Args:
+        start_date (str): 開始日期 YYYY-MM-DD
+        end_date (str): 結束日期 YYYY-MM-DD
+
+    Returns:
+        Tuple[str, str]: (開始日期, 結束日期)，ISO 格式
+    """
+    if start_date and end_date:
+        return date.fromisoformat(start_date).isoformat(), date.fromisoformat(end_date).isoformat()
+    today = date.today()
+    return (today - timedelta(days=7)).isoformat(), today.isoformat()
+
+class ChickenLiveUpdates:
+    """炸雞對帳即時更新類別"""
+
+    def __init__(self, data_service, calculator, heartbeat_seconds: float = 15,
+                 retry_ms: int = 5000, max_clients: int = 20, max_stream_seconds: float = 300):
+        """
+        初始化即時更新
+
+        Args:
+            data_service (ChickenDataService): 銷售資料服務
+            calculator (ChickenSettlementCalculator): 對帳計算器
+            heartbeat_seconds (float): 沒有更新時送出保持連線註解的間隔（秒），
+                同時也是檢查資料是否到期需要重新下載的間隔
+            retry_ms (int): 連線中斷後瀏覽器重新連線的等待時間（毫秒）
+            max_clients (int): 同時連線數上限（每個連線佔用一個處理執行緒）
+            max_stream_seconds (float): 單一連線最長時間（秒），到期後結束串流由瀏覽器重新連線，
+                讓處理執行緒定期釋放
+        """
+        self.data_service = data_service
+        self.calculator = calculator
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retry_ms = retry_ms
+        self.max_clients = max_clients
+        self.max_stream_seconds = max_stream_seconds
+        self._lock = threading.Lock()
+        self._totals = None
+        self._clients = 0
+
+    # 彙總
+
+    def _daily_totals(self) -> Tuple[str, Dict[str, Dict]]:
+        """
+        取得目前資料版本的每日合計（每個版本只計算一次）
+
+        Returns:
+            Tuple[str, Dict[str, Dict]]: (資料版本, {日期: 合計})
+        """
+        df, version = self.data_service.get_sales_view()
+        with self._lock:
+            if self._totals is not None and self._totals[0] == version:
+                return self._totals
+
+        totals = {}
+        if not df.empty:
+            processed_df = self.calculator.process_chicken_sales_data(df)
+            if not processed_df.empty:
+                grouped = processed_df.groupby(processed_df['日期'].dt.date).agg(
+                    數量=('數量', 'sum'), 小計=('小計', 'sum'), 成本小計=('成本小計', 'sum'),
+                    筆數=('品項', 'size'), 品項=('品項', lambda items: frozenset(items))
+                )
+                for day, row in grouped.iterrows():
+                    totals[day.isoformat()] = {
+                        '數量': float(row['數量']), '小計': float(row['小計']),
+                        '成本小計': float(row['成本小計']), '筆數': int(row['筆數']), '品項': row['品項']
+                    }
+
+        with self._lock:
+            self._totals = (version, totals)
+        return version, totals
+
+    def state(self, start_date: str, end_date: str) -> Tuple[str, Dict[str, Dict], Dict]:
+        """
+        取得日期範圍內的每日合計與對帳金額
+
+        Args:
+            start_date (str): 開始日期 YYYY-MM-DD（含）
+            end_date (str): 結束日期 YYYY-MM-DD（含）
+
+        Returns:
+            Tuple[str, Dict[str, Dict], Dict]: (資料版本, {日期: 每日合計}, 對帳資訊)
+        """
+        version, totals = self._daily_totals()
+        days = {day: values for day, values in totals.items() if start_date <= day <= end_date}
+        return version, {day: self._day_payload(values) for day, values in days.items()}, self._settlement(days)
+
+    @staticmethod
+    def _day_payload(values: Dict) -> Dict:
+        """每日合計（欄位與 /api/real_data 的每日摘要相同）"""
+        return {
+            '總數量': values['數量'],
+            '總金額': round(values['小計'], 2),
+            '總成本': round(values['成本小計'], 2)
+        }
+
+    @staticmethod
+    def _settlement(days: Dict[str, Dict]) -> Dict:
+        """以每日合計計算對帳資訊（欄位與計算方式與 calculate_chicken_settlement 相同）"""
+        total_quantity = sum(values['數量'] for values in days.values())
+        total_amount = sum(values['小計'] for values in days.values())
+        total_cost = sum(values['成本小計'] for values in days.values())
+        products = frozenset().union(*(values['品項'] for values in days.values()))
+        return {
+            '總銷售數量': total_quantity,
+            '總銷售金額': round(total_amount, 2),
+            '總成本': round(total_cost, 2),
+            '總訂單數': sum(values['筆數'] for values in days.values()),
+            '品項種類': len(products),
+            '平均單價': round(total_amount / total_quantity, 2) if total_quantity > 0 else 0,
+            '平均成本': round(total_cost / total_quantity, 2) if total_quantity > 0 else 0,
+            '炸雞老闆應付金額': round(total_cost, 2),
+            '成本比例': round(total_cost / total_amount, 4) if total_amount > 0 else 0,
+            '利潤': round(total_amount - total_cost, 2)
+        }
+
+    @staticmethod
+    def diff(old_days: Dict[str, Dict], old_settlement: Dict,
+             new_days: Dict[str, Dict], new_settlement: Dict) -> Optional[Dict]:
+        """
+        比較兩個版本的差異
+
+        Returns:
+            Optional[Dict]: {'days': 有變動或新增的每日合計, 'removed': 已移除的日期,
+                'settlement': 對帳資訊（有變動時）}；沒有差異時回傳 None
+        """
+        changed = {day: values for day, values in new_days.items() if old_days.get(day) != values}
+        removed = sorted(day for day in old_days if day not in new_days)
+        if not changed and not removed and old_settlement == new_settlement:
+            return None
+        delta = {'days': dict(sorted(changed.items())), 'removed': removed}
+        if old_settlement != new_settlement:
+            delta['settlement'] = new_settlement
+        return delta
+
+    # 串流
+
+    def open_session(self, start_date: str = None, end_date: str = None) -> 'LiveSession':
+        """
+        開啟一個即時更新連線；第一次讀取資料在此完成，讀取失敗時直接拋出錯誤（尚未開始串流）
+
+        Args:
+            start_date (str): 開始日期 YYYY-MM-DD
+            end_date (str): 結束日期 YYYY-MM-DD
+
+        Returns:
+            LiveSession: 連線狀態（結束時須呼叫 close 釋放連線數）
+        """
+        start_date, end_date = resolve_date_range(start_date, end_date)
+        with self._lock:
+            if self._clients >= self.max_clients:
+                raise LiveUpdatesBusyError(f"即時更新連線數已達上限 ({self.max_clients})")
+            self._clients += 1
+        try:
+            return LiveSession(self, start_date, end_date, self.state(start_date, end_date))
+        except Exception:
+            self._release()
+            raise
+
+    def open(self, start_date: str = None, end_date: str = None,
+             last_event_id: str = None) -> Iterator[bytes]:
+        """
+        開啟一個 SSE 串流（WSGI 使用，等待更新時佔用處理執行緒）
+
+        Args:
+            start_date (str): 開始日期 YYYY-MM-DD
+            end_date (str): 結束日期 YYYY-MM-DD
+            last_event_id (str): 瀏覽器重新連線時帶回的資料版本，與目前版本相同時不重送完整內容
+
+        Returns:
+            Iterator[bytes]: SSE 事件（伺服器在連線結束時呼叫 close）
+        """
+        session = self.open_session(start_date, end_date)
+        return _LiveStream(self._stream(session, last_event_id), session)
+
+    def _stream(self, session: 'LiveSession', last_event_id: Optional[str]) -> Iterator[bytes]:
+        """SSE 事件產生器"""
+        yield session.head(last_event_id)
+        deadline = time.monotonic() + self.max_stream_seconds
+        while time.monotonic() < deadline:
+            if not self.data_service.wait_for_change(session.version, self.heartbeat_seconds):
+                # 沒有背景更新時由此觸發到期資料的重新下載（與其他請求共用同一次下載）
+                try:
+                    self.data_service.get_sales_view()
+                except Exception as error:
+                    logger.warning(f"即時更新讀取銷售資料失敗: {error}")
+                if self.data_service.current_version() == session.version:
+                    yield keepalive()
+                    continue
+            event = session.update()
+            if event is not None:
+                yield event
+
+    def _release(self):
+        with self._lock:
+            self._clients -= 1
+
+    @property
+    def clients(self) -> int:
+        """目前連線數"""
+        with self._lock:
+            return self._clients
+
+class LiveSession:
+    """一個即時更新連線的日期範圍與最近送出的內容"""
+
+    def __init__(self, owner: ChickenLiveUpdates, start_date: str, end_date: str,
+                 initial: Tuple[str, Dict, Dict]):
+        self.owner = owner
+        self.start_date = start_date
+        self.end_date = end_date
+        self.version, self.days, self.settlement = initial
+        self._closed = False
+
+    def head(self, last_event_id: Optional[str] = None) -> bytes:
+        """
+        連線開始時送出的內容：重新連線等待時間，以及日期範圍內的完整每日合計
+        （瀏覽器帶回的版本與目前版本相同時只送等待時間）
+        """
+        head = f"retry: {self.owner.retry_ms}\n\n".encode('utf-8')
+        if last_event_id == self.version:
+            return head
+        return head + format_event(EVENT_SNAPSHOT, {
+            'start_date': self.start_date, 'end_date': self.end_date,
+            'days': dict(sorted(self.days.items())), 'settlement': self.settlement
+        }, self.version)
+
+    def update(self) -> Optional[bytes]:
+        """
+        以目前資料版本重新計算，回傳差異事件（日期範圍內沒有變動時回傳 None）
+
+        Returns:
+            Optional[bytes]: SSE 差異事件
+        """
+        try:
+            version, days, settlement = self.owner.state(self.start_date, self.end_date)
+        except Exception as error:
+            logger.warning(f"即時更新計算每日合計失敗: {error}")
+            # 等到下一個版本再比較，避免重複計算同一個失敗的版本
+            self.version = self.owner.data_service.current_version()
+            return keepalive()
+        delta = self.owner.diff(self.days, self.settlement, days, settlement)
+        self.version, self.days, self.settlement = version, days, settlement
+        if delta is None:
+            return None
+        logger.info(f"推送即時更新: {len(delta['days'])} 天有變動，資料版本 {version}")
+        return format_event(EVENT_DELTA, delta, version)
+
+    def close(self):
+        """釋放連線數"""
+        if not self._closed:
+            self._closed = True
+            self.owner._release()
+
+class _LiveStream:
+    """SSE 串流；連線結束時由伺服器呼叫 close 釋放連線數（串流尚未開始就被捨棄時也會釋放）"""
+
+    def __init__(self, events: Iterator[bytes], session: LiveSession):
+        self._events = events
+        self._session = session
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._events)
+
+    def close(self):
+        self._events.close()
+        self._session.close()
+
+    def __del__(self):
+        self._session.close()
@@ -10,10 +10,14 @@ from datetime import datetime, timedelta
 from chicken_sheets_client import ChickenSheetsClient
 from chicken_settlement_calculator import ChickenSettlementCalculator
 from chicken_report_generator import ChickenReportGenerator
+from chicken_report_exporters import REPORT_FORMATS
+from chicken_report_orchestrator import ChickenReportOrchestrator, EXECUTOR_PROCESS
 from chicken_config import (
     GOOGLE_SHEETS_CONFIG, 
     CHICKEN_PRODUCTS_CONFIG, 
-    LOGGING_CONFIG
+    LOGGING_CONFIG,
+    REPORT_CONFIG,
+    REPORT_PROFILES
 )
 
 # 設定日誌
@@ -36,9 +40,24 @@ def main():
     parser.add_argument('--start-date', type=str, help='開始日期 (YYYY-MM-DD)')
     parser.add_argument('--end-date', type=str, help='結束日期 (YYYY-MM-DD)')
     parser.add_argument('--days', type=int, default=14, help='結算天數 (預設14天)')
+    parser.add_argument('--format', choices=REPORT_FORMATS, default=REPORT_CONFIG['FORMAT'],
+                       help=f"報告檔案格式 (預設 {REPORT_CONFIG['FORMAT']})")
+    parser.add_argument('--formats', type=str,
+                       default=','.join(REPORT_CONFIG['FAN_OUT_FORMATS']),
+                       help=f"同時生成的其他報告格式，以逗號分隔 (預設 {','.join(REPORT_CONFIG['FAN_OUT_FORMATS'])})")
+    
+    parser.add_argument('--profile', choices=list(REPORT_PROFILES), default=None,
+                       help='Excel 報告設定檔: quick=快速版, accounting=會計版（明細另存附件）, full=完整版 '
+                            '(預設依照 REPORT_CONFIG 的 INCLUDE_CHARTS / INCLUDE_DETAILS)')
     
     args = parser.parse_args()
     
+    # 主要格式放在第一個，其餘格式同時生成
+    report_formats = [args.format] + [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    for report_format in report_formats:
+        if report_format not in REPORT_FORMATS:
+            parser.error(f"不支援的報告格式: {report_format}（支援: {', '.join(REPORT_FORMATS)}）")
+    
     try:
         if args.mode == 'test':
             # 測試模式
@@ -64,6 +83,8 @@ def main():
             # 建立計算器和報告生成器
             calculator = ChickenSettlementCalculator(chicken_prices)
             report_generator = ChickenReportGenerator()
+            # 命令列的多格式生成以 CPU 為主（openpyxl、CSV 編碼），以程序池避開 GIL
+            orchestrator = ChickenReportOrchestrator(report_generator, executor=EXECUTOR_PROCESS)
             
             # 計算日期範圍
             if args.start_date and args.end_date:
@@ -98,8 +119,9 @@ def main():
             
             # 生成報告檔案
             print("正在生成報告檔案...")
-            excel_file = report_generator.generate_excel_report(settlement_report)
-            text_report = report_generator.generate_text_report(settlement_report)
+            result = orchestrator.generate(settlement_report, report_formats, profile=args.profile)
+            if args.format not in result['files']:
+                raise RuntimeError(f"{args.format} 報告生成失敗: {result['errors'][args.format]}")
             
             # 顯示結果
             print("\n" + "="*60)
@@ -116,7 +138,12 @@ def main():
             print(f"   成本比例: {settlement_report['成本比例']*100:.1f}%")
             print(f"   利潤: ${settlement_report['利潤']:,}")
             print("")
-            print(f"📄 Excel 報告: {excel_file}")
+            for report_format, report_file in result['files'].items():
+                note = "快取" if report_format in result['cached'] else f"{result['timings'][report_format]*1000:.0f} ms"
+                print(f"📄 報告檔案 ({report_format}, {note}): {report_file}")
+            for report_format, error in result['errors'].items():
+                print(f"⚠️  {report_format} 報告生成失敗: {error}")
+            print(f"⏱️  報告生成總耗時: {result['elapsed']*1000:.0f} ms")
             print("="*60)
             
     except KeyboardInterrupt:
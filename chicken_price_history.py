@@ -0,0 +1,309 @@
+"""
+炸雞品項價格歷史
+每次價格變更以一行 JSON 附加到紀錄檔（品項、成本、售價、生效日期、修改者），紀錄只增不改；
+定期將紀錄壓縮為快照檔，載入時只需讀取快照與之後新增的紀錄。
+可查詢任一日期適用的價格表（以二分搜尋找到該日期前最後一次變更），
+讓對帳計算以當時的價格結算過去的期間
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 價格歷史紀錄檔路徑
+PRICE_HISTORY_FILE = 'chicken_price_history.jsonl'
+
+# 每新增多少筆紀錄重新產生一次快照
+SNAPSHOT_EVERY = 200
+
+# 開始記錄歷史時的價格表，視為從最早的日期開始生效
+INITIAL_EFFECTIVE_FROM = '0001-01-01'
+
+def normalize_date(value=None) -> str:
+    """
+    轉換為 ISO 日期字串
+
+    Args:
+        value: 日期（str、date、datetime 或 pandas Timestamp），None 表示今天
+
+    Returns:
+        str: YYYY-MM-DD
+    """
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value).strip().replace('/', '-')[:10]).isoformat()
+
+class ChickenPriceHistory:
+    """炸雞品項價格歷史類別（查詢端不需取得鎖）"""
+
+    def __init__(self, path: str = None, snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        初始化價格歷史
+
+        Args:
+            path (str): 紀錄檔路徑，None 表示使用 PRICE_HISTORY_FILE
+            snapshot_every (int): 每新增多少筆紀錄重新產生一次快照
+        """
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._events = []
+        self._seq = 0
+        self._offset = 0
+        self._file_id = None
+        self._since_snapshot = 0
+        # 各品項最後一次變更的生效日期
+        self._latest = {}
+        # (生效日期清單, 對應的價格表清單)，整組替換，查詢時不需取得鎖
+        self._timeline = ((), ())
+
+    @property
+    def file_path(self) -> str:
+        """紀錄檔路徑"""
+        return self.path or PRICE_HISTORY_FILE
+
+    @property
+    def snapshot_path(self) -> str:
+        """快照檔路徑"""
+        return os.path.splitext(self.file_path)[0] + '.snapshot.json'
+
+    # 查詢
+
+    def prices_as_of(self, when=None) -> Optional[Dict[str, Dict[str, float]]]:
+        """
+        取得指定日期適用的價格表
+
+        Args:
+            when: 日期（str、date、datetime 或 pandas Timestamp），None 表示今天
+
+        Returns:
+            Optional[Dict[str, Dict[str, float]]]: 品項價格對應（不可修改），
+                沒有任何歷史紀錄時回傳 None
+        """
+        self.refresh()
+        dates, tables = self._timeline
+        index = bisect.bisect_right(dates, normalize_date(when)) - 1
+        return tables[index] if index >= 0 else None
+
+    def latest_effective_from(self, item: str) -> Optional[str]:
+        """
+        取得品項最後一次變更的生效日期
+
+        Args:
+            item (str): 品項名稱
+
+        Returns:
+            Optional[str]: YYYY-MM-DD，沒有紀錄時回傳 None
+        """
+        self.refresh()
+        with self._lock:
+            return self._latest.get(item)
+
+    def changes(self, item: str = None) -> List[Dict]:
+        """
+        取得價格變更紀錄（依生效日期排序；載入快照後，同一天同一品項只保留最後一次變更）
+
+        Args:
+            item (str): 只取得此品項，None 表示全部
+
+        Returns:
+            List[Dict]: 變更紀錄
+        """
+        self.refresh()
+        with self._lock:
+            events = sorted(self._events, key=lambda event: (event['effective_from'], event['seq']))
+        return [dict(event) for event in events if item is None or event['item'] == item]
+
+    # 載入
+
+    def _stat(self) -> Optional[Tuple[Tuple[int, int], int]]:
+        """紀錄檔的 (裝置, inode) 與大小，檔案不存在時回傳 None"""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino), st.st_size
+
+    def refresh(self):
+        """讀取其他程序新增的紀錄（紀錄檔未變更時只檢查檔案大小）"""
+        stat = self._stat()
+        if stat is not None and stat[0] == self._file_id and stat[1] == self._offset:
+            return
+        with self._lock:
+            self._refresh_locked(self._stat())
+
+    def _refresh_locked(self, stat):
+        if stat is None:
+            if self._file_id is not None:
+                self._reset([], 0, None)
+            return
+        file_id, size = stat
+        if file_id != self._file_id or size < self._offset:
+            # 紀錄檔被取代，重新由快照載入
+            self._load(file_id)
+        elif size > self._offset:
+            events, self._offset = self._read_log(self._offset)
+            self._since_snapshot += len(events)
+            self._apply(events)
+
+    def _load(self, file_id):
+        """由快照與之後新增的紀錄載入"""
+        events, offset = [], 0
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            events, offset = snapshot['events'], snapshot['log_offset']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning(f"價格歷史快照無法使用，改為讀取完整紀錄: {error}")
+        stat = self._stat()
+        if stat is None or offset > stat[1]:
+            events, offset = [], 0
+        tail, offset = self._read_log(offset)
+        self._reset(events + tail, offset, file_id)
+        self._since_snapshot = len(tail)
+
+    def _read_log(self, offset: int) -> Tuple[List[Dict], int]:
+        """
+        讀取紀錄檔中 offset 之後的完整紀錄
+
+        Returns:
+            Tuple[List[Dict], int]: (紀錄, 已讀取到的位置)
+        """
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # 只處理完整的行（其他程序可能正在寫入最後一行）
+        end = data.rfind(b'\n') + 1
+        events = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    events.append(json.loads(line))
+                except ValueError as error:
+                    logger.warning(f"略過無法解析的價格歷史紀錄: {error}")
+        return events, offset + end
+
+    def _reset(self, events: List[Dict], offset: int, file_id):
+        self._events = []
+        self._latest = {}
+        self._seq = 0
+        self._offset = offset
+        self._file_id = file_id
+        self._timeline = ((), ())
+        self._apply(events, rebuild=True)
+
+    def _apply(self, events: List[Dict], rebuild: bool = False):
+        """加入紀錄並更新價格表時間軸（新紀錄都在最後生效日期之後時只延伸時間軸）"""
+        if not events and not rebuild:
+            return
+        self._events.extend(events)
+        self._seq = max([self._seq] + [event['seq'] for event in events])
+        for event in events:
+            if event['effective_from'] > self._latest.get(event['item'], ''):
+                self._latest[event['item']] = event['effective_from']
+        dates, tables = self._timeline
+        if not rebuild and dates and min(event['effective_from'] for event in events) >= dates[-1]:
+            dates, tables = list(dates), list(tables)
+            pending = sorted(events, key=lambda event: (event['effective_from'], event['seq']))
+        else:
+            dates, tables = [], []
+            pending = sorted(self._events, key=lambda event: (event['effective_from'], event['seq']))
+
+        from persistent_price_config import freeze_prices
+        table = dict(tables[-1]) if tables else {}
+        for index, event in enumerate(pending):
+            table[event['item']] = {'cost': event['cost'], 'price': event['price']}
+            last_of_day = index + 1 == len(pending) or pending[index + 1]['effective_from'] != event['effective_from']
+            if last_of_day:
+                if dates and dates[-1] == event['effective_from']:
+                    tables[-1] = freeze_prices(table)
+                else:
+                    dates.append(event['effective_from'])
+                    tables.append(freeze_prices(table))
+        self._timeline = (tuple(dates), tuple(tables))
+
+    # 記錄
+
+    def record(self, changes: Dict[str, Dict[str, float]], effective_from=None, author: str = None,
+               base_prices: Dict[str, Dict[str, float]] = None) -> List[Dict]:
+        """
+        附加價格變更紀錄（呼叫端須持有價格檔寫入鎖，與價格檔一併更新）
+
+        Args:
+            changes (Dict[str, Dict[str, float]]): 品項與新的 cost、price
+            effective_from: 生效日期，None 表示今天
+            author (str): 修改者
+            base_prices (Dict[str, Dict[str, float]]): 變更前的價格表；尚無歷史紀錄時
+                先記錄為最早的價格，之前的期間以此價格結算
+
+        Returns:
+            List[Dict]: 新增的紀錄
+        """
+        effective_from = normalize_date(effective_from)
+        recorded_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._refresh_locked(self._stat())
+            entries = []
+            if not self._events and base_prices:
+                entries += [(item, info, INITIAL_EFFECTIVE_FROM, 'initial') for item, info in base_prices.items()]
+            entries += [(item, info, effective_from, author) for item, info in changes.items()]
+
+            events = []
+            for item, info, entry_effective_from, entry_author in entries:
+                self._seq += 1
+                events.append({
+                    'seq': self._seq, 'item': item, 'cost': info['cost'], 'price': info['price'],
+                    'effective_from': entry_effective_from, 'author': entry_author, 'recorded_at': recorded_at
+                })
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events))
+                f.flush()
+                os.fsync(f.fileno())
+                offset = f.tell()
+            stat = self._stat()
+            if self._file_id is None:
+                self._file_id = stat[0]
+            self._offset = offset
+            self._apply(events)
+
+            self._since_snapshot += len(events)
+            if self._since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+        return events
+
+    def compact(self):
+        """重新產生快照（呼叫端須持有價格檔寫入鎖）"""
+        with self._lock:
+            self._refresh_locked(self._stat())
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """將目前的紀錄壓縮為快照：同一天同一品項只保留最後一次變更"""
+        from persistent_price_config import write_json_atomic
+        latest = {}
+        for event in self._events:
+            key = (event['effective_from'], event['item'])
+            if key not in latest or latest[key]['seq'] < event['seq']:
+                latest[key] = event
+        events = sorted(latest.values(), key=lambda event: (event['effective_from'], event['seq']))
+        try:
+            write_json_atomic(self.snapshot_path, {'log_offset': self._offset, 'events': events})
+        except OSError as error:
+            logger.warning(f"無法寫入價格歷史快照: {error}")
+            return
+        self._since_snapshot = 0
+        logger.info(f"價格歷史快照已更新（{len(events)} 筆，紀錄檔位置 {self._offset}）")
+
+# 共用的價格歷史
+price_history = ChickenPriceHistory()
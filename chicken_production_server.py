@@ -0,0 +1,311 @@
+"""
+炸雞對帳系統生產環境伺服器
+主程序先載入 pandas、openpyxl 與對帳模組並讀取銷售資料，再 fork 出多個工作程序，
+工作程序共用同一個監聽 socket 並以 copy-on-write 共用已載入的記憶體；
+每個工作程序以多執行緒處理請求，不支援 fork 的平台改以單一程序多執行緒執行
+"""
+import importlib
+import os
+import signal
+import threading
+import time
+from typing import List
+import logging
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+class FirstRequestLogger:
+    """WSGI 中介層：記錄每個程序從啟動到收到第一個請求的時間"""
+
+    def __init__(self, wsgi_app, started_at: float, on_first_request=None):
+        """
+        初始化
+
+        Args:
+            wsgi_app: 原本的 WSGI 應用程式
+            started_at (float): 啟動時間（time.time()）
+            on_first_request (Callable[[], None]): 每個程序收到第一個請求時呼叫（已在 fork 之後）
+        """
+        self.wsgi_app = wsgi_app
+        self.started_at = started_at
+        self.on_first_request = on_first_request
+        self._lock = threading.Lock()
+        self._logged_pid = None
+
+    def __call__(self, environ, start_response):
+        if self._logged_pid != os.getpid():
+            with self._lock:
+                # fork 後的工作程序各自記錄一次
+                if self._logged_pid != os.getpid():
+                    self._logged_pid = os.getpid()
+                    logger.info(f"程序 {os.getpid()} 收到第一個請求 {environ.get('PATH_INFO')}，"
+                                f"距離啟動 {time.time() - self.started_at:.2f} 秒")
+                    if self.on_first_request is not None:
+                        self.on_first_request()
+        return self.wsgi_app(environ, start_response)
+
+def preload(modules: List[str]) -> float:
+    """
+    預先載入模組
+
+    Args:
+        modules (List[str]): 模組名稱
+
+    Returns:
+        float: 載入花費的秒數
+    """
+    started = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as error:
+            logger.warning(f"無法預先載入模組 {name}: {error}")
+    return time.perf_counter() - started
+
+def warmup(data_service) -> bool:
+    """
+    讀取銷售資料與價格，讓第一個請求不需等待 Google Sheet
+
+    Args:
+        data_service (ChickenDataService): 資料服務
+
+    Returns:
+        bool: 是否成功（失敗時仍可啟動，第一個請求再重新讀取）
+    """
+    started = time.perf_counter()
+    try:
+        data_service.get_prices()
+        df, _ = data_service.get_sales_view()
+    except Exception as error:
+        logger.warning(f"預先讀取銷售資料失敗，將於收到請求時重新讀取: {error}")
+        return False
+    logger.info(f"已預先讀取 {len(df)} 筆銷售資料，花費 {time.perf_counter() - started:.2f} 秒")
+    return True
+
+def prepare(config: dict = None, started_at: float = None):
+    """
+    載入網頁應用程式並完成啟動前準備（預先載入模組、讀取資料、同步報告索引、記錄第一個請求時間）
+
+    Args:
+        config (dict): 伺服器設定，None 表示使用 PRODUCTION_SERVER_CONFIG
+        started_at (float): 啟動時間，None 表示現在
+
+    Returns:
+        Flask: 網頁應用程式
+    """
+    if config is None:
+        from chicken_config import PRODUCTION_SERVER_CONFIG
+        config = PRODUCTION_SERVER_CONFIG
+    started_at = started_at or time.time()
+
+    elapsed = preload(config['PRELOAD_MODULES'])
+    import simple_chicken_web as web
+    logger.info(f"已預先載入 {len(config['PRELOAD_MODULES'])} 個模組，花費 {elapsed:.2f} 秒")
+    if config['WARMUP']:
+        warmup(web.data_service)
+    # 在 fork 之前同步一次報告索引，工作程序不需各自掃描報告目錄
+    web.sync_report_store()
+
+    if not isinstance(web.app.wsgi_app, FirstRequestLogger):
+        # 由其他 WSGI 伺服器（mod_wsgi、gunicorn --preload）載入時，各工作程序在 fork 之後
+        # 收到第一個請求時才啟動資料背景更新
+        web.app.wsgi_app = FirstRequestLogger(web.app.wsgi_app, started_at, web.start_background_refresh)
+    return web.app
+
+class ChickenProductionServer:
+    """預先 fork 的多程序多執行緒 WSGI 伺服器"""
+
+    def __init__(self, app, host: str = '0.0.0.0', port: int = 5000, workers: int = 2, threads: int = 8,
+                 graceful_timeout: float = 10, data_service=None, background_refresh: bool = False):
+        """
+        初始化伺服器
+
+        Args:
+            app: WSGI 應用程式
+            host (str): 監聽位址
+            port (int): 監聽埠號
+            workers (int): 工作程序數（0 表示依 CPU 數量）
+            threads (int): 每個工作程序的執行緒數
+            graceful_timeout (float): 停止時等待工作程序結束的秒數
+            data_service (ChickenDataService): 資料服務（fork 前停止背景更新，工作程序內重新啟動）
+            background_refresh (bool): 工作程序是否啟動資料背景更新
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.data_service = data_service
+        self.background_refresh = background_refresh
+        self._server = None
+        self._slots = threading.BoundedSemaphore(threads)
+        self._children = {}
+        self._running = False
+
+    def _make_server(self):
+        """建立監聽 socket 與多執行緒 WSGI 伺服器"""
+        server = make_server(self.host, self.port, self.app, threaded=True)
+        # 同時處理的請求數以執行緒數為上限（超過時在 socket 佇列中等待）
+        semaphore = self._slots
+        process_request = server.process_request
+
+        def limited_process_request(request, client_address):
+            semaphore.acquire()
+            try:
+                process_request(request, client_address)
+            except Exception:
+                semaphore.release()
+                raise
+
+        def process_request_thread(request, client_address, _thread=server.process_request_thread):
+            try:
+                _thread(request, client_address)
+            finally:
+                semaphore.release()
+
+        server.process_request = limited_process_request
+        server.process_request_thread = process_request_thread
+        return server
+
+    def serve_forever(self, started_at: float = None):
+        """
+        啟動伺服器，直到收到 SIGTERM 或 SIGINT
+
+        Args:
+            started_at (float): 啟動時間，用於記錄開始接受請求所需的時間
+        """
+        started_at = started_at or time.time()
+        self._server = self._make_server()
+        if self.workers <= 1 or not hasattr(os, 'fork'):
+            logger.info(f"以單一程序 {self.threads} 個執行緒於 {self.host}:{self.port} 提供服務，"
+                        f"啟動花費 {time.time() - started_at:.2f} 秒")
+            self._start_refresher()
+            try:
+                self._server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                self._server.server_close()
+            return
+
+        # fork 前停止背景執行緒，避免工作程序繼承被鎖住的狀態
+        if self.data_service is not None:
+            self.data_service.stop_refresher()
+        self._running = True
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info(f"已啟動 {self.workers} 個工作程序（每個 {self.threads} 個執行緒）"
+                    f"於 {self.host}:{self.port}，開始接受請求花費 {time.time() - started_at:.2f} 秒")
+        self._supervise()
+
+    def _start_refresher(self):
+        """啟動資料背景更新"""
+        if self.data_service is not None and self.background_refresh:
+            self.data_service.start_refresher()
+
+    def _spawn(self):
+        """fork 一個工作程序"""
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.time()
+            return
+        # 工作程序：由主程序負責處理 Ctrl+C
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=self._server.shutdown).start())
+        exit_code = 0
+        try:
+            self._start_refresher()
+            self._server.serve_forever()
+            self._drain()
+        except Exception as error:
+            logger.error(f"工作程序 {os.getpid()} 發生錯誤: {error}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _drain(self):
+        """等待進行中的請求完成（最多 graceful_timeout 秒）"""
+        deadline = time.monotonic() + self.graceful_timeout
+        for _ in range(self.threads):
+            if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                logger.warning(f"工作程序 {os.getpid()} 仍有請求未完成，強制結束")
+                return
+
+    def _handle_stop(self, signum, frame):
+        """主程序收到停止訊號：通知所有工作程序結束"""
+        if not self._running:
+            return
+        self._running = False
+        logger.info("正在停止工作程序...")
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        signal.signal(signal.SIGALRM, self._handle_timeout)
+        signal.alarm(max(int(self.graceful_timeout), 1))
+
+    def _handle_timeout(self, signum, frame):
+        """工作程序未在時限內結束，強制結束"""
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self):
+        """等待工作程序結束，異常結束時重新啟動"""
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._children.pop(pid, None)
+            if started is None or not self._running:
+                continue
+            logger.warning(f"工作程序 {pid} 已結束（狀態 {status}），重新啟動")
+            if time.time() - started < 1:
+                # 啟動後立即結束時稍候再重試，避免不斷 fork
+                time.sleep(1)
+            self._spawn()
+        signal.alarm(0)
+        self._server.server_close()
+        logger.info("伺服器已停止")
+
+def serve(app=None, config: dict = None, started_at: float = None, **overrides):
+    """
+    依設定啟動生產環境伺服器
+
+    Args:
+        app (Flask): 已由 prepare 準備好的網頁應用程式，None 表示在此準備
+        config (dict): 伺服器設定，None 表示使用 PRODUCTION_SERVER_CONFIG
+        started_at (float): 啟動時間，None 表示現在
+        **overrides: 覆寫設定值（host、port、workers、threads）
+    """
+    from chicken_config import DATA_SERVICE_CONFIG
+    if config is None:
+        from chicken_config import PRODUCTION_SERVER_CONFIG
+        config = PRODUCTION_SERVER_CONFIG
+    started_at = started_at or time.time()
+
+    if app is None:
+        app = prepare(config, started_at)
+    import simple_chicken_web as web
+    server = ChickenProductionServer(
+        app,
+        host=overrides.get('host') or config['HOST'],
+        port=overrides.get('port') or config['PORT'],
+        workers=overrides.get('workers') if overrides.get('workers') is not None else config['WORKERS'],
+        threads=overrides.get('threads') or config['THREADS'],
+        graceful_timeout=config['GRACEFUL_TIMEOUT'],
+        data_service=web.data_service,
+        background_refresh=DATA_SERVICE_CONFIG['BACKGROUND_REFRESH']
+    )
+    if server.workers > 1 and web.report_jobs.store is None:
+        logger.warning("背景報告工作狀態未共用（REPORT_JOB_CONFIG['SHARED_STATE']），"
+                       "多個工作程序時查詢工作狀態可能回應「工作不存在」")
+    server.serve_forever(started_at)
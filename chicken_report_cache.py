@@ -0,0 +1,241 @@
+"""
+炸雞對帳報告快取
+以報告輸入內容的雜湊值為鍵，相同資料直接回傳既有的報告檔案
+
+索引檔可由多個工作程序共用：寫入時取得檔案鎖，重新讀取磁碟上的索引後合併再寫入；
+查詢時只在索引檔變更時重新讀取，命中時不寫入檔案（最近使用時間在下次寫入時一併保存）。
+快取的讀寫錯誤一律視為未命中，不影響報告生成
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class ChickenReportCache:
+    """炸雞對帳報告快取類別"""
+
+    def __init__(self, cache_dir: str, index_file: str = '.report_cache_index.json',
+                 max_total_bytes: int = 200 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600, on_remove=None):
+        """
+        初始化報告快取
+
+        Args:
+            cache_dir (str): 快取檔案所在目錄（通常為報告輸出目錄）
+            index_file (str): 索引檔名，記錄雜湊值與檔案路徑的對應
+            max_total_bytes (int): 快取檔案總大小上限
+            max_age_seconds (float): 快取檔案最長保存時間（秒）
+            on_remove (Callable[[str], None]): 淘汰並刪除快取檔案後呼叫，參數為檔案路徑
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, index_file)
+        self.max_total_bytes = max_total_bytes
+        self.max_age_seconds = max_age_seconds
+        self.on_remove = on_remove
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_key = None
+        # 尚未寫入索引檔的最近使用時間
+        self._accessed = {}
+
+    def _stat_index(self) -> Optional[Tuple[int, int, int]]:
+        """索引檔的 inode、修改時間與大小，檔案不存在時回傳 None"""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load_index(self):
+        """索引檔變更時重新讀取（呼叫端須持有 self._lock），檔案損壞時視為空快取"""
+        key = self._stat_index()
+        if key == self._index_key:
+            return
+        index = {}
+        if key is not None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as error:
+                logger.warning(f"讀取報告快取索引失敗，重新建立: {error}")
+        self._index = index
+        self._index_key = key
+
+    @contextmanager
+    def _index_lock(self):
+        """取得索引檔的寫入鎖（同一程序內的執行緒與多個工作程序之間互斥），並載入最新的索引"""
+        with self._lock:
+            try:
+                import fcntl
+            except ImportError:
+                # 沒有 fcntl 的平台（Windows）只在程序內互斥
+                self._load_index()
+                self._merge_accessed()
+                yield
+                return
+            with open(self.index_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._load_index()
+                    self._merge_accessed()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge_accessed(self):
+        """將查詢命中的最近使用時間合併到索引"""
+        for key, accessed_at in self._accessed.items():
+            entry = self._index.get(key)
+            if entry is not None and accessed_at > entry['last_access']:
+                entry['last_access'] = accessed_at
+        self._accessed.clear()
+
+    def _save_index(self):
+        """寫入索引檔（呼叫端須持有 _index_lock；以唯一的暫存檔寫入後取代，避免寫到一半的索引）"""
+        from persistent_price_config import write_json_atomic
+        write_json_atomic(self.index_path, self._index)
+        self._index_key = self._stat_index()
+
+    @staticmethod
+    def _update_hash(hasher, value):
+        """將單一報告欄位值加入雜湊"""
+        if isinstance(value, pd.DataFrame):
+            hasher.update(repr(list(value.columns)).encode('utf-8'))
+            hasher.update(repr([str(dtype) for dtype in value.dtypes]).encode('utf-8'))
+            if not value.empty:
+                hasher.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        else:
+            hasher.update(repr(value).encode('utf-8'))
+
+    def compute_key(self, settlement_report: Dict, price_version=None,
+                    generator_version: str = '', report_format: str = 'excel') -> str:
+        """
+        計算報告輸入內容的雜湊值
+
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料（含期間與各摘要資料表）
+            price_version: 價格設定版本
+            generator_version (str): 報告生成器版本
+            report_format (str): 報告格式
+
+        Returns:
+            str: SHA-256 雜湊值
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f"{generator_version}|{report_format}|{price_version!r}".encode('utf-8'))
+        for key in sorted(settlement_report):
+            hasher.update(key.encode('utf-8'))
+            self._update_hash(hasher, settlement_report[key])
+        return hasher.hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        查詢快取
+
+        Args:
+            key (str): 報告雜湊值
+
+        Returns:
+            Optional[str]: 既有報告檔案路徑，沒有命中時回傳 None
+        """
+        try:
+            with self._lock:
+                self._load_index()
+                entry = self._index.get(key)
+                if entry is None:
+                    return None
+                path = entry['path']
+                # 檔案已被刪除或過期時視為未命中，索引在下次寫入時清除
+                if not os.path.exists(path) or time.time() - entry['created_at'] > self.max_age_seconds:
+                    return None
+                self._accessed[key] = time.time()
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.warning(f"查詢報告快取失敗，視為未命中: {error}")
+            return None
+        logger.info(f"報告快取命中: {path}")
+        return path
+
+    def store(self, key: str, filepath: str):
+        """
+        登錄新生成的報告檔案並執行淘汰
+
+        Args:
+            key (str): 報告雜湊值
+            filepath (str): 報告檔案路徑
+        """
+        try:
+            with self._index_lock():
+                # 同一路徑被覆寫時，舊的雜湊值已不再對應檔案內容
+                for old_key in [k for k, entry in self._index.items() if entry['path'] == filepath]:
+                    del self._index[old_key]
+
+                now = time.time()
+                self._index[key] = {
+                    'path': filepath,
+                    'size': os.path.getsize(filepath),
+                    'created_at': now,
+                    'last_access': now
+                }
+                self._evict_locked()
+                self._save_index()
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.warning(f"登錄報告快取失敗: {error}")
+
+    def evict(self) -> int:
+        """
+        依保存時間與總大小淘汰快取檔案
+
+        Returns:
+            int: 淘汰的檔案數量
+        """
+        try:
+            with self._index_lock():
+                removed = self._evict_locked()
+                self._save_index()
+                return removed
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.warning(f"淘汰報告快取失敗: {error}")
+            return 0
+
+    def _evict_locked(self) -> int:
+        """淘汰過期檔案，再依最近使用時間淘汰至總大小上限以內"""
+        now = time.time()
+        removed = 0
+
+        for key, entry in list(self._index.items()):
+            if not os.path.exists(entry['path']):
+                del self._index[key]
+            elif now - entry['created_at'] > self.max_age_seconds:
+                self._remove_entry(key)
+                removed += 1
+
+        total_size = sum(entry['size'] for entry in self._index.values())
+        if total_size > self.max_total_bytes:
+            for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+                if total_size <= self.max_total_bytes:
+                    break
+                total_size -= entry['size']
+                self._remove_entry(key)
+                removed += 1
+
+        if removed:
+            logger.info(f"報告快取淘汰 {removed} 個檔案")
+        return removed
+
+    def _remove_entry(self, key: str):
+        """刪除快取項目與對應檔案"""
+        entry = self._index.pop(key)
+        try:
+            os.remove(entry['path'])
+        except OSError as error:
+            logger.warning(f"刪除快取報告失敗 {entry['path']}: {error}")
+            return
+        if self.on_remove is not None:
+            self.on_remove(entry['path'])
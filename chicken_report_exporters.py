@@ -0,0 +1,250 @@
+"""
+炸雞對帳報告匯出器
+提供 CSV、NDJSON、Parquet 等 Excel 以外的報告格式
+"""
+import csv
+import gzip
+import json
+import math
+from typing import Dict, Iterator, List, Tuple
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 摘要欄位（依報告顯示順序）
+SUMMARY_FIELDS = [
+    '期間', '總銷售金額', '總銷售數量', '總訂單數', '品項種類',
+    '平均單價', '炸雞老闆應付金額', '成本比例', '利潤'
+]
+
+# 報告資料表：(區段代號, 報告欄位名稱)
+TABLE_SECTIONS = [
+    ('product_summary', '品項摘要'),
+    ('daily_summary', '每日摘要'),
+    ('detail', '詳細資料')
+]
+
+def to_native(value):
+    """將 NumPy / pandas 純量轉換為 Python 原生型別"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+# 逐段轉換資料表時每段的資料列數
+ROW_CHUNK_SIZE = 5000
+
+def missing_to_none(value):
+    """NaN 與無限大轉為 None（JSON 寫為 null，CSV 寫為空白欄位）"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+class ChickenReportModel:
+    """所有匯出格式共用的報告資料模型"""
+
+    def __init__(self, settlement_report: Dict):
+        """
+        由對帳報告建立資料模型
+
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+        """
+        self.period = settlement_report.get('期間', '')
+        self.summary = [(field, missing_to_none(to_native(settlement_report.get(field, 0))))
+                        for field in SUMMARY_FIELDS]
+        self.tables = []
+        for section, key in TABLE_SECTIONS:
+            df = settlement_report.get(key)
+            if df is None:
+                df = pd.DataFrame()
+            self.tables.append((section, key, df))
+
+    def get_table(self, section: str) -> pd.DataFrame:
+        """依區段代號取得資料表"""
+        for table_section, _, df in self.tables:
+            if table_section == section:
+                return df
+        raise KeyError(section)
+
+    @staticmethod
+    def iter_rows(df: pd.DataFrame, chunk_rows: int = ROW_CHUNK_SIZE) -> Tuple[List[str], Iterator[tuple]]:
+        """
+        逐段將資料表轉為 Python 原生值的資料列（日期轉為 ISO 字串，缺值轉為 None），
+        每次只轉換 chunk_rows 列，不需一次建立整個資料表的複本
+
+        Args:
+            df (pd.DataFrame): 資料表
+            chunk_rows (int): 每段的資料列數
+
+        Returns:
+            Tuple[List[str], Iterator[tuple]]: (欄位名稱, 資料列)
+        """
+        columns = [str(col) for col in df.columns]
+        dates = [pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]
+        # 只有浮點數、日期與混合型別的欄位可能含有 NaN（缺值或 NaT 轉換後）
+        nullable = [dtype.kind in 'fOM' for dtype in df.dtypes]
+
+        def rows():
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                values = []
+                for position in range(chunk.shape[1]):
+                    series = chunk.iloc[:, position]
+                    column = series.dt.strftime('%Y-%m-%d').tolist() if dates[position] else series.tolist()
+                    if nullable[position]:
+                        column = [missing_to_none(value) for value in column]
+                    values.append(column)
+                yield from zip(*values)
+
+        return columns, rows()
+
+class CsvReportExporter:
+    """CSV 匯出器：各區段依序寫入，區段之間以空白列分隔"""
+
+    extension = 'csv'
+
+    def export(self, model: ChickenReportModel, filepath: str) -> str:
+        """
+        匯出報告
+
+        Args:
+            model (ChickenReportModel): 報告資料模型
+            filepath (str): 輸出檔案路徑
+
+        Returns:
+            str: 檔案路徑
+        """
+        with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['摘要'])
+            writer.writerows(model.summary)
+
+            for _, title, df in model.tables:
+                if df.empty:
+                    continue
+                columns, rows = model.iter_rows(df)
+                writer.writerow([])
+                writer.writerow([title])
+                writer.writerow(columns)
+                writer.writerows(rows)
+        return filepath
+
+class DetailCsvReportExporter:
+    """詳細資料 CSV 匯出器：只輸出詳細資料表並以 gzip 壓縮，作為精簡 Excel 報告的明細附件"""
+
+    extension = 'csv.gz'
+
+    def export(self, model: ChickenReportModel, filepath: str) -> str:
+        """
+        匯出報告
+
+        Args:
+            model (ChickenReportModel): 報告資料模型
+            filepath (str): 輸出檔案路徑
+
+        Returns:
+            str: 檔案路徑
+        """
+        columns, rows = model.iter_rows(model.get_table('detail'))
+        with gzip.open(filepath, 'wt', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        return filepath
+
+class NdjsonReportExporter:
+    """NDJSON 匯出器：每行一筆 JSON，第一行為摘要，其後為各資料表的資料列"""
+
+    extension = 'ndjson'
+
+    def export(self, model: ChickenReportModel, filepath: str) -> str:
+        """
+        匯出報告
+
+        Args:
+            model (ChickenReportModel): 報告資料模型
+            filepath (str): 輸出檔案路徑
+
+        Returns:
+            str: 檔案路徑
+        """
+        with open(filepath, 'w', encoding='utf-8') as f:
+            summary = {'section': 'summary'}
+            summary.update(model.summary)
+            f.write(json.dumps(summary, ensure_ascii=False, allow_nan=False))
+            f.write('\n')
+
+            for section, _, df in model.tables:
+                if df.empty:
+                    continue
+                columns, rows = model.iter_rows(df)
+                for row in rows:
+                    record = {'section': section}
+                    record.update(zip(columns, row))
+                    f.write(json.dumps(record, ensure_ascii=False, allow_nan=False))
+                    f.write('\n')
+        return filepath
+
+class ParquetReportExporter:
+    """Parquet 匯出器：詳細資料以欄位型別儲存，摘要與彙總表放在檔案中繼資料"""
+
+    extension = 'parquet'
+
+    def export(self, model: ChickenReportModel, filepath: str) -> str:
+        """
+        匯出報告
+
+        Args:
+            model (ChickenReportModel): 報告資料模型
+            filepath (str): 輸出檔案路徑
+
+        Returns:
+            str: 檔案路徑
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("匯出 Parquet 格式需要安裝 pyarrow 套件 (pip install pyarrow)")
+
+        table = pa.Table.from_pandas(model.get_table('detail'), preserve_index=False)
+
+        # 日期存為 date32，品項存為字典編碼字串
+        fields = []
+        for field in table.schema:
+            if pa.types.is_timestamp(field.type):
+                fields.append(pa.field(field.name, pa.date32()))
+            elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                fields.append(pa.field(field.name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(field)
+        table = table.cast(pa.schema(fields))
+
+        metadata = {
+            'chicken_report.summary': dict(model.summary),
+        }
+        for section, _, df in model.tables:
+            if section != 'detail' and not df.empty:
+                columns, rows = model.iter_rows(df)
+                metadata[f'chicken_report.{section}'] = [dict(zip(columns, row)) for row in rows]
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata.update({
+            key.encode('utf-8'): json.dumps(value, ensure_ascii=False).encode('utf-8')
+            for key, value in metadata.items()
+        })
+        table = table.replace_schema_metadata(schema_metadata)
+
+        pq.write_table(table, filepath, compression='snappy')
+        return filepath
+
+# 可選的匯出格式（'excel' 與 'text' 由 ChickenReportGenerator 直接處理）
+REPORT_EXPORTERS = {
+    'csv': CsvReportExporter,
+    'detail_csv': DetailCsvReportExporter,
+    'json': NdjsonReportExporter,
+    'parquet': ParquetReportExporter
+}
+
+# 所有支援的報告格式
+REPORT_FORMATS = ['excel', 'text'] + list(REPORT_EXPORTERS)
@@ -4,28 +4,164 @@
 """
 import pandas as pd
 import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Dict, List
 import logging
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.chart import BarChart, PieChart, Reference
+from chicken_config import REPORT_CONFIG, REPORT_PROFILES, REPORT_CACHE_CONFIG, REPORT_STORE_CONFIG
+from chicken_report_cache import ChickenReportCache
+from chicken_report_store import ChickenReportStore
+from chicken_report_exporters import ChickenReportModel, REPORT_EXPORTERS, REPORT_FORMATS
+from chicken_timing import span
 
 logger = logging.getLogger(__name__)
 
+# 報告生成器版本，報告版面變更時需更新以避免沿用舊的快取報告
+GENERATOR_VERSION = '1.2'
+
+# Excel 工作表（XML 1.0）不允許的控制字元（與 openpyxl 的 ILLEGAL_CHARACTERS_RE 相同）
+_ILLEGAL_EXCEL_CHARACTERS = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+def excel_value(value):
+    """
+    移除字串中 Excel 工作表不允許的控制字元（例如由 Google Sheet 貼上的字元），其他值原樣回傳
+
+    Args:
+        value: 儲存格的值
+
+    Returns:
+        可寫入 Excel 儲存格的值
+    """
+    if isinstance(value, str):
+        return _ILLEGAL_EXCEL_CHARACTERS.sub('', value)
+    return value
+
+def resolve_report_profile(profile: str = None) -> Dict:
+    """
+    取得報告設定檔的選項
+    
+    Args:
+        profile (str): 設定檔名稱（見 REPORT_PROFILES），
+            None 表示依照 REPORT_CONFIG 的 INCLUDE_CHARTS / INCLUDE_DETAILS 設定
+        
+    Returns:
+        Dict: {'INCLUDE_CHARTS': bool, 'INCLUDE_DETAILS': bool, 'DETAIL_ATTACHMENT': bool}
+    """
+    if profile is None:
+        return {
+            'INCLUDE_CHARTS': REPORT_CONFIG['INCLUDE_CHARTS'],
+            'INCLUDE_DETAILS': REPORT_CONFIG['INCLUDE_DETAILS'],
+            'DETAIL_ATTACHMENT': False
+        }
+    if profile not in REPORT_PROFILES:
+        raise ValueError(f"不支援的報告設定檔: {profile}（支援: {', '.join(REPORT_PROFILES)}）")
+    return dict(REPORT_PROFILES[profile])
+
+def cache_format_key(report_format: str, options: Dict = None) -> str:
+    """
+    快取鍵中的格式欄位（Excel 報告依設定檔內容區分）
+    
+    Args:
+        report_format (str): 報告格式
+        options (Dict): 報告設定檔選項
+        
+    Returns:
+        str: 格式欄位
+    """
+    if report_format != 'excel' or options is None:
+        return report_format
+    return f"excel|charts={int(options['INCLUDE_CHARTS'])}|details={int(options['INCLUDE_DETAILS'])}"
+
+def summary_sheet_items(report: Dict) -> List[tuple]:
+    """
+    摘要工作表的標籤與顯示值（自第 5 列起）
+    
+    Args:
+        report (Dict): 炸雞對帳報告資料
+        
+    Returns:
+        List[tuple]: (標籤, 顯示值) 列表
+    """
+    return [
+        ("總銷售金額", f"${report['總銷售金額']:,}"),
+        ("總銷售數量", f"{report['總銷售數量']:,} 份"),
+        ("總訂單數", f"{report['總訂單數']:,} 筆"),
+        ("品項種類", f"{report['品項種類']} 種"),
+        ("平均單價", f"${report['平均單價']:.2f}"),
+        ("", ""),
+        ("🍗 炸雞老闆應付金額", f"${report['炸雞老闆應付金額']:,}"),
+        ("成本比例", f"{report['成本比例']*100:.1f}%"),
+        ("利潤", f"${report['利潤']:,}")
+    ]
+
+def settlement_sheet_items(report: Dict) -> List[tuple]:
+    """
+    對帳明細工作表的標籤與顯示值（自第 3 列起）
+    
+    Args:
+        report (Dict): 炸雞對帳報告資料
+        
+    Returns:
+        List[tuple]: (標籤, 顯示值) 列表
+    """
+    return [
+        ("對帳期間", report['期間']),
+        ("總銷售金額", f"${report['總銷售金額']:,}"),
+        ("成本比例", f"{report['成本比例']*100:.1f}%"),
+        ("", ""),
+        ("🍗 炸雞老闆應付金額", f"${report['炸雞老闆應付金額']:,}"),
+        ("利潤", f"${report['利潤']:,}"),
+        ("", ""),
+        ("備註", "此金額為炸雞品項的對帳金額，請確認後付款")
+    ]
+
 class ChickenReportGenerator:
     """炸雞對帳報告生成器類別"""
     
-    def __init__(self, output_dir: str = "chicken_reports"):
+    def __init__(self, output_dir: str = "chicken_reports", use_cache: bool = None,
+                 use_template: bool = None, use_store: bool = None):
         """
         初始化報告生成器
         
         Args:
             output_dir (str): 輸出目錄
+            use_cache (bool): 是否使用報告快取，None 表示依照 REPORT_CACHE_CONFIG 設定
+            use_template (bool): 是否以預先編譯的 Excel 樣板生成報告，
+                None 表示依照 REPORT_CONFIG['EXCEL_TEMPLATE'] 設定
+            use_store (bool): 是否將生成的報告登錄至報告索引，None 表示依照 REPORT_STORE_CONFIG 設定
         """
         self.output_dir = output_dir
         self._ensure_output_dir()
+        
+        if use_template is None:
+            use_template = REPORT_CONFIG['EXCEL_TEMPLATE']
+        self.use_template = use_template
+        
+        if use_store is None:
+            use_store = REPORT_STORE_CONFIG['ENABLED']
+        self.store = None
+        if use_store:
+            self.store = ChickenReportStore(
+                output_dir,
+                db_file=REPORT_STORE_CONFIG['DB_FILE'],
+                archive_dir=REPORT_STORE_CONFIG['ARCHIVE_DIR'],
+                retention_days=REPORT_STORE_CONFIG['RETENTION_DAYS'],
+                compact_interval_seconds=REPORT_STORE_CONFIG['COMPACT_INTERVAL_SECONDS']
+            )
+        
+        if use_cache is None:
+            use_cache = REPORT_CACHE_CONFIG['ENABLED']
+        self.cache = None
+        if use_cache:
+            self.cache = ChickenReportCache(
+                output_dir,
+                index_file=REPORT_CACHE_CONFIG['INDEX_FILE'],
+                max_total_bytes=REPORT_CACHE_CONFIG['MAX_TOTAL_BYTES'],
+                max_age_seconds=REPORT_CACHE_CONFIG['MAX_AGE_SECONDS'],
+                on_remove=self._forget_report if self.store is not None else None
+            )
     
     def _ensure_output_dir(self):
         """確保輸出目錄存在"""
@@ -33,151 +169,463 @@ class ChickenReportGenerator:
             os.makedirs(self.output_dir)
             logger.info(f"建立輸出目錄: {self.output_dir}")
     
-    def generate_excel_report(self, settlement_report: Dict, filename: str = None) -> str:
+    def generate_report(self, settlement_report: Dict, report_format: str = None,
+                        filename: str = None, price_version=None, profile: str = None) -> str:
+        """
+        依指定格式生成炸雞對帳報告
+        
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+            report_format (str): 報告格式 ('excel', 'text', 'csv', 'json', 'parquet')，
+                None 表示依照 REPORT_CONFIG['FORMAT'] 設定
+            filename (str): 檔案名稱
+            price_version: 價格設定版本，會納入快取鍵
+            profile (str): Excel 報告設定檔（見 REPORT_PROFILES），其他格式不使用；
+                設定檔的詳細資料附件需另外以 'detail_csv' 格式生成
+            
+        Returns:
+            str: 檔案路徑
+        """
+        if report_format is None:
+            report_format = REPORT_CONFIG['FORMAT']
+        
+        if report_format == 'excel':
+            return self.generate_excel_report(settlement_report, filename, price_version, profile)
+        
+        extension = self.get_extension(report_format)
+        if report_format == 'text':
+            def write(filepath):
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(self.generate_text_report(settlement_report))
+        else:
+            exporter = REPORT_EXPORTERS[report_format]()
+            
+            def write(filepath):
+                exporter.export(ChickenReportModel(settlement_report), filepath)
+        
+        try:
+            return self._generate_cached(settlement_report, report_format, extension,
+                                         filename, price_version, write)
+        except Exception as error:
+            logger.error(f"生成 {report_format} 報告時發生錯誤: {error}")
+            raise
+    
+    @staticmethod
+    def get_extension(report_format: str) -> str:
+        """
+        取得報告格式的副檔名
+        
+        Args:
+            report_format (str): 報告格式
+            
+        Returns:
+            str: 副檔名
+        """
+        if report_format == 'excel':
+            return 'xlsx'
+        if report_format == 'text':
+            return 'txt'
+        if report_format not in REPORT_EXPORTERS:
+            raise ValueError(f"不支援的報告格式: {report_format}（支援: {', '.join(REPORT_FORMATS)}）")
+        return REPORT_EXPORTERS[report_format].extension
+    
+    def generate_excel_report(self, settlement_report: Dict, filename: str = None,
+                              price_version=None, profile: str = None) -> str:
         """
         生成 Excel 格式的炸雞對帳報告
         
+        相同的輸入內容（對帳資料、期間、價格版本、生成器版本）已生成過時，
+        直接回傳快取中的既有檔案。
+        
         Args:
             settlement_report (Dict): 炸雞對帳報告資料
             filename (str): 檔案名稱
+            price_version: 價格設定版本，會納入快取鍵
+            profile (str): 報告設定檔（見 REPORT_PROFILES），None 表示依照 REPORT_CONFIG 設定
             
         Returns:
             str: 檔案路徑
         """
+        options = resolve_report_profile(profile)
+        
+        def write(filepath):
+            self.write_excel_file(settlement_report, filepath, options)
+        
         try:
-            if filename is None:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"炸雞對帳報告_{timestamp}.xlsx"
+            return self._generate_cached(settlement_report, 'excel', 'xlsx',
+                                         filename, price_version, write, options)
+        except Exception as error:
+            logger.error(f"生成 Excel 報告時發生錯誤: {error}")
+            raise
+    
+    def generate_batch_excel_reports(self, settlement_reports: List[Dict], combine: bool = False,
+                                     max_workers: int = None, price_version=None,
+                                     profile: str = None) -> List[str]:
+        """
+        一次生成多個期間的 Excel 報告
+        
+        Args:
+            settlement_reports (List[Dict]): 各期間的炸雞對帳報告資料
+            combine (bool): True 表示所有期間寫入同一個工作簿（各期間的工作表名稱加上開始日期），
+                False 表示每個期間各自一個檔案
+            max_workers (int): 平行寫檔的程序數，None 表示依 CPU 數量，1 表示在目前程序依序生成
+            price_version: 價格設定版本，會納入快取鍵
+            profile (str): 報告設定檔（見 REPORT_PROFILES），None 表示依照 REPORT_CONFIG 設定
             
-            filepath = os.path.join(self.output_dir, filename)
+        Returns:
+            List[str]: 檔案路徑（combine 時只有一個）
+        """
+        try:
+            options = resolve_report_profile(profile)
+            if combine:
+                return [self._generate_combined_workbook(settlement_reports, options)]
             
-            # 建立工作簿
-            wb = Workbook()
+            filepaths = [None] * len(settlement_reports)
+            pending = []
+            for index, report in enumerate(settlement_reports):
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = self.cache.compute_key(
+                        report, price_version=price_version,
+                        generator_version=GENERATOR_VERSION, report_format=cache_format_key('excel', options)
+                    )
+                    filepaths[index] = self.cache.lookup(cache_key)
+                if filepaths[index] is None:
+                    filepath = os.path.join(self.output_dir, self._reserve_report_filename('xlsx'))
+                    pending.append((index, cache_key, filepath))
             
-            # 移除預設工作表
-            wb.remove(wb.active)
+            if max_workers is None:
+                max_workers = min(len(pending), os.cpu_count() or 1)
             
-            # 建立各個工作表
-            self._create_summary_sheet(wb, settlement_report)
-            self._create_product_summary_sheet(wb, settlement_report)
-            self._create_daily_summary_sheet(wb, settlement_report)
-            self._create_settlement_sheet(wb, settlement_report)
-            self._create_detail_sheet(wb, settlement_report)
+            try:
+                if max_workers <= 1 or len(pending) <= 1:
+                    for index, _, filepath in pending:
+                        self.write_excel_file(settlement_reports[index], filepath, options)
+                else:
+                    # 每個工作程序只編譯一次樣板，之後的報告共用
+                    tasks = [(settlement_reports[index], filepath, self.use_template, options)
+                             for index, _, filepath in pending]
+                    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                        list(pool.map(_write_excel_report_worker, tasks))
+            except Exception:
+                for _, _, filepath in pending:
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                raise
             
-            # 儲存檔案
-            wb.save(filepath)
-            logger.info(f"Excel 報告已生成: {filepath}")
-            return filepath
+            for index, cache_key, filepath in pending:
+                filepaths[index] = filepath
+                self.register_report(filepath, settlement_reports[index].get('期間', ''), 'excel')
+                if cache_key is not None:
+                    self.cache.store(cache_key, filepath)
+            
+            logger.info(f"批次生成 {len(pending)} 個 Excel 報告（快取命中 {len(settlement_reports) - len(pending)} 個）")
+            return filepaths
             
         except Exception as error:
-            logger.error(f"生成 Excel 報告時發生錯誤: {error}")
+            logger.error(f"批次生成 Excel 報告時發生錯誤: {error}")
             raise
     
-    def _create_summary_sheet(self, wb: Workbook, report: Dict):
-        """建立摘要工作表"""
-        ws = wb.create_sheet("炸雞對帳摘要")
+    def _generate_combined_workbook(self, settlement_reports: List[Dict], options: Dict) -> str:
+        """將多個期間的報告寫入同一個工作簿（只儲存一次檔案，字型與填色只建立一次並由所有期間共用）"""
+        from openpyxl import Workbook
+        wb = Workbook()
+        wb.remove(wb.active)
+        styles = self._create_styles()
+        
+        for report in settlement_reports:
+            # 工作表名稱加上期間開始日期
+            period_start = report['期間'].split(' ')[0]
+            self._create_report_sheets(wb, report, f"{period_start} ", options, styles)
+        
+        filepath = os.path.join(self.output_dir, self._reserve_report_filename('xlsx'))
+        try:
+            wb.save(filepath)
+        except Exception:
+            os.remove(filepath)
+            raise
+        logger.info(f"多期間 Excel 報告已生成: {filepath}（{len(settlement_reports)} 個期間）")
+        period = f"{settlement_reports[0]['期間'].split(' ')[0]} 至 {settlement_reports[-1]['期間'].split(' ')[-1]}"
+        self.register_report(filepath, period, 'excel')
+        return filepath
+    
+    def write_excel_file(self, settlement_report: Dict, filepath: str, options: Dict = None):
+        """
+        將 Excel 報告寫入指定路徑（不經過快取）
+        
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+            filepath (str): 檔案路徑
+            options (Dict): 報告設定檔選項，None 表示依照 REPORT_CONFIG 設定
+        """
+        if options is None:
+            options = resolve_report_profile()
+        if self.use_template:
+            from chicken_report_template import get_excel_template
+            template = get_excel_template(self.build_workbook, options)
+            if template.supports(settlement_report):
+                template.render(settlement_report, filepath)
+                return
+        
+        # 儲存檔案
+        self.build_workbook(settlement_report, options).save(filepath)
+    
+    def _generate_cached(self, settlement_report: Dict, report_format: str, extension: str,
+                         filename: str, price_version, write, options: Dict = None) -> str:
+        """
+        查詢報告快取，未命中時呼叫 write 生成檔案並登錄至快取
+        
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+            report_format (str): 報告格式
+            extension (str): 副檔名
+            filename (str): 檔案名稱，None 表示自動命名
+            price_version: 價格設定版本
+            write (Callable[[str], None]): 將報告寫入指定路徑的函式
+            options (Dict): 報告設定檔選項（Excel 報告會納入快取鍵）
+            
+        Returns:
+            str: 檔案路徑
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.compute_key(
+                settlement_report, price_version=price_version,
+                generator_version=GENERATOR_VERSION, report_format=cache_format_key(report_format, options)
+            )
+            cached_path = self.cache.lookup(cache_key)
+            if cached_path is not None:
+                if filename is None:
+                    return cached_path
+                filepath = os.path.join(self.output_dir, filename)
+                if os.path.abspath(filepath) != os.path.abspath(cached_path):
+                    shutil.copyfile(cached_path, filepath)
+                    self.register_report(filepath, settlement_report.get('期間', ''), report_format)
+                logger.info(f"報告已從快取複製: {filepath}")
+                return filepath
+        
+        # 只有自動命名的報告由快取管理（淘汰時會刪除檔案）
+        cache_owned = filename is None
+        if filename is None:
+            filename = self._reserve_report_filename(extension)
+        
+        filepath = os.path.join(self.output_dir, filename)
+        try:
+            with span(f"report.render.{report_format}", len(settlement_report.get('詳細資料', ()))):
+                write(filepath)
+        except Exception:
+            if cache_owned and os.path.exists(filepath):
+                os.remove(filepath)
+            raise
+        logger.info(f"{report_format} 報告已生成: {filepath}")
+        
+        self.register_report(filepath, settlement_report.get('期間', ''), report_format)
+        if cache_key is not None and cache_owned:
+            self.cache.store(cache_key, filepath)
+        return filepath
+    
+    def register_report(self, filepath: str, period: str, report_format: str):
+        """
+        將生成的報告登錄至報告索引，並視需要封存超過保存期限的舊報告
+        
+        Args:
+            filepath (str): 報告檔案路徑
+            period (str): 對帳期間
+            report_format (str): 報告格式
+        """
+        if self.store is None:
+            return
+        try:
+            self.store.register(filepath, period, report_format)
+            self.store.compact_if_due()
+        except Exception as error:
+            # 索引失敗不影響報告本身
+            logger.warning(f"登錄報告索引失敗 {filepath}: {error}")
+    
+    def _forget_report(self, filepath: str):
+        """快取淘汰刪除檔案時一併移除報告索引"""
+        self.store.forget(os.path.basename(filepath))
+    
+    def _reserve_report_filename(self, extension: str) -> str:
+        """
+        產生不重複的報告檔名並先建立空檔案佔位
+        
+        同一秒內有多個報告同時生成時（例如背景工作），於檔名後加上序號避免互相覆寫。
+        
+        Args:
+            extension (str): 副檔名
+            
+        Returns:
+            str: 檔案名稱
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"炸雞對帳報告_{timestamp}.{extension}"
+        sequence = 1
+        while True:
+            try:
+                with open(os.path.join(self.output_dir, filename), 'x'):
+                    return filename
+            except FileExistsError:
+                sequence += 1
+                filename = f"炸雞對帳報告_{timestamp}_{sequence}.{extension}"
+    
+    def build_workbook(self, settlement_report: Dict, options: Dict = None) -> 'Workbook':
+        """
+        以 openpyxl 逐一建立各工作表
         
-        # 設定標題
-        title_font = Font(name="微軟正黑體", size=16, bold=True)
-        header_font = Font(name="微軟正黑體", size=12, bold=True)
-        content_font = Font(name="微軟正黑體", size=11)
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+            options (Dict): 報告設定檔選項，None 表示依照 REPORT_CONFIG 設定
+            
+        Returns:
+            Workbook: 工作簿
+        """
+        # openpyxl 只在產生 Excel 時載入
+        from openpyxl import Workbook
+        
+        # 建立工作簿
+        wb = Workbook()
+        
+        # 移除預設工作表
+        wb.remove(wb.active)
+        
+        self._create_report_sheets(wb, settlement_report, '', options)
+        return wb
+    
+    @staticmethod
+    def _create_styles() -> Dict:
+        """
+        建立各工作表共用的字型與填色（每個工作簿建立一次，多期間工作簿的所有工作表共用）
+
+        Returns:
+            Dict: 樣式名稱對應的 Font / PatternFill
+        """
+        from openpyxl.styles import Font, PatternFill
+        return {
+            'title': Font(name="微軟正黑體", size=16, bold=True),
+            'heading': Font(name="微軟正黑體", size=14, bold=True),
+            'label': Font(name="微軟正黑體", size=12, bold=True),
+            'content': Font(name="微軟正黑體", size=11),
+            'header': Font(name="微軟正黑體", size=11, bold=True),
+            'highlight': Font(name="微軟正黑體", size=12, bold=True, color="FF0000"),
+            'settlement_highlight': Font(name="微軟正黑體", size=14, bold=True, color="FF0000"),
+            'header_fill': PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"),
+        }
+    
+    def _create_report_sheets(self, wb: 'Workbook', settlement_report: Dict, sheet_prefix: str = '',
+                              options: Dict = None, styles: Dict = None):
+        """
+        建立各個工作表，sheet_prefix 會加在工作表名稱之前，options 決定是否包含圖表與詳細資料，
+        styles 為 _create_styles 建立的共用樣式（None 表示新建）
+        """
+        if options is None:
+            options = resolve_report_profile()
+        if styles is None:
+            styles = self._create_styles()
+        include_charts = options['INCLUDE_CHARTS']
+        self._create_summary_sheet(wb, settlement_report, styles, sheet_prefix)
+        self._create_product_summary_sheet(wb, settlement_report, styles, sheet_prefix, include_charts)
+        self._create_daily_summary_sheet(wb, settlement_report, styles, sheet_prefix, include_charts)
+        self._create_settlement_sheet(wb, settlement_report, styles, sheet_prefix)
+        if options['INCLUDE_DETAILS']:
+            self._create_detail_sheet(wb, settlement_report, styles, sheet_prefix)
+    
+    @staticmethod
+    def _write_table_header(ws, headers: List[str], styles: Dict):
+        """在第 3 列寫入表格標題列"""
+        for col, header in enumerate(headers, start=1):
+            cell = ws.cell(row=3, column=col, value=header)
+            cell.font = styles['header']
+            cell.fill = styles['header_fill']
+    
+    @staticmethod
+    def _add_bar_chart(ws, title: str, x_title: str, row_count: int):
+        """以第 1 欄為類別、第 3 欄為金額建立長條圖（資料自第 4 列開始）"""
+        from openpyxl.chart import BarChart, Reference
+        chart = BarChart()
+        chart.title = title
+        chart.x_axis.title = x_title
+        chart.y_axis.title = "金額"
+        
+        data = Reference(ws, min_col=3, min_row=3, max_row=3+row_count)
+        categories = Reference(ws, min_col=1, min_row=4, max_row=3+row_count)
+        chart.add_data(data, titles_from_data=True)
+        chart.set_categories(categories)
+        
+        ws.add_chart(chart, "F3")
+    
+    def _create_summary_sheet(self, wb: 'Workbook', report: Dict, styles: Dict, sheet_prefix: str = ''):
+        """建立摘要工作表"""
+        ws = wb.create_sheet(f"{sheet_prefix}炸雞對帳摘要")
         
         # 標題
         ws['A1'] = "🍗 炸雞對帳報告"
-        ws['A1'].font = title_font
+        ws['A1'].font = styles['title']
         ws.merge_cells('A1:D1')
         
         # 期間資訊
         ws['A3'] = "對帳期間:"
-        ws['B3'] = report['期間']
-        ws['A3'].font = header_font
-        ws['B3'].font = content_font
+        ws['B3'] = excel_value(report['期間'])
+        ws['A3'].font = styles['label']
+        ws['B3'].font = styles['content']
         
         # 摘要資料
-        summary_data = [
-            ("總銷售金額", f"${report['總銷售金額']:,}"),
-            ("總銷售數量", f"{report['總銷售數量']:,} 份"),
-            ("總訂單數", f"{report['總訂單數']:,} 筆"),
-            ("品項種類", f"{report['品項種類']} 種"),
-            ("平均單價", f"${report['平均單價']:.2f}"),
-            ("", ""),
-            ("🍗 炸雞老闆應付金額", f"${report['炸雞老闆應付金額']:,}"),
-            ("成本比例", f"{report['成本比例']*100:.1f}%"),
-            ("利潤", f"${report['利潤']:,}")
-        ]
-        
-        for i, (label, value) in enumerate(summary_data, start=5):
+        for i, (label, value) in enumerate(summary_sheet_items(report), start=5):
             ws[f'A{i}'] = label
-            ws[f'B{i}'] = value
-            ws[f'A{i}'].font = header_font
-            ws[f'B{i}'].font = content_font
+            ws[f'B{i}'] = excel_value(value)
             
             # 特別標示炸雞老闆應付金額
             if "炸雞老闆應付金額" in label:
-                ws[f'A{i}'].font = Font(name="微軟正黑體", size=12, bold=True, color="FF0000")
-                ws[f'B{i}'].font = Font(name="微軟正黑體", size=12, bold=True, color="FF0000")
+                ws[f'A{i}'].font = styles['highlight']
+                ws[f'B{i}'].font = styles['highlight']
+            else:
+                ws[f'A{i}'].font = styles['label']
+                ws[f'B{i}'].font = styles['content']
         
         # 調整欄寬
         ws.column_dimensions['A'].width = 20
         ws.column_dimensions['B'].width = 25
     
-    def _create_product_summary_sheet(self, wb: Workbook, report: Dict):
+    def _create_product_summary_sheet(self, wb: 'Workbook', report: Dict, styles: Dict, sheet_prefix: str = '',
+                                      include_charts: bool = True):
         """建立品項摘要工作表"""
-        ws = wb.create_sheet("品項摘要")
+        ws = wb.create_sheet(f"{sheet_prefix}品項摘要")
         
         # 標題
         ws['A1'] = "各炸雞品項銷售摘要"
-        ws['A1'].font = Font(name="微軟正黑體", size=14, bold=True)
+        ws['A1'].font = styles['heading']
         
         # 品項摘要資料
         if not report['品項摘要'].empty:
-            # 標題列
-            headers = ['品項', '總數量', '總金額', '平均單價']
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=3, column=col, value=header)
-                cell.font = Font(name="微軟正黑體", size=11, bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            self._write_table_header(ws, ['品項', '總數量', '總金額', '平均單價'], styles)
             
             # 資料列
             for row_idx, (_, row) in enumerate(report['品項摘要'].iterrows(), start=4):
-                ws.cell(row=row_idx, column=1, value=row['品項'])
+                ws.cell(row=row_idx, column=1, value=excel_value(row['品項']))
                 ws.cell(row=row_idx, column=2, value=row['總數量'])
                 ws.cell(row=row_idx, column=3, value=row['總金額'])
                 ws.cell(row=row_idx, column=4, value=row['平均單價'])
             
             # 建立圖表
-            chart = BarChart()
-            chart.title = "各品項銷售金額"
-            chart.x_axis.title = "品項"
-            chart.y_axis.title = "金額"
-            
-            data = Reference(ws, min_col=3, min_row=3, max_row=3+len(report['品項摘要']))
-            categories = Reference(ws, min_col=1, min_row=4, max_row=3+len(report['品項摘要']))
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(categories)
-            
-            ws.add_chart(chart, "F3")
+            if include_charts:
+                self._add_bar_chart(ws, "各品項銷售金額", "品項", len(report['品項摘要']))
         
         # 調整欄寬
         for col in ['A', 'B', 'C', 'D']:
             ws.column_dimensions[col].width = 15
     
-    def _create_daily_summary_sheet(self, wb: Workbook, report: Dict):
+    def _create_daily_summary_sheet(self, wb: 'Workbook', report: Dict, styles: Dict, sheet_prefix: str = '',
+                                    include_charts: bool = True):
         """建立每日摘要工作表"""
-        ws = wb.create_sheet("每日摘要")
+        ws = wb.create_sheet(f"{sheet_prefix}每日摘要")
         
         # 標題
         ws['A1'] = "每日炸雞銷售摘要"
-        ws['A1'].font = Font(name="微軟正黑體", size=14, bold=True)
+        ws['A1'].font = styles['heading']
         
         # 每日摘要資料
         if not report['每日摘要'].empty:
-            # 標題列
-            headers = ['日期', '總數量', '總金額']
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=3, column=col, value=header)
-                cell.font = Font(name="微軟正黑體", size=11, bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            self._write_table_header(ws, ['日期', '總數量', '總金額'], styles)
             
             # 資料列
             for row_idx, (_, row) in enumerate(report['每日摘要'].iterrows(), start=4):
@@ -186,79 +634,55 @@ class ChickenReportGenerator:
                 ws.cell(row=row_idx, column=3, value=row['總金額'])
             
             # 建立圖表
-            chart = BarChart()
-            chart.title = "每日銷售金額"
-            chart.x_axis.title = "日期"
-            chart.y_axis.title = "金額"
-            
-            data = Reference(ws, min_col=3, min_row=3, max_row=3+len(report['每日摘要']))
-            categories = Reference(ws, min_col=1, min_row=4, max_row=3+len(report['每日摘要']))
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(categories)
-            
-            ws.add_chart(chart, "F3")
+            if include_charts:
+                self._add_bar_chart(ws, "每日銷售金額", "日期", len(report['每日摘要']))
         
         # 調整欄寬
         for col in ['A', 'B', 'C']:
             ws.column_dimensions[col].width = 15
     
-    def _create_settlement_sheet(self, wb: Workbook, report: Dict):
+    def _create_settlement_sheet(self, wb: 'Workbook', report: Dict, styles: Dict, sheet_prefix: str = ''):
         """建立對帳工作表"""
-        ws = wb.create_sheet("對帳明細")
+        ws = wb.create_sheet(f"{sheet_prefix}對帳明細")
         
         # 標題
         ws['A1'] = "🍗 炸雞老闆對帳明細"
-        ws['A1'].font = Font(name="微軟正黑體", size=16, bold=True)
+        ws['A1'].font = styles['title']
         ws.merge_cells('A1:D1')
         
         # 對帳資訊
-        settlement_data = [
-            ("對帳期間", report['期間']),
-            ("總銷售金額", f"${report['總銷售金額']:,}"),
-            ("成本比例", f"{report['成本比例']*100:.1f}%"),
-            ("", ""),
-            ("🍗 炸雞老闆應付金額", f"${report['炸雞老闆應付金額']:,}"),
-            ("利潤", f"${report['利潤']:,}"),
-            ("", ""),
-            ("備註", "此金額為炸雞品項的對帳金額，請確認後付款")
-        ]
-        
-        for i, (label, value) in enumerate(settlement_data, start=3):
+        for i, (label, value) in enumerate(settlement_sheet_items(report), start=3):
             ws[f'A{i}'] = label
-            ws[f'B{i}'] = value
-            ws[f'A{i}'].font = Font(name="微軟正黑體", size=11, bold=True)
-            ws[f'B{i}'].font = Font(name="微軟正黑體", size=11)
+            ws[f'B{i}'] = excel_value(value)
             
             # 特別標示應付金額
             if "炸雞老闆應付金額" in label:
-                ws[f'A{i}'].font = Font(name="微軟正黑體", size=14, bold=True, color="FF0000")
-                ws[f'B{i}'].font = Font(name="微軟正黑體", size=14, bold=True, color="FF0000")
+                ws[f'A{i}'].font = styles['settlement_highlight']
+                ws[f'B{i}'].font = styles['settlement_highlight']
+            else:
+                ws[f'A{i}'].font = styles['header']
+                ws[f'B{i}'].font = styles['content']
         
         # 調整欄寬
         ws.column_dimensions['A'].width = 20
         ws.column_dimensions['B'].width = 25
     
-    def _create_detail_sheet(self, wb: Workbook, report: Dict):
+    def _create_detail_sheet(self, wb: 'Workbook', report: Dict, styles: Dict, sheet_prefix: str = ''):
         """建立詳細資料工作表"""
-        ws = wb.create_sheet("詳細資料")
+        ws = wb.create_sheet(f"{sheet_prefix}詳細資料")
         
         # 標題
         ws['A1'] = "詳細炸雞銷售資料"
-        ws['A1'].font = Font(name="微軟正黑體", size=14, bold=True)
+        ws['A1'].font = styles['heading']
         
         # 詳細資料
         if not report['詳細資料'].empty:
-            # 標題列
-            headers = ['日期', '品項', '數量', '單價', '小計']
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=3, column=col, value=header)
-                cell.font = Font(name="微軟正黑體", size=11, bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            self._write_table_header(ws, ['日期', '品項', '數量', '單價', '小計'], styles)
             
             # 資料列
             for row_idx, (_, row) in enumerate(report['詳細資料'].iterrows(), start=4):
                 ws.cell(row=row_idx, column=1, value=row['日期'].strftime('%Y-%m-%d'))
-                ws.cell(row=row_idx, column=2, value=row['品項'])
+                ws.cell(row=row_idx, column=2, value=excel_value(row['品項']))
                 ws.cell(row=row_idx, column=3, value=row['數量'])
                 ws.cell(row=row_idx, column=4, value=row['單價'])
                 ws.cell(row=row_idx, column=5, value=row['小計'])
@@ -318,3 +742,11 @@ class ChickenReportGenerator:
         except Exception as error:
             logger.error(f"生成文字報告時發生錯誤: {error}")
             raise
+
+def _write_excel_report_worker(task):
+    """批次生成時在工作程序中寫入單一 Excel 報告"""
+    settlement_report, filepath, use_template, options = task
+    generator = ChickenReportGenerator(os.path.dirname(filepath), use_cache=False,
+                                       use_template=use_template, use_store=False)
+    generator.write_excel_file(settlement_report, filepath, options)
+    return filepath
@@ -0,0 +1,298 @@
+"""
+炸雞對帳報告背景工作佇列
+在程序內以有限的執行緒池生成報告，不需外部訊息佇列
+
+多個工作程序（例如預先 fork 的正式伺服器）共用報告目錄時，工作狀態另存於
+報告索引的 SQLite 資料庫，任一工作程序都能查詢其他程序提交的工作
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 工作狀態
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+class ReportJobQueueFullError(RuntimeError):
+    """等待中的工作已達上限"""
+
+_JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    job_id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    owner INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_jobs_key ON report_jobs (key, status);
+"""
+
+_JOB_COLUMNS = ['job_id', 'key', 'status', 'created_at', 'started_at', 'finished_at', 'result', 'error', 'owner']
+
+def _process_alive(pid: int) -> bool:
+    """同一台主機上的程序是否仍在執行"""
+    if pid == os.getpid() or os.name == 'nt':
+        # Windows 的 os.kill 會結束程序，無法用來檢查
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ChickenReportJobStore:
+    """報告工作狀態的共用儲存（SQLite，可跨執行緒與程序使用）"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化工作狀態儲存（第一次使用時才建立資料表）
+
+        Args:
+            db_path (str): SQLite 資料庫路徑（通常與報告索引共用）
+        """
+        self.db_path = db_path
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """建立資料庫連線（呼叫端以 closing 關閉）"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            conn.executescript(_JOB_SCHEMA)
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def _to_job(row) -> Optional[Dict]:
+        """資料列轉為工作資訊"""
+        if row is None:
+            return None
+        job = dict(zip(_JOB_COLUMNS, row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def _fail_orphans(self, conn: sqlite3.Connection):
+        """將已結束的工作程序留下的未完成工作標示為失敗"""
+        rows = conn.execute('SELECT job_id, owner FROM report_jobs WHERE status IN (?, ?)',
+                            (JOB_QUEUED, JOB_RUNNING)).fetchall()
+        orphans = [job_id for job_id, owner in rows if not _process_alive(owner)]
+        if orphans:
+            conn.executemany('UPDATE report_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                             [(JOB_FAILED, '執行工作的程序已結束', time.time(), job_id) for job_id in orphans])
+
+    def claim(self, job: Dict, max_pending: int) -> Optional[Dict]:
+        """
+        新增工作；所有程序中已有相同 key 的未完成工作時不新增
+
+        Args:
+            job (Dict): 工作資訊
+            max_pending (int): 所有程序的等待中與執行中工作數上限
+
+        Returns:
+            Optional[Dict]: 相同 key 的未完成工作，新增成功時回傳 None
+
+        Raises:
+            ReportJobQueueFullError: 未完成的工作已達上限
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_orphans(conn)
+            row = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM report_jobs "
+                               "WHERE key = ? AND status IN (?, ?)", (job['key'], JOB_QUEUED, JOB_RUNNING)).fetchone()
+            if row is not None:
+                return self._to_job(row)
+            pending = conn.execute('SELECT COUNT(*) FROM report_jobs WHERE status IN (?, ?)',
+                                   (JOB_QUEUED, JOB_RUNNING)).fetchone()[0]
+            if pending >= max_pending:
+                raise ReportJobQueueFullError(f"報告工作佇列已滿（上限 {max_pending} 筆）")
+            self._write(conn, job)
+        return None
+
+    def save(self, job: Dict):
+        """更新工作狀態"""
+        with closing(self._connect()) as conn, conn:
+            self._write(conn, job)
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, job: Dict):
+        values = dict(job, owner=os.getpid())
+        if values['result'] is not None:
+            values['result'] = json.dumps(values['result'], ensure_ascii=False, default=str)
+        conn.execute(f"INSERT OR REPLACE INTO report_jobs ({', '.join(_JOB_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(_JOB_COLUMNS))})", [values[column] for column in _JOB_COLUMNS])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        取得工作資訊
+
+        Args:
+            job_id (str): 工作 ID
+
+        Returns:
+            Optional[Dict]: 工作資訊，不存在時回傳 None
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM report_jobs WHERE job_id = ?",
+                               (job_id,)).fetchone()
+            job = self._to_job(row)
+            if job is not None and job['status'] in (JOB_QUEUED, JOB_RUNNING) and not _process_alive(job['owner']):
+                self._fail_orphans(conn)
+                job = self._to_job(conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM report_jobs "
+                                                "WHERE job_id = ?", (job_id,)).fetchone())
+        return job
+
+    def prune(self, max_finished: int):
+        """移除最舊的已完成工作，保留 max_finished 筆"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM report_jobs WHERE job_id IN (SELECT job_id FROM report_jobs '
+                         'WHERE status IN (?, ?) ORDER BY finished_at DESC LIMIT -1 OFFSET ?)',
+                         (JOB_DONE, JOB_FAILED, max_finished))
+
+class ChickenReportJobQueue:
+    """炸雞對帳報告背景工作佇列類別"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20, max_finished: int = 200,
+                 store: ChickenReportJobStore = None):
+        """
+        初始化工作佇列
+
+        Args:
+            max_workers (int): 同時執行的工作數上限
+            max_pending (int): 等待中與執行中的工作數上限（有共用儲存時為所有程序合計）
+            max_finished (int): 保留的已完成工作筆數
+            store (ChickenReportJobStore): 多個工作程序共用的工作狀態儲存，None 表示只保存在程序內
+        """
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active_by_key = {}
+
+    def submit(self, key: str, func: Callable, *args, **kwargs) -> Tuple[Dict, bool]:
+        """
+        提交工作；相同 key 的工作尚未完成時直接回傳該工作
+
+        Args:
+            key (str): 工作識別鍵（相同參數的工作應有相同的鍵）
+            func (Callable): 要在背景執行的函式
+            *args, **kwargs: 函式參數
+
+        Returns:
+            Tuple[Dict, bool]: (工作資訊, 是否為新建立的工作)
+        """
+        with self._lock:
+            active_id = self._active_by_key.get(key)
+            if active_id is not None:
+                return self._snapshot(self._jobs[active_id]), False
+
+            if self.store is None and len(self._active_by_key) >= self.max_pending:
+                raise ReportJobQueueFullError(f"報告工作佇列已滿（上限 {self.max_pending} 筆）")
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id,
+                'key': key,
+                'status': JOB_QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            if self.store is not None:
+                # 其他工作程序已在執行相同的工作
+                existing = self.store.claim(job, self.max_pending)
+                if existing is not None:
+                    return existing, False
+            self._jobs[job_id] = job
+            self._active_by_key[key] = job_id
+            self._prune_locked()
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"報告工作已排入佇列: {job_id}")
+        return self._snapshot(job), True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        取得工作資訊
+
+        Args:
+            job_id (str): 工作 ID
+
+        Returns:
+            Optional[Dict]: 工作資訊，不存在時回傳 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._snapshot(job)
+        # 由其他工作程序提交的工作
+        return self.store.get(job_id) if self.store is not None else None
+
+    def _run(self, job: Dict, func: Callable, args: tuple, kwargs: dict):
+        """在工作執行緒中執行工作並更新狀態"""
+        with self._lock:
+            job['status'] = JOB_RUNNING
+            job['started_at'] = time.time()
+        self._save(job)
+
+        try:
+            result = func(*args, **kwargs)
+            status, error = JOB_DONE, None
+        except Exception as exc:
+            logger.error(f"報告工作 {job['job_id']} 執行失敗: {exc}")
+            result, status, error = None, JOB_FAILED, str(exc)
+
+        with self._lock:
+            job['result'] = result
+            job['error'] = error
+            job['status'] = status
+            job['finished_at'] = time.time()
+            self._active_by_key.pop(job['key'], None)
+        self._save(job)
+
+    def _save(self, job: Dict):
+        """將工作狀態寫入共用儲存（寫入失敗只記錄，不影響工作本身）"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(self._snapshot(job))
+        except sqlite3.Error as error:
+            logger.warning(f"寫入報告工作狀態失敗 {job['job_id']}: {error}")
+
+    def _prune_locked(self):
+        """移除最舊的已完成工作，保留 max_finished 筆"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.prune(self.max_finished)
+
+    @staticmethod
+    def _snapshot(job: Dict) -> Dict:
+        """複製工作資訊，避免呼叫端讀到執行中被修改的資料"""
+        return dict(job)
+
+    def shutdown(self, wait: bool = True):
+        """停止工作執行緒池"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,168 @@
+"""
+炸雞對帳報告多格式同時生成
+同一份對帳結果的各格式報告（Excel、文字、CSV、JSON 等）平行生成，並記錄各格式耗時
+"""
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List
+import logging
+from chicken_config import REPORT_CONFIG
+from chicken_report_generator import (
+    ChickenReportGenerator, GENERATOR_VERSION, resolve_report_profile, cache_format_key
+)
+
+logger = logging.getLogger(__name__)
+
+# 平行生成的執行方式
+EXECUTOR_PROCESS = 'process'
+EXECUTOR_THREAD = 'thread'
+
+def _write_report_format(task) -> float:
+    """
+    將單一格式的報告寫入已預留的檔案（可在工作程序中執行）
+
+    Returns:
+        float: 寫檔耗時（秒）
+    """
+    settlement_report, report_format, filepath, use_template, profile = task
+    generator = ChickenReportGenerator(os.path.dirname(filepath), use_cache=False,
+                                       use_template=use_template, use_store=False)
+    start = time.perf_counter()
+    generator.generate_report(settlement_report, report_format, os.path.basename(filepath), profile=profile)
+    return time.perf_counter() - start
+
+class ChickenReportOrchestrator:
+    """炸雞對帳報告多格式生成類別"""
+
+    def __init__(self, report_generator: ChickenReportGenerator, executor: str = None,
+                 max_workers: int = None):
+        """
+        初始化多格式生成器
+
+        Args:
+            report_generator (ChickenReportGenerator): 報告生成器（輸出目錄與快取沿用此生成器）
+            executor (str): 'process' 以程序池生成（不受 GIL 限制），'thread' 以執行緒池生成，
+                None 表示依照 REPORT_CONFIG['FAN_OUT_EXECUTOR'] 設定；
+                池在第一次平行生成時建立，之後的呼叫沿用同一個池
+            max_workers (int): 平行數上限，None 表示 CPU 數量
+        """
+        if executor is None:
+            executor = REPORT_CONFIG['FAN_OUT_EXECUTOR']
+        if executor not in (EXECUTOR_PROCESS, EXECUTOR_THREAD):
+            raise ValueError(f"不支援的執行方式: {executor}")
+        self.report_generator = report_generator
+        self.executor = executor
+        self.max_workers = max_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        """取得共用的程序池或執行緒池（建立程序池需要啟動工作程序，只在第一次使用時建立）"""
+        with self._pool_lock:
+            if self._pool is None:
+                max_workers = self.max_workers or os.cpu_count() or 1
+                if self.executor == EXECUTOR_PROCESS:
+                    self._pool = ProcessPoolExecutor(max_workers=max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-fan-out')
+            return self._pool
+
+    def shutdown(self, wait: bool = True):
+        """停止程序池或執行緒池（之後再生成時重新建立）"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def generate(self, settlement_report: Dict, formats: List[str] = None,
+                 price_version=None, profile: str = None) -> Dict:
+        """
+        同時生成多種格式的報告
+
+        快取查詢、檔名預留、快取與報告索引登錄都在目前程序進行，工作程序只負責寫檔。
+        單一格式失敗不影響其他格式，錯誤訊息記錄在回傳結果的 'errors'。
+
+        Args:
+            settlement_report (Dict): 炸雞對帳報告資料
+            formats (List[str]): 報告格式列表，None 表示依照 REPORT_CONFIG['FAN_OUT_FORMATS'] 設定
+            price_version: 價格設定版本，會納入快取鍵
+            profile (str): Excel 報告設定檔（見 REPORT_PROFILES）；設定檔要求詳細資料附件時
+                一併生成 'detail_csv' 格式
+
+        Returns:
+            Dict: {'files': {格式: 檔案路徑}, 'timings': {格式: 秒數}, 'cached': [快取命中的格式],
+                   'errors': {格式: 錯誤訊息}, 'elapsed': 總耗時秒數}
+        """
+        if formats is None:
+            formats = REPORT_CONFIG['FAN_OUT_FORMATS']
+        options = resolve_report_profile(profile)
+        formats = list(formats)
+        if options['DETAIL_ATTACHMENT'] and 'excel' in formats:
+            formats.append('detail_csv')
+        formats = list(dict.fromkeys(formats))
+        generator = self.report_generator
+        cache = generator.cache
+        start = time.perf_counter()
+        result = {'files': {}, 'timings': {}, 'cached': [], 'errors': {}, 'elapsed': 0.0}
+
+        pending = []
+        for report_format in formats:
+            extension = generator.get_extension(report_format)
+            cache_key = None
+            if cache is not None:
+                cache_key = cache.compute_key(
+                    settlement_report, price_version=price_version,
+                    generator_version=GENERATOR_VERSION, report_format=cache_format_key(report_format, options)
+                )
+                cached_path = cache.lookup(cache_key)
+                if cached_path is not None:
+                    result['files'][report_format] = cached_path
+                    result['timings'][report_format] = 0.0
+                    result['cached'].append(report_format)
+                    continue
+            filepath = os.path.join(generator.output_dir, generator._reserve_report_filename(extension))
+            pending.append((report_format, cache_key, filepath))
+
+        tasks = [(settlement_report, report_format, filepath, generator.use_template, profile)
+                 for report_format, _, filepath in pending]
+        if len(tasks) <= 1:
+            outcomes = [self._run_inline(task) for task in tasks]
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(_write_report_format, task) for task in tasks]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append((future.result(), None))
+                except Exception as error:
+                    outcomes.append((None, error))
+            if any(isinstance(error, BrokenExecutor) for _, error in outcomes):
+                # 工作程序異常結束後池無法再使用，下次重新建立
+                self.shutdown(wait=False)
+
+        for (report_format, cache_key, filepath), (elapsed, error) in zip(pending, outcomes):
+            if error is not None:
+                logger.error(f"生成 {report_format} 報告時發生錯誤: {error}")
+                result['errors'][report_format] = str(error)
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                continue
+            result['files'][report_format] = filepath
+            result['timings'][report_format] = elapsed
+            generator.register_report(filepath, settlement_report.get('期間', ''), report_format)
+            if cache_key is not None:
+                cache.store(cache_key, filepath)
+
+        result['elapsed'] = time.perf_counter() - start
+        logger.info(f"多格式報告生成完成（{len(result['files'])} 個檔案，耗時 {result['elapsed']:.2f} 秒）")
+        return result
+
+    @staticmethod
+    def _run_inline(task):
+        """在目前程序直接生成單一格式，回傳 (耗時, 錯誤)"""
+        try:
+            return _write_report_format(task), None
+        except Exception as error:
+            return None, error
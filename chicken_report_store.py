@@ -0,0 +1,312 @@
+"""
+炸雞對帳報告檔案索引
+以 SQLite 記錄報告目錄中每個檔案的期間、雜湊值、大小與建立時間，
+列表與下載只查索引，舊報告依保存期限壓縮封存
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import time
+import uuid
+import zipfile
+from contextlib import closing
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 同步目錄時納入索引的副檔名
+REPORT_EXTENSIONS = ('xlsx', 'txt', 'csv', 'gz', 'ndjson', 'parquet')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    period TEXT NOT NULL DEFAULT '',
+    report_format TEXT NOT NULL DEFAULT '',
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    archive TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_created_at ON reports (created_at);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+_COLUMNS = ['report_id', 'filename', 'period', 'report_format', 'content_hash', 'size', 'created_at', 'archive']
+
+class ChickenReportStore:
+    """炸雞對帳報告檔案索引類別"""
+
+    def __init__(self, store_dir: str, db_file: str = '.report_store.sqlite3',
+                 archive_dir: str = 'archive', retention_days: float = 14,
+                 compact_interval_seconds: float = 3600):
+        """
+        初始化報告索引
+
+        Args:
+            store_dir (str): 報告目錄
+            db_file (str): 索引資料庫檔名
+            archive_dir (str): 封存檔子目錄名稱
+            retention_days (float): 報告保存天數，超過後壓縮封存
+            compact_interval_seconds (float): 自動封存的最短間隔（秒）
+        """
+        self.store_dir = store_dir
+        self.db_path = os.path.join(store_dir, db_file)
+        self.archive_dir = os.path.join(store_dir, archive_dir)
+        self.retention_seconds = retention_days * 24 * 3600
+        self.compact_interval_seconds = compact_interval_seconds
+        # 第一次使用時才建立資料庫（匯入模組、建立報告生成器時不產生檔案）
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        建立資料庫連線（每次操作各自連線，可跨執行緒與程序使用）
+
+        呼叫端以 `with closing(self._connect()) as conn, conn:` 使用：
+        內層的 conn 在區塊結束時提交交易，closing 關閉連線（sqlite3 連線本身的 with 不會關閉連線）
+        """
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        if not self._ready:
+            conn.executescript(_SCHEMA)
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def _to_record(row) -> Optional[Dict]:
+        """資料列轉為字典"""
+        return dict(zip(_COLUMNS, row)) if row is not None else None
+
+    @staticmethod
+    def _file_hash(filepath: str) -> str:
+        """計算檔案內容的 SHA-256 雜湊值"""
+        hasher = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def register(self, filepath: str, period: str = '', report_format: str = '') -> Dict:
+        """
+        登錄報告檔案（同檔名已存在時以新內容取代並給予新的 ID）
+
+        Args:
+            filepath (str): 報告檔案路徑（須位於報告目錄中）
+            period (str): 對帳期間
+            report_format (str): 報告格式
+
+        Returns:
+            Dict: 報告索引資料
+        """
+        record = {
+            'report_id': uuid.uuid4().hex[:16],
+            'filename': os.path.basename(filepath),
+            'period': period,
+            'report_format': report_format,
+            'content_hash': self._file_hash(filepath),
+            'size': os.path.getsize(filepath),
+            'created_at': time.time(),
+            'archive': None
+        }
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM reports WHERE filename = ?', (record['filename'],))
+            conn.execute(f"INSERT INTO reports ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                         [record[column] for column in _COLUMNS])
+        return record
+
+    def get(self, report_id: str) -> Optional[Dict]:
+        """
+        依 ID 取得報告索引資料
+
+        Args:
+            report_id (str): 報告 ID
+
+        Returns:
+            Optional[Dict]: 報告索引資料，不存在時回傳 None
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM reports WHERE report_id = ?",
+                               (report_id,)).fetchone()
+        return self._to_record(row)
+
+    def get_by_filename(self, filename: str) -> Optional[Dict]:
+        """
+        依檔名取得報告索引資料
+
+        Args:
+            filename (str): 報告檔名
+
+        Returns:
+            Optional[Dict]: 報告索引資料，不存在時回傳 None
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM reports WHERE filename = ?",
+                               (filename,)).fetchone()
+        return self._to_record(row)
+
+    def list_reports(self, limit: int = 50, offset: int = 0, report_format: str = None) -> List[Dict]:
+        """
+        依建立時間由新到舊列出報告
+
+        Args:
+            limit (int): 筆數上限
+            offset (int): 略過筆數
+            report_format (str): 只列出指定格式，None 表示全部
+
+        Returns:
+            List[Dict]: 報告索引資料列表
+        """
+        query = f"SELECT {', '.join(_COLUMNS)} FROM reports"
+        params = []
+        if report_format:
+            query += ' WHERE report_format = ?'
+            params.append(report_format)
+        query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        with closing(self._connect()) as conn, conn:
+            return [self._to_record(row) for row in conn.execute(query, params)]
+
+    def count(self) -> int:
+        """報告總數"""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+
+    def get_path(self, record: Dict) -> str:
+        """未封存報告的檔案路徑"""
+        return os.path.join(self.store_dir, record['filename'])
+
+    def open_report(self, record: Dict) -> BinaryIO:
+        """
+        開啟報告內容（已封存的報告自封存檔讀出）
+
+        Args:
+            record (Dict): 報告索引資料
+
+        Returns:
+            BinaryIO: 報告內容
+        """
+        if record['archive'] is None:
+            return open(self.get_path(record), 'rb')
+        with zipfile.ZipFile(os.path.join(self.archive_dir, record['archive'])) as archive:
+            return io.BytesIO(archive.read(self._archive_member(record)))
+
+    @staticmethod
+    def _archive_member(record: Dict) -> str:
+        """封存檔中的成員名稱（加上 ID 前綴，同名報告重新生成後仍可區分）"""
+        return f"{record['report_id']}_{record['filename']}"
+
+    def forget(self, filename: str):
+        """
+        移除報告索引（檔案已被刪除時呼叫）
+
+        Args:
+            filename (str): 報告檔名
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM reports WHERE filename = ? AND archive IS NULL', (filename,))
+
+    def sync(self) -> int:
+        """
+        掃描報告目錄，登錄尚未納入索引的檔案並移除檔案已不存在的索引
+
+        Returns:
+            int: 新登錄的檔案數量
+        """
+        with closing(self._connect()) as conn, conn:
+            indexed = {row[0] for row in conn.execute('SELECT filename FROM reports WHERE archive IS NULL')}
+
+        present = set()
+        added = 0
+        with os.scandir(self.store_dir) as entries:
+            for entry in entries:
+                if (not entry.is_file() or entry.name.startswith('.')
+                        or entry.name.rsplit('.', 1)[-1] not in REPORT_EXTENSIONS):
+                    continue
+                present.add(entry.name)
+                # 空檔案為生成中的佔位檔
+                if entry.name not in indexed and entry.stat().st_size > 0:
+                    self.register(entry.path)
+                    added += 1
+
+        missing = indexed - present
+        if missing:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany('DELETE FROM reports WHERE filename = ? AND archive IS NULL',
+                                 [(filename,) for filename in missing])
+        logger.info(f"報告索引同步完成（新增 {added} 筆，移除 {len(missing)} 筆）")
+        return added
+
+    def compact(self, now: float = None) -> int:
+        """
+        將超過保存期限的報告壓縮封存
+
+        每次封存寫入一個新的 zip 檔（完成後才改名），已存在的封存檔不再修改，
+        讀取端不會讀到寫到一半的封存檔。
+
+        Args:
+            now (float): 目前時間（測試用），None 表示 time.time()
+
+        Returns:
+            int: 封存的報告數量
+        """
+        if now is None:
+            now = time.time()
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM reports "
+                                "WHERE archive IS NULL AND created_at < ? ORDER BY created_at",
+                                (now - self.retention_seconds,)).fetchall()
+        records = [self._to_record(row) for row in rows]
+        if not records:
+            return 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_name = f"炸雞對帳報告_{datetime.fromtimestamp(now).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.zip"
+        archive_path = os.path.join(self.archive_dir, archive_name)
+        tmp_path = f"{archive_path}.tmp"
+
+        archived = []
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for record in records:
+                try:
+                    archive.write(self.get_path(record), self._archive_member(record))
+                    archived.append(record)
+                except FileNotFoundError:
+                    self.forget(record['filename'])
+        if not archived:
+            os.remove(tmp_path)
+            return 0
+        os.replace(tmp_path, archive_path)
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany('UPDATE reports SET archive = ? WHERE report_id = ?',
+                             [(archive_name, record['report_id']) for record in archived])
+        for record in archived:
+            try:
+                os.remove(self.get_path(record))
+            except OSError as error:
+                logger.warning(f"刪除已封存報告失敗 {record['filename']}: {error}")
+
+        logger.info(f"已封存 {len(archived)} 個報告: {archive_path}")
+        return len(archived)
+
+    def compact_if_due(self) -> int:
+        """
+        距離上次封存超過 compact_interval_seconds 時執行封存（多個程序同時呼叫時只有一個會執行）
+
+        Returns:
+            int: 封存的報告數量
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'last_compact'").fetchone()
+            if row is not None and now - row[0] < self.compact_interval_seconds:
+                return 0
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('last_compact', ?)", (now,))
+        return self.compact(now)
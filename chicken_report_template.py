@@ -0,0 +1,237 @@
+"""
+炸雞對帳 Excel 報告樣板
+以 openpyxl 建立一次報告骨架（字型、欄寬、合併儲存格、圖表），
+之後每份報告只重新產生工作表的資料列，其餘檔案內容直接沿用
+"""
+import functools
+import io
+import math
+import re
+import threading
+import zipfile
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+from xml.sax.saxutils import escape
+import logging
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from chicken_report_generator import excel_value, summary_sheet_items, settlement_sheet_items
+
+logger = logging.getLogger(__name__)
+
+# 報告必要欄位，缺少時改用 openpyxl 逐一建立
+REQUIRED_FIELDS = ['期間', '總銷售金額', '總銷售數量', '總訂單數', '品項種類',
+                   '平均單價', '炸雞老闆應付金額', '成本比例', '利潤']
+
+# 表格工作表：(工作表名稱, 報告欄位, 資料欄位, 圖表編號)
+TABLE_SHEETS = [
+    ('品項摘要', '品項摘要', ['品項', '總數量', '總金額', '平均單價'], 1),
+    ('每日摘要', '每日摘要', ['日期', '總數量', '總金額'], 2),
+    ('詳細資料', '詳細資料', ['日期', '品項', '數量', '單價', '小計'], None)
+]
+
+# 表格工作表的資料自第 4 列開始（第 3 列為標題列）
+DATA_START_ROW = 4
+
+# 樣板報告每個表格的資料列數（單列時 openpyxl 會把圖表範圍寫成單一儲存格）
+PROTOTYPE_ROWS = 2
+
+_MAX_ROW_TOKEN = '__MAX_ROW__'
+_CELL_PATTERN = re.compile(r'<c r="([A-Z]+)(\d+)"(?: s="(\d+)")?')
+_ROW_PATTERN = re.compile(r'<row r="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_CHART_RANGE_PATTERN = re.compile(r'(<f>[^<]*:\$[A-Z]+\$)%d(</f>)' % (DATA_START_ROW + PROTOTYPE_ROWS - 1))
+_DIMENSION_PATTERN = re.compile(r'<dimension ref="A1:([A-Z]+)\d+" />')
+_TIMESTAMP_PATTERN = re.compile(r'(<dcterms:(?:created|modified) xsi:type="dcterms:W3CDTF">)[^<]*(<)')
+
+def _prototype_report() -> Dict:
+    """建立每個表格只有 PROTOTYPE_ROWS 列資料的樣板報告"""
+    dates = [pd.Timestamp('2000-01-01')] * PROTOTYPE_ROWS
+    zeros = [0] * PROTOTYPE_ROWS
+    names = [''] * PROTOTYPE_ROWS
+    return {
+        '期間': '', '總銷售金額': 0, '總銷售數量': 0, '總訂單數': 0, '品項種類': 0,
+        '平均單價': 0.0, '炸雞老闆應付金額': 0, '成本比例': 0.0, '利潤': 0,
+        '品項摘要': pd.DataFrame({'品項': names, '總數量': zeros, '總金額': zeros, '平均單價': zeros}),
+        '每日摘要': pd.DataFrame({'日期': dates, '總數量': zeros, '總金額': zeros}),
+        '詳細資料': pd.DataFrame({'日期': dates, '品項': names, '數量': zeros, '單價': zeros, '小計': zeros})
+    }
+
+def _render_cell(ref: str, value, style: str) -> str:
+    """產生單一儲存格的 XML"""
+    style_attr = f' s="{style}"' if style else ''
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return f'<c r="{ref}"{style_attr} t="n"><v>{value}</v></c>'
+    # 與 openpyxl 生成時相同，移除 XML 不允許的控制字元
+    text = excel_value(str(value))
+    if text == '':
+        return f'<c r="{ref}"{style_attr} t="inlineStr" />'
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+class _SheetTemplate:
+    """單一工作表的樣板：sheetData 前後的固定內容、固定列與各儲存格樣式"""
+
+    def __init__(self, xml: str):
+        head, rest = xml.split('<sheetData>', 1)
+        body, tail = rest.split('</sheetData>', 1)
+        self.prefix = _DIMENSION_PATTERN.sub(r'<dimension ref="A1:\1%s" />' % _MAX_ROW_TOKEN, head) + '<sheetData>'
+        self.suffix = '</sheetData>' + tail
+        self.rows = {int(match.group(1)): match.group(0) for match in _ROW_PATTERN.finditer(body)}
+        self.styles = {(col, int(row)): style or '' for col, row, style in _CELL_PATTERN.findall(body)}
+
+    def render(self, rows: List[str], max_row: int) -> str:
+        """組合完整的工作表 XML"""
+        return self.prefix.replace(_MAX_ROW_TOKEN, str(max_row)) + ''.join(rows) + self.suffix
+
+class ChickenExcelTemplate:
+    """預先編譯的炸雞對帳 Excel 報告樣板"""
+
+    def __init__(self, build_workbook: Callable[[Dict], Workbook]):
+        """
+        編譯樣板
+
+        Args:
+            build_workbook (Callable[[Dict], Workbook]): 以 openpyxl 建立報告工作簿的函式，
+                樣板版面完全取自此函式的輸出
+        """
+        wb = build_workbook(_prototype_report())
+        sheet_names = wb.sheetnames
+        buffer = io.BytesIO()
+        wb.save(buffer)
+
+        self.parts = []
+        self.sheets = {}
+        self.sheet_parts = {}
+        self.charts = {}
+        with zipfile.ZipFile(buffer) as archive:
+            for name in archive.namelist():
+                data = archive.read(name)
+                self.parts.append((name, data))
+                sheet_match = re.fullmatch(r'xl/worksheets/sheet(\d+)\.xml', name)
+                chart_match = re.fullmatch(r'xl/charts/chart(\d+)\.xml', name)
+                if sheet_match:
+                    sheet_name = sheet_names[int(sheet_match.group(1)) - 1]
+                    self.sheets[sheet_name] = _SheetTemplate(data.decode('utf-8'))
+                    self.sheet_parts[name] = sheet_name
+                elif chart_match:
+                    # 圖表資料範圍的結束列在每份報告填入
+                    self.charts[name] = _CHART_RANGE_PATTERN.sub(r'\g<1>%s\2' % _MAX_ROW_TOKEN, data.decode('utf-8'))
+        logger.info("Excel 報告樣板編譯完成")
+
+    def supports(self, report: Dict) -> bool:
+        """
+        檢查報告是否可用樣板生成（空白資料表沒有標題列與圖表，改用 openpyxl 逐一建立）
+
+        Args:
+            report (Dict): 炸雞對帳報告資料
+
+        Returns:
+            bool: 是否可用樣板
+        """
+        if any(field not in report for field in REQUIRED_FIELDS):
+            return False
+        return all(isinstance(report.get(key), pd.DataFrame) and not report[key].empty
+                   for sheet_name, key, _, _ in TABLE_SHEETS if sheet_name in self.sheets)
+
+    def _render_item_sheet(self, sheet_name: str, fixed_rows: List[int],
+                           items: List[Tuple[int, str, object]]) -> str:
+        """產生固定列加上「標籤 / 值」項目列的工作表"""
+        template = self.sheets[sheet_name]
+        rows = [template.rows[row] for row in fixed_rows]
+        max_row = max(fixed_rows)
+        for row, label, value in items:
+            cells = _render_cell(f'A{row}', label, template.styles.get(('A', row), ''))
+            cells += _render_cell(f'B{row}', value, template.styles.get(('B', row), ''))
+            rows.append(f'<row r="{row}">{cells}</row>')
+            max_row = max(max_row, row)
+        return template.render(rows, max_row)
+
+    def _render_table_sheet(self, sheet_name: str, df: pd.DataFrame, columns: List[str]) -> str:
+        """產生標題列加上資料列的表格工作表"""
+        template = self.sheets[sheet_name]
+        rows = [xml for row, xml in sorted(template.rows.items()) if row < DATA_START_ROW]
+
+        letters = [get_column_letter(index) for index in range(1, len(columns) + 1)]
+        styles = [template.styles.get((letter, DATA_START_ROW), '') for letter in letters]
+        values = []
+        for column in columns:
+            series = df[column]
+            if column == '日期':
+                values.append(pd.to_datetime(series).dt.strftime('%Y-%m-%d').tolist())
+            else:
+                values.append(series.tolist())
+
+        for offset, record in enumerate(zip(*values)):
+            row = DATA_START_ROW + offset
+            cells = ''.join(_render_cell(f'{letter}{row}', value, style)
+                            for letter, value, style in zip(letters, record, styles))
+            rows.append(f'<row r="{row}">{cells}</row>')
+        return template.render(rows, DATA_START_ROW + len(df) - 1)
+
+    def render(self, report: Dict, filepath: str):
+        """
+        以樣板生成報告檔案
+
+        Args:
+            report (Dict): 炸雞對帳報告資料
+            filepath (str): 輸出檔案路徑
+        """
+        sheets = {
+            '炸雞對帳摘要': self._render_item_sheet(
+                '炸雞對帳摘要', [1],
+                [(3, '對帳期間:', report['期間'])] +
+                [(row, label, value) for row, (label, value) in enumerate(summary_sheet_items(report), start=5)]
+            ),
+            '對帳明細': self._render_item_sheet(
+                '對帳明細', [1],
+                [(row, label, value) for row, (label, value) in enumerate(settlement_sheet_items(report), start=3)]
+            )
+        }
+        chart_rows = {}
+        for sheet_name, key, columns, chart_number in TABLE_SHEETS:
+            # 設定檔未包含的工作表不在樣板中
+            if sheet_name not in self.sheets:
+                continue
+            sheets[sheet_name] = self._render_table_sheet(sheet_name, report[key], columns)
+            if chart_number is not None:
+                chart_rows[f'xl/charts/chart{chart_number}.xml'] = DATA_START_ROW + len(report[key]) - 1
+
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in self.parts:
+                if name in self.sheet_parts:
+                    data = sheets[self.sheet_parts[name]].encode('utf-8')
+                elif name in self.charts:
+                    data = self.charts[name].replace(_MAX_ROW_TOKEN, str(chart_rows[name])).encode('utf-8')
+                elif name == 'docProps/core.xml':
+                    data = _TIMESTAMP_PATTERN.sub(r'\g<1>%s\2' % timestamp, data.decode('utf-8')).encode('utf-8')
+                archive.writestr(name, data)
+
+_templates = {}
+_template_lock = threading.Lock()
+
+def get_excel_template(build_workbook: Callable[..., Workbook], options: Dict) -> ChickenExcelTemplate:
+    """
+    取得本程序共用的 Excel 報告樣板（每種設定檔選項第一次呼叫時編譯）
+
+    Args:
+        build_workbook (Callable[..., Workbook]): 以 openpyxl 建立報告工作簿的函式，參數為 (報告, 設定檔選項)
+        options (Dict): 報告設定檔選項
+
+    Returns:
+        ChickenExcelTemplate: 報告樣板
+    """
+    key = (options['INCLUDE_CHARTS'], options['INCLUDE_DETAILS'])
+    template = _templates.get(key)
+    if template is None:
+        with _template_lock:
+            template = _templates.get(key)
+            if template is None:
+                template = ChickenExcelTemplate(functools.partial(build_workbook, options=options))
+                _templates[key] = template
+    return template
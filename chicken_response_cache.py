@@ -0,0 +1,145 @@
+"""
+炸雞對帳 API 回應快取
+以資料版本、價格版本與查詢參數計算回應指紋，保存已序列化的回應內容；
+指紋同時作為 ETag，用戶端帶 If-None-Match 時可直接回應 304
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+import logging
+from chicken_single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+def response_fingerprint(*parts) -> str:
+    """
+    計算回應指紋（相同的組成部分一定得到相同的指紋）
+
+    Args:
+        *parts: 端點名稱、資料版本、查詢參數等（None 以空字串表示）
+
+    Returns:
+        str: 指紋（16 位十六進位字串）
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(b'' if part is None else str(part).encode('utf-8'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()[:16]
+
+class ChickenResponseCache:
+    """炸雞對帳 API 回應快取類別（保存最近使用的回應，超過上限時移除最久未使用的項目）"""
+
+    def __init__(self, max_entries: int = 128):
+        """
+        初始化回應快取
+
+        Args:
+            max_entries (int): 保存的回應數量上限
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+        self._flight = SingleFlight()
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        """
+        取得快取的回應
+
+        Args:
+            fingerprint (str): 回應指紋
+
+        Returns:
+            Optional[Dict]: {'body': 回應內容 bytes, 'etag': ETag, 'created_at': 建立時間}，沒有時回傳 None
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self._stats['hits'] += 1
+            return entry
+
+    def store(self, fingerprint: str, body: bytes) -> Dict:
+        """
+        保存已序列化的回應
+
+        Args:
+            fingerprint (str): 回應指紋
+            body (bytes): 回應內容
+
+        Returns:
+            Dict: 快取項目
+        """
+        entry = {'body': body, 'etag': fingerprint, 'created_at': time.time()}
+        with self._lock:
+            self._entries[fingerprint] = entry
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _peek(self, fingerprint: str) -> Optional[Dict]:
+        """取得快取的回應（不計入統計）"""
+        with self._lock:
+            return self._entries.get(fingerprint)
+
+    def get_or_build(self, fingerprint: str, build: Callable[[], bytes]) -> Dict:
+        """
+        取得快取的回應，沒有時呼叫 build 產生並保存（相同指紋的並行請求只產生一次）
+
+        Args:
+            fingerprint (str): 回應指紋
+            build (Callable[[], bytes]): 產生回應內容的函式
+
+        Returns:
+            Dict: 快取項目
+        """
+        entry = self.get(fingerprint)
+        if entry is not None:
+            return entry
+
+        def build_entry():
+            # 等待期間其他呼叫端可能剛產生完成
+            return self._peek(fingerprint) or self.store(fingerprint, build())
+
+        return self._flight.do(fingerprint, build_entry)
+
+    async def get_or_build_async(self, fingerprint: str, build: Callable[[], Awaitable[bytes]]) -> Dict:
+        """
+        get_or_build 的 asyncio 版本
+
+        Args:
+            fingerprint (str): 回應指紋
+            build (Callable[[], Awaitable[bytes]]): 產生回應內容的協程函式
+
+        Returns:
+            Dict: 快取項目
+        """
+        entry = self.get(fingerprint)
+        if entry is not None:
+            return entry
+
+        async def build_entry():
+            return self._peek(fingerprint) or self.store(fingerprint, await build())
+
+        return await self._flight.do_async(fingerprint, build_entry)
+
+    def clear(self):
+        """清除所有快取的回應"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        取得統計資料
+
+        Returns:
+            Dict[str, int]: {'entries': 項目數, 'hits': 命中次數, 'misses': 未命中次數}
+        """
+        with self._lock:
+            return {'entries': len(self._entries), **self._stats}
@@ -0,0 +1,177 @@
+"""
+炸雞銷售明細查詢
+在依日期排序的銷售資料上以游標分頁或逐段串流（NDJSON）讀取明細，
+可依日期範圍與品項篩選；每次只處理一段資料列，記憶體用量不隨資料量增加
+"""
+import base64
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from chicken_json import dumps, frame_to_records
+
+logger = logging.getLogger(__name__)
+
+class CursorError(ValueError):
+    """資料已更新，游標失效"""
+
+def encode_cursor(version: str, position: int) -> str:
+    """
+    產生分頁游標
+
+    Args:
+        version (str): 資料版本
+        position (int): 下一頁開始的資料列位置
+
+    Returns:
+        str: 游標字串
+    """
+    payload = json.dumps({'v': version, 'p': position}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, version: str) -> int:
+    """
+    解析分頁游標
+
+    Args:
+        cursor (str): 游標字串
+        version (str): 目前的資料版本
+
+    Returns:
+        int: 下一頁開始的資料列位置
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = int(payload['p'])
+        cursor_version = payload['v']
+    except (ValueError, KeyError, TypeError) as error:
+        raise ValueError(f"無效的游標: {error}")
+    if position < 0:
+        raise ValueError("無效的游標")
+    if cursor_version != version:
+        raise CursorError("資料已更新，請重新從第一頁查詢")
+    return position
+
+def date_bounds(df: pd.DataFrame, start_date=None, end_date=None) -> Tuple[int, int]:
+    """
+    以二分搜尋取得日期範圍內的資料列位置（資料須依日期排序）
+
+    Args:
+        df (pd.DataFrame): 依日期排序的銷售資料
+        start_date: 開始日期（含），None 表示不限
+        end_date: 結束日期（含整天），None 表示不限
+
+    Returns:
+        Tuple[int, int]: (開始位置, 結束位置)，結束位置不含
+    """
+    if df.empty:
+        return 0, 0
+    dates = df['日期'].to_numpy()
+    low = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), 'left'))
+    if end_date is None:
+        # 沒有日期的資料列排在最後，不列入
+        high = len(dates) - int(np.isnat(dates).sum())
+    else:
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+        high = int(np.searchsorted(dates, np.datetime64(end), 'left'))
+    return low, max(low, high)
+
+def iter_detail_chunks(df: pd.DataFrame, start: int, stop: int, items: List[str] = None,
+                       chunk_rows: int = 500, limit: int = None) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    逐段讀取符合條件的明細
+
+    Args:
+        df (pd.DataFrame): 依日期排序的銷售資料
+        start (int): 開始位置
+        stop (int): 結束位置（不含）
+        items (List[str]): 只取這些品項，None 表示全部
+        chunk_rows (int): 每段掃描的資料列數
+        limit (int): 最多回傳的資料列數，None 表示不限
+
+    Yields:
+        Tuple[pd.DataFrame, int]: (符合條件的資料列, 下一段開始的位置)
+    """
+    remaining = limit
+    position = start
+    while position < stop and (remaining is None or remaining > 0):
+        chunk = df.iloc[position:min(position + chunk_rows, stop)]
+        if items:
+            mask = chunk['品項'].isin(items).to_numpy()
+            matched = np.flatnonzero(mask)
+        else:
+            matched = np.arange(len(chunk))
+        if remaining is not None and len(matched) > remaining:
+            # 取到上限為止，下一頁從最後一筆的下一列開始
+            matched = matched[:remaining]
+            next_position = position + int(matched[-1]) + 1
+        else:
+            next_position = position + len(chunk)
+        if len(matched):
+            yield chunk.iloc[matched], next_position
+            if remaining is not None:
+                remaining -= len(matched)
+        position = next_position
+
+def fetch_page(df: pd.DataFrame, version: str, start_date=None, end_date=None, items: List[str] = None,
+               limit: int = 100, cursor: Optional[str] = None, chunk_rows: int = 500) -> Dict:
+    """
+    取得一頁明細
+
+    Args:
+        df (pd.DataFrame): 依日期排序的銷售資料
+        version (str): 資料版本（納入游標，資料更新後舊游標失效）
+        start_date, end_date: 日期範圍
+        items (List[str]): 品項篩選
+        limit (int): 每頁筆數
+        cursor (str): 上一頁回傳的游標，None 表示第一頁
+        chunk_rows (int): 每段掃描的資料列數
+
+    Returns:
+        Dict: {'rows': 明細記錄, 'count': 筆數, 'next_cursor': 下一頁游標（沒有下一頁時為 None）}
+    """
+    low, high = date_bounds(df, start_date, end_date)
+    if cursor:
+        low = max(low, decode_cursor(cursor, version))
+
+    rows = []
+    position = low
+    for chunk, position in iter_detail_chunks(df, low, high, items, chunk_rows, limit):
+        rows.extend(frame_to_records(chunk))
+
+    has_more = len(rows) == limit and position < high and \
+        next(iter_detail_chunks(df, position, high, items, chunk_rows, 1), None) is not None
+    return {
+        'rows': rows,
+        'count': len(rows),
+        'next_cursor': encode_cursor(version, position) if has_more else None
+    }
+
+def stream_ndjson(df: pd.DataFrame, version: str, start_date=None, end_date=None, items: List[str] = None,
+                  cursor: Optional[str] = None, limit: int = None, chunk_rows: int = 500) -> Iterator[bytes]:
+    """
+    以 NDJSON 逐段輸出明細（每行一筆記錄，每段編碼後立即送出）
+
+    Args:
+        df (pd.DataFrame): 依日期排序的銷售資料
+        version (str): 資料版本
+        start_date, end_date: 日期範圍
+        items (List[str]): 品項篩選
+        cursor (str): 從游標位置開始，None 表示從頭開始
+        limit (int): 最多輸出的資料列數，None 表示不限
+        chunk_rows (int): 每段掃描的資料列數
+
+    Returns:
+        Iterator[bytes]: NDJSON 內容（游標在呼叫時即檢查，錯誤不會延後到開始串流之後）
+    """
+    low, high = date_bounds(df, start_date, end_date)
+    if cursor:
+        low = max(low, decode_cursor(cursor, version))
+
+    def generate():
+        for chunk, _ in iter_detail_chunks(df, low, high, items, chunk_rows, limit):
+            yield b''.join(dumps(record) + b'\n' for record in frame_to_records(chunk))
+
+    return generate()
@@ -6,27 +6,32 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
+from chicken_timing import timed
 
 logger = logging.getLogger(__name__)
 
 class ChickenSettlementCalculator:
     """炸雞對帳計算器類別"""
     
-    def __init__(self, chicken_products_config: Dict[str, Dict[str, float]]):
+    def __init__(self, chicken_products_config: Dict[str, Dict[str, float]], price_history=None):
         """
         初始化計算器
         
         Args:
             chicken_products_config (Dict[str, Dict[str, float]]): 炸雞品項設定，包含成本和售價
+            price_history (ChickenPriceHistory): 價格歷史，以過去的價格結算時使用
         """
         self.chicken_products_config = chicken_products_config
+        self.price_history = price_history
     
-    def process_chicken_sales_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    @timed('calculator.process', rows=len)
+    def process_chicken_sales_data(self, df: pd.DataFrame, historic_prices: bool = False) -> pd.DataFrame:
         """
         處理炸雞銷售資料，清理和標準化資料
         
         Args:
             df (pd.DataFrame): 原始銷售資料
+            historic_prices (bool): 是否以銷售當天適用的價格（價格歷史）計算售價與成本
             
         Returns:
             pd.DataFrame: 處理後的資料
@@ -70,6 +75,9 @@ class ChickenSettlementCalculator:
             processed_df['成本'] = processed_df['品項'].map(lambda x: self.chicken_products_config.get(x, {}).get('cost', 0))
             processed_df['成本小計'] = processed_df['數量'] * processed_df['成本']
             
+            if historic_prices:
+                processed_df = self.apply_historic_prices(processed_df)
+            
             logger.info(f"處理完成，有效炸雞銷售資料 {len(processed_df)} 筆")
             return processed_df
             
@@ -77,6 +85,36 @@ class ChickenSettlementCalculator:
             logger.error(f"處理炸雞銷售資料時發生錯誤: {error}")
             raise
     
+    @timed('calculator.historic_prices', rows=len)
+    def apply_historic_prices(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        以銷售當天適用的價格重新計算單價、成本與小計（每個日期只查詢一次價格歷史）；
+        價格歷史沒有紀錄的品項或日期維持目前設定的價格
+        
+        Args:
+            df (pd.DataFrame): 處理後的銷售資料
+            
+        Returns:
+            pd.DataFrame: 以過去價格計算的資料
+        """
+        if self.price_history is None or df.empty:
+            return df
+        
+        days = df['日期'].dt.normalize()
+        tables = {day: self.price_history.prices_as_of(day) or {} for day in days.unique()}
+        prices = [tables[day].get(item) for day, item in zip(days, df['品項'])]
+        
+        df = df.copy()
+        df['單價'] = self._integral(pd.Series([info['price'] if info else None for info in prices],
+                                            index=df.index, dtype='float64').fillna(df['單價']))
+        df['成本'] = self._integral(pd.Series([info['cost'] if info else None for info in prices],
+                                            index=df.index, dtype='float64').fillna(df['成本']))
+        df['小計'] = df['數量'] * df['單價']
+        df['成本小計'] = df['數量'] * df['成本']
+        
+        logger.info(f"以過去價格計算，共查詢 {len(tables)} 天的價格表")
+        return df
+    
     def calculate_settlement_period(self, start_date: datetime, period_days: int = 14) -> Tuple[datetime, datetime]:
         """
         計算結算期間
@@ -91,6 +129,7 @@ class ChickenSettlementCalculator:
         end_date = start_date + timedelta(days=period_days - 1)
         return start_date, end_date
     
+    @timed('calculator.filter_period', rows=len)
     def filter_data_by_period(self, df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
         """
         根據日期範圍篩選資料
@@ -115,6 +154,7 @@ class ChickenSettlementCalculator:
             logger.error(f"篩選資料時發生錯誤: {error}")
             raise
     
+    @timed('calculator.product_summary', rows=len)
     def calculate_chicken_product_summary(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         計算各炸雞品項的銷售摘要
@@ -149,6 +189,7 @@ class ChickenSettlementCalculator:
             logger.error(f"計算炸雞品項摘要時發生錯誤: {error}")
             raise
     
+    @timed('calculator.daily_summary', rows=len)
     def calculate_daily_chicken_summary(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         計算每日炸雞銷售摘要
@@ -182,6 +223,7 @@ class ChickenSettlementCalculator:
             logger.error(f"計算每日炸雞摘要時發生錯誤: {error}")
             raise
     
+    @timed('calculator.settlement')
     def calculate_chicken_settlement(self, df: pd.DataFrame) -> Dict:
         """
         計算炸雞對帳金額
@@ -228,7 +270,9 @@ class ChickenSettlementCalculator:
             logger.error(f"計算炸雞對帳時發生錯誤: {error}")
             raise
     
-    def generate_text_settlement_summary(self, df: pd.DataFrame, start_date: datetime, end_date: datetime) -> str:
+    @timed('calculator.text_summary')
+    def generate_text_settlement_summary(self, df: pd.DataFrame, start_date: datetime, end_date: datetime,
+                                         historic_prices: bool = False) -> str:
         """
         生成純文字對帳摘要，方便與雞排老闆對帳
         
@@ -236,13 +280,14 @@ class ChickenSettlementCalculator:
             df (pd.DataFrame): 銷售資料
             start_date (datetime): 開始日期
             end_date (datetime): 結束日期
+            historic_prices (bool): 是否以銷售當天適用的價格計算
             
         Returns:
             str: 純文字對帳摘要
         """
         try:
             # 處理資料
-            processed_df = self.process_chicken_sales_data(df)
+            processed_df = self.process_chicken_sales_data(df, historic_prices)
             
             # 篩選期間資料
             period_df = self.filter_data_by_period(processed_df, start_date, end_date)
@@ -270,7 +315,8 @@ class ChickenSettlementCalculator:
             # 按日期分組，顯示每個日期的品項明細
             daily_items = period_df.groupby('日期').apply(lambda x: x.groupby('品項').agg({
                 '數量': 'sum',
-                '小計': 'sum'
+                '小計': 'sum',
+                '成本': 'first'
             }).reset_index()).reset_index(level=0)
             
             current_date = None
@@ -287,8 +333,8 @@ class ChickenSettlementCalculator:
                 # 顯示該日期的品項明細（使用進價）
                 item_name = row['品項']
                 quantity = row['數量']
-                # 計算進價總額
-                cost_per_unit = self.chicken_products_config.get(item_name, {}).get('cost', 0)
+                # 計算進價總額（同一天的進價相同）
+                cost_per_unit = row['成本']
                 cost_total = quantity * cost_per_unit
                 text_summary.append(f"  {item_name}：{quantity} 份 × {cost_per_unit} 元（進價） = {cost_total} 元")
             
@@ -303,7 +349,7 @@ class ChickenSettlementCalculator:
                 for _, item_row in daily_items.iterrows():
                     item_name = item_row['品項']
                     quantity = item_row['數量']
-                    cost_per_unit = self.chicken_products_config.get(item_name, {}).get('cost', 0)
+                    cost_per_unit = item_row['成本']
                     daily_cost += quantity * cost_per_unit
                 text_summary.append(f"{date_str}：總計 {row['總數量']} 份，進價 {daily_cost} 元")
             
@@ -314,10 +360,9 @@ class ChickenSettlementCalculator:
             text_summary.append("-" * 30)
             for _, row in product_summary.iterrows():
                 item_name = row['品項']
-                quantity = row['總數量']
-                cost = self.chicken_products_config.get(item_name, {}).get('cost', 0)
-                cost_total = quantity * cost
-                text_summary.append(f"{item_name}：{quantity} 份 × {cost} 元（進價） = {cost_total} 元")
+                for cost, quantity in self._cost_breakdown(period_df, item_name):
+                    cost_total = quantity * cost
+                    text_summary.append(f"{item_name}：{quantity} 份 × {cost} 元（進價） = {cost_total} 元")
             
             text_summary.append("")
             
@@ -330,10 +375,9 @@ class ChickenSettlementCalculator:
             text_summary.append("金額計算明細：")
             for _, row in product_summary.iterrows():
                 item_name = row['品項']
-                quantity = row['總數量']
-                cost = self.chicken_products_config.get(item_name, {}).get('cost', 0)
-                cost_total = quantity * cost
-                text_summary.append(f"  {item_name}：{quantity} 份 × {cost} 元 = {cost_total} 元")
+                for cost, quantity in self._cost_breakdown(period_df, item_name):
+                    cost_total = quantity * cost
+                    text_summary.append(f"  {item_name}：{quantity} 份 × {cost} 元 = {cost_total} 元")
             
             text_summary.append("")
             text_summary.append("=" * 50)
@@ -346,7 +390,27 @@ class ChickenSettlementCalculator:
             logger.error(f"生成文字對帳摘要時發生錯誤: {error}")
             raise
 
-    def generate_chicken_settlement_report(self, df: pd.DataFrame, start_date: datetime, end_date: datetime) -> Dict:
+    @staticmethod
+    def _integral(values: pd.Series) -> pd.Series:
+        """價格都是整數時轉為整數欄位（與目前價格設定的整數價格相同，摘要顯示 80 元而非 80.0 元）"""
+        if not values.empty and values.notna().all() and (values % 1 == 0).all():
+            return values.astype('int64')
+        return values
+
+    @staticmethod
+    def _cost_breakdown(period_df: pd.DataFrame, item_name: str) -> List[Tuple[float, float]]:
+        """
+        品項在期間內各進價的數量（期間內價格沒有變更時只有一筆）
+        
+        Returns:
+            List[Tuple[float, float]]: [(進價, 數量)]
+        """
+        item_rows = period_df[period_df['品項'] == item_name]
+        return list(item_rows.groupby('成本', sort=True)['數量'].sum().items())
+
+    @timed('calculator.report', rows=lambda report: len(report['詳細資料']))
+    def generate_chicken_settlement_report(self, df: pd.DataFrame, start_date: datetime, end_date: datetime,
+                                           historic_prices: bool = False) -> Dict:
         """
         生成完整的炸雞對帳報告
         
@@ -354,13 +418,15 @@ class ChickenSettlementCalculator:
             df (pd.DataFrame): 銷售資料
             start_date (datetime): 開始日期
             end_date (datetime): 結束日期
+            historic_prices (bool): 是否以銷售當天適用的價格（價格歷史）結算，
+                False 表示以目前的價格設定結算
             
         Returns:
             Dict: 完整炸雞對帳報告
         """
         try:
             # 處理資料
-            processed_df = self.process_chicken_sales_data(df)
+            processed_df = self.process_chicken_sales_data(df, historic_prices)
             
             # 篩選期間資料
             period_df = self.filter_data_by_period(processed_df, start_date, end_date)
@@ -384,7 +450,7 @@ class ChickenSettlementCalculator:
             settlement_info = self.calculate_chicken_settlement(period_df)
             
             # 生成文字摘要
-            text_summary = self.generate_text_settlement_summary(df, start_date, end_date)
+            text_summary = self.generate_text_settlement_summary(df, start_date, end_date, historic_prices)
             
             # 組合報告
             report = {
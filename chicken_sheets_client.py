@@ -1,18 +1,15 @@
 """
 炸雞對帳系統 Google Sheets 客戶端
 專門處理炸雞品項的 Google Sheets 資料讀取
+（Google API 套件在建立客戶端時才載入，匯入本模組不需要安裝或載入它們）
 """
 import os
 import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import pandas as pd
 from datetime import datetime
 import logging
 from chicken_config import GOOGLE_SHEETS_CONFIG, CHICKEN_PRODUCTS_CONFIG, CHICKEN_COLUMN_MAPPING
+from chicken_timing import timed
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
@@ -43,6 +40,10 @@ class ChickenSheetsClient:
     
     def _authenticate(self):
         """進行 Google API 認證"""
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+        
         creds = None
         
         # 載入已存在的 token
@@ -101,6 +102,7 @@ class ChickenSheetsClient:
             # 使用預設價格
             self.chicken_prices = CHICKEN_PRODUCTS_CONFIG.copy()
     
+    @timed('sheets_api.read', rows=len)
     def read_data(self, sheet_name, range_name):
         """
         讀取 Google Sheet 資料
@@ -112,6 +114,8 @@ class ChickenSheetsClient:
         Returns:
             list: 資料列表
         """
+        from googleapiclient.errors import HttpError
+        
         try:
             range_full = f"{sheet_name}!{range_name}"
             result = self.service.spreadsheets().values().get(
@@ -127,6 +131,7 @@ class ChickenSheetsClient:
             logger.error(f"讀取資料時發生錯誤: {error}")
             raise
     
+    @timed('sheets_api.get_chicken_sales_data', rows=len)
     def get_chicken_sales_data(self):
         """
         取得炸雞銷售資料
@@ -0,0 +1,110 @@
+"""
+炸雞對帳系統單一請求合併（single-flight）
+同一個鍵的工作同時只執行一次，其餘並行的呼叫端等待並共用同一個結果；
+執行緒（Flask）與 asyncio 呼叫端共用同一張進行中工作表
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """單一請求合併類別"""
+
+    def __init__(self):
+        """初始化進行中工作表"""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executed': 0, 'shared': 0}
+
+    def _join(self, key: Hashable):
+        """
+        加入進行中的工作，沒有時建立新的工作
+
+        Returns:
+            tuple: (Future, 是否由本呼叫端執行)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats['shared'] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._stats['executed'] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result=None, error: BaseException = None):
+        """移除進行中工作並通知等待的呼叫端"""
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs):
+        """
+        執行工作（執行緒呼叫端）；相同鍵的工作進行中時等待其結果
+
+        Args:
+            key (Hashable): 工作識別鍵
+            func (Callable): 工作函式
+            *args, **kwargs: 函式參數
+
+        Returns:
+            工作結果（所有等待的呼叫端取得同一個物件，不可修改）
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, func: Callable, *args, **kwargs):
+        """
+        執行工作（asyncio 呼叫端）；相同鍵的工作進行中時等待其結果，不阻塞事件迴圈
+
+        Args:
+            key (Hashable): 工作識別鍵
+            func (Callable): 工作函式，可為協程函式或一般函式（一般函式在預設執行緒池中執行）
+            *args, **kwargs: 函式參數
+
+        Returns:
+            工作結果（所有等待的呼叫端取得同一個物件，不可修改）
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            if asyncio.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        取得統計資料
+
+        Returns:
+            Dict[str, int]: {'executed': 實際執行次數, 'shared': 共用其他呼叫端結果的次數}
+        """
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,266 @@
+"""
+炸雞對帳階段計時
+以輕量的 span 記錄各處理階段（下載工作表、解析 CSV、轉換、計算、產生報告、JSON 編碼、
+API 請求）的經過時間、CPU 時間與資料筆數，保存在程序內固定大小的環形緩衝區，
+可由 /api/timings 查詢各階段的統計與最近的紀錄
+
+停用時 span() 只檢查一個旗標並回傳共用的空物件，不取得時間也不配置記憶體
+"""
+import functools
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional
+import logging
+from chicken_config import TIMING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class SpanRecord(NamedTuple):
+    """一個階段的計時紀錄"""
+    name: str
+    # 外層階段名稱（例如 API 請求），沒有時為 None
+    parent: Optional[str]
+    # 開始時間（epoch 秒）
+    started_at: float
+    wall_ms: float
+    # 非同步請求與其他協程交錯執行，無法區分 CPU 時間，為 None
+    cpu_ms: Optional[float]
+    rows: Optional[int]
+    error: bool
+    thread: str
+
+    def to_dict(self) -> Dict:
+        """轉為 API 回應格式"""
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'started_at': round(self.started_at, 3),
+            'wall_ms': round(self.wall_ms, 3),
+            'cpu_ms': round(self.cpu_ms, 3) if self.cpu_ms is not None else None,
+            'rows': self.rows,
+            'error': self.error,
+            'thread': self.thread
+        }
+
+class _Span:
+    """計時中的階段（以 with 使用；rows 可在區塊內設定）"""
+
+    __slots__ = ('timer', 'name', 'rows', 'parent', '_started_at', '_wall', '_cpu')
+
+    def __init__(self, timer: 'ChickenTimer', name: str, rows: Optional[int]):
+        self.timer = timer
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self) -> '_Span':
+        stack = self.timer._stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._started_at = time.time()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        wall_ms = (time.perf_counter() - self._wall) * 1000
+        cpu_ms = (time.thread_time() - self._cpu) * 1000
+        stack = self.timer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        self.timer._record(SpanRecord(
+            self.name, self.parent, self._started_at, wall_ms, cpu_ms,
+            None if self.rows is None else int(self.rows), exc_type is not None,
+            threading.current_thread().name
+        ))
+        return False
+
+class _NullSpan:
+    """停用計時時使用的空物件（所有執行緒共用，設定 rows 不會保存）"""
+
+    __slots__ = ()
+
+    rows = property(lambda self: None, lambda self, value: None)
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class ChickenTimer:
+    """炸雞對帳階段計時類別"""
+
+    def __init__(self, capacity: int = 2048, enabled: bool = True, slow_ms: float = None):
+        """
+        初始化計時器
+
+        Args:
+            capacity (int): 環形緩衝區保留的紀錄數，超過時捨棄最舊的紀錄
+            enabled (bool): 是否記錄
+            slow_ms (float): 經過時間超過此毫秒數的階段寫入警告日誌，None 表示不寫入
+        """
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        # deque 的 append 在多執行緒下不需要另外加鎖
+        self._buffer = deque(maxlen=capacity)
+        self._local = threading.local()
+
+    def span(self, name: str, rows: int = None):
+        """
+        計時一個階段
+
+        Args:
+            name (str): 階段名稱（例如 'sheets.read_csv'）
+            rows (int): 資料筆數，也可以在區塊內以 span.rows 設定
+
+        Returns:
+            with 使用的計時物件；停用時回傳不記錄的空物件
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, rows)
+
+    def timed(self, name: str, rows: Callable = None) -> Callable:
+        """
+        計時函式的裝飾器
+
+        Args:
+            name (str): 階段名稱
+            rows (Callable): 由回傳值取得資料筆數的函式（例如 len），None 表示不記錄筆數
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, None) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        span.rows = rows(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def _stack(self) -> List[_Span]:
+        """目前執行緒計時中的階段"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, name: str, started_at: float, wall_ms: float, cpu_ms: float = None,
+               rows: int = None, error: bool = False):
+        """
+        直接記錄一個階段（用於無法以 with 包住的情況，例如 ASGI 的非同步請求）
+
+        Args:
+            name (str): 階段名稱
+            started_at (float): 開始時間（epoch 秒）
+            wall_ms (float): 經過時間（毫秒）
+            cpu_ms (float): CPU 時間（毫秒），None 表示未測量
+            rows (int): 資料筆數
+            error (bool): 是否發生錯誤
+        """
+        if self.enabled:
+            self._record(SpanRecord(name, None, started_at, wall_ms, cpu_ms, rows, error,
+                                    threading.current_thread().name))
+
+    def _record(self, record: SpanRecord):
+        self._buffer.append(record)
+        if self.slow_ms is not None and record.wall_ms >= self.slow_ms:
+            cpu = f"{record.cpu_ms:.1f} ms" if record.cpu_ms is not None else '-'
+            logger.warning(f"{record.name} 耗時 {record.wall_ms:.1f} ms（CPU {cpu}，"
+                           f"{record.rows if record.rows is not None else '-'} 筆）")
+
+    def records(self, name: str = None, limit: int = None) -> List[SpanRecord]:
+        """
+        取得最近的紀錄（由舊到新）
+
+        Args:
+            name (str): 只取得此階段，None 表示全部
+            limit (int): 最多回傳筆數（最新的），None 表示全部
+
+        Returns:
+            List[SpanRecord]: 計時紀錄
+        """
+        records = [record for record in tuple(self._buffer) if name is None or record.name == name]
+        return records[-limit:] if limit else records
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        各階段的統計（依總經過時間由大到小）
+
+        Returns:
+            Dict[str, Dict]: {階段名稱: 次數、錯誤數、經過時間與 CPU 時間的合計／平均／最大值、筆數合計}
+        """
+        groups = {}
+        for record in tuple(self._buffer):
+            groups.setdefault(record.name, []).append(record)
+
+        summary = {}
+        for name, records in groups.items():
+            wall = sorted(record.wall_ms for record in records)
+            cpu = [record.cpu_ms for record in records if record.cpu_ms is not None]
+            rows = [record.rows for record in records if record.rows is not None]
+            summary[name] = {
+                'count': len(records),
+                'errors': sum(record.error for record in records),
+                'wall_ms_total': round(sum(wall), 3),
+                'wall_ms_avg': round(sum(wall) / len(wall), 3),
+                'wall_ms_p95': round(wall[min(len(wall) - 1, int(len(wall) * 0.95))], 3),
+                'wall_ms_max': round(wall[-1], 3),
+                'cpu_ms_total': round(sum(cpu), 3) if cpu else None,
+                'cpu_ms_avg': round(sum(cpu) / len(cpu), 3) if cpu else None,
+                'rows_total': sum(rows) if rows else None
+            }
+        return dict(sorted(summary.items(), key=lambda item: item[1]['wall_ms_total'], reverse=True))
+
+    def clear(self):
+        """清除所有紀錄"""
+        self._buffer.clear()
+
+# 共用的計時器
+timer = ChickenTimer(TIMING_CONFIG['BUFFER_SIZE'], TIMING_CONFIG['ENABLED'], TIMING_CONFIG['SLOW_MS'])
+
+def span(name: str, rows: int = None):
+    """以共用的計時器計時一個階段（見 ChickenTimer.span）"""
+    return timer.span(name, rows)
+
+def timed(name: str, rows: Callable = None) -> Callable:
+    """以共用的計時器計時函式（見 ChickenTimer.timed）"""
+    return timer.timed(name, rows)
+
+def init_app(app, timer_instance: ChickenTimer = None) -> ChickenTimer:
+    """
+    計時 Flask 應用程式的每個請求（階段名稱為 'http GET /api/real_data' 形式，
+    請求內的其他階段以此為外層）
+
+    Args:
+        app (Flask): Flask 應用程式
+        timer_instance (ChickenTimer): 計時器，None 表示使用共用的計時器
+
+    Returns:
+        ChickenTimer: 計時器
+    """
+    from flask import g, request
+    active = timer_instance or timer
+
+    @app.before_request
+    def _start_request_span():
+        if not active.enabled:
+            return
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        g.chicken_timing_span = active.span(f"http {request.method} {rule}").__enter__()
+
+    @app.teardown_request
+    def _finish_request_span(error=None):
+        request_span = g.pop('chicken_timing_span', None)
+        if request_span is not None:
+            request_span.__exit__(type(error) if error is not None else None, error, None)
+
+    return active
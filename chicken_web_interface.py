@@ -1,16 +1,18 @@
 """
 炸雞對帳系統網頁介面
 專門處理炸雞品項的對帳功能
+（pandas、對帳計算器、報告生成器與 Google Sheets 客戶端在第一次使用時才載入與建立，
+首頁等不需要它們的路由不必等待）
 """
 from flask import Flask, render_template, request, jsonify, send_file
-import pandas as pd
 from datetime import datetime, timedelta
 import os
 import json
-from chicken_settlement_calculator import ChickenSettlementCalculator
-from chicken_report_generator import ChickenReportGenerator
-from chicken_config import CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG
-from real_chicken_sheets_client import RealChickenSheetsClient
+import threading
+from chicken_config import CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG, REPORT_CONFIG, REPORT_PROFILES
+from chicken_json import frame_to_records, to_native, init_app
+import chicken_compression
+import chicken_timing
 import logging
 
 # 設定日誌
@@ -18,24 +20,60 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+init_app(app)
+compression = chicken_compression.init_app(app)
+# 記錄每個請求的經過時間（計算與報告生成的各階段由各模組記錄）
+timer = chicken_timing.init_app(app)
 
-# 全域變數
-calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG)
-report_generator = ChickenReportGenerator("chicken_reports")
+# 全域變數（第一次使用時建立）
+_lock = threading.Lock()
+_calculator = None
+_report_generator = None
+_sheets_client = None
+_sheets_client_checked = False
 
-# 嘗試建立 Google Sheets 客戶端，如果失敗則使用測試模式
-sheets_client = None
-try:
-    if os.path.exists(GOOGLE_SHEETS_CONFIG['CREDENTIALS_FILE']):
-        sheets_client = RealChickenSheetsClient(
-            GOOGLE_SHEETS_CONFIG['SHEET_ID'],
-            GOOGLE_SHEETS_CONFIG['CREDENTIALS_FILE']
-        )
-        logger.info("Google Sheets 客戶端初始化成功")
-    else:
-        logger.warning("Google API 認證檔案不存在，將使用測試模式")
-except Exception as error:
-    logger.warning(f"無法初始化 Google Sheets 客戶端: {error}，將使用測試模式")
+def get_calculator():
+    """取得共用的對帳計算器"""
+    global _calculator
+    with _lock:
+        if _calculator is None:
+            from chicken_settlement_calculator import ChickenSettlementCalculator
+            _calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG)
+        return _calculator
+
+def get_report_generator():
+    """取得共用的報告生成器"""
+    global _report_generator
+    with _lock:
+        if _report_generator is None:
+            from chicken_report_generator import ChickenReportGenerator
+            _report_generator = ChickenReportGenerator("chicken_reports")
+        return _report_generator
+
+def get_sheets_client():
+    """
+    取得 Google Sheets 客戶端（認證與 API 呼叫延後到第一次讀取資料時）
+    
+    Returns:
+        RealChickenSheetsClient: 客戶端，認證檔案不存在或無法建立時回傳 None（使用測試模式）
+    """
+    global _sheets_client, _sheets_client_checked
+    with _lock:
+        if not _sheets_client_checked:
+            _sheets_client_checked = True
+            try:
+                if os.path.exists(GOOGLE_SHEETS_CONFIG['CREDENTIALS_FILE']):
+                    from real_chicken_sheets_client import RealChickenSheetsClient
+                    _sheets_client = RealChickenSheetsClient(
+                        GOOGLE_SHEETS_CONFIG['SHEET_ID'],
+                        GOOGLE_SHEETS_CONFIG['CREDENTIALS_FILE']
+                    )
+                    logger.info("Google Sheets 客戶端初始化成功")
+                else:
+                    logger.warning("Google API 認證檔案不存在，將使用測試模式")
+            except Exception as error:
+                logger.warning(f"無法初始化 Google Sheets 客戶端: {error}，將使用測試模式")
+        return _sheets_client
 
 @app.route('/')
 def index():
@@ -47,7 +85,8 @@ def get_real_data():
     """取得真實 Google Sheet 資料"""
     try:
         # 讀取真實的 Google Sheet 資料
-        df = sheets_client.read_chicken_sales_data(
+        calculator = get_calculator()
+        df = get_sheets_client().read_chicken_sales_data(
             GOOGLE_SHEETS_CONFIG['MAIN_SHEET_NAME'],
             GOOGLE_SHEETS_CONFIG['SETTINGS_SHEET_NAME'],
             GOOGLE_SHEETS_CONFIG['DATA_RANGE'],
@@ -68,20 +107,11 @@ def get_real_data():
         product_summary = calculator.calculate_chicken_product_summary(processed_df)
         settlement_info = calculator.calculate_chicken_settlement(processed_df)
         
-        # 轉換為 JSON 格式，處理 int64 序列化問題
-        daily_summary_dict = daily_summary.astype(str).to_dict('records')
-        product_summary_dict = product_summary.astype(str).to_dict('records')
-        
-        # 處理 settlement_info 中的數值
-        settlement_info_dict = {}
-        for key, value in settlement_info.items():
-            if pd.isna(value):
-                settlement_info_dict[key] = 0
-            else:
-                settlement_info_dict[key] = float(value)
-        
-        # 處理原始資料
-        raw_data_dict = processed_df.head(10).astype(str).to_dict('records')
+        # 逐欄轉換為 JSON 原生型別（數值維持數值、日期為 ISO 字串）
+        daily_summary_dict = frame_to_records(daily_summary)
+        product_summary_dict = frame_to_records(product_summary)
+        settlement_info_dict = to_native(settlement_info, na_value=0)
+        raw_data_dict = frame_to_records(processed_df.head(10))
         
         result = {
             'success': True,
@@ -103,6 +133,9 @@ def get_real_data():
 def get_test_data():
     """取得測試資料（備用）"""
     try:
+        import pandas as pd
+        calculator = get_calculator()
+        
         # 建立測試資料
         test_data = {
             '日期': [
@@ -134,20 +167,11 @@ def get_test_data():
         product_summary = calculator.calculate_chicken_product_summary(processed_df)
         settlement_info = calculator.calculate_chicken_settlement(processed_df)
         
-        # 轉換為 JSON 格式，處理 int64 序列化問題
-        daily_summary_dict = daily_summary.astype(str).to_dict('records')
-        product_summary_dict = product_summary.astype(str).to_dict('records')
-        
-        # 處理 settlement_info 中的數值
-        settlement_info_dict = {}
-        for key, value in settlement_info.items():
-            if pd.isna(value):
-                settlement_info_dict[key] = 0
-            else:
-                settlement_info_dict[key] = float(value)
-        
-        # 處理原始資料
-        raw_data_dict = processed_df.head(10).astype(str).to_dict('records')
+        # 逐欄轉換為 JSON 原生型別（數值維持數值、日期為 ISO 字串）
+        daily_summary_dict = frame_to_records(daily_summary)
+        product_summary_dict = frame_to_records(product_summary)
+        settlement_info_dict = to_native(settlement_info, na_value=0)
+        raw_data_dict = frame_to_records(processed_df.head(10))
         
         result = {
             'success': True,
@@ -172,6 +196,16 @@ def generate_report():
         data = request.json
         start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
         end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        report_format = data.get('format', REPORT_CONFIG['FORMAT'])
+        from chicken_report_exporters import REPORT_FORMATS
+        if report_format not in REPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"不支援的報告格式: {report_format}"})
+        profile = data.get('profile') or REPORT_CONFIG['WEB_PROFILE']
+        if profile not in REPORT_PROFILES:
+            return jsonify({'success': False, 'error': f"不支援的報告設定檔: {profile}"})
+        
+        import pandas as pd
+        calculator = get_calculator()
         
         # 建立測試資料
         test_data = {
@@ -196,13 +230,15 @@ def generate_report():
         df['日期'] = pd.to_datetime(df['日期'])
         settlement_report = calculator.generate_chicken_settlement_report(df, start_date, end_date)
         
-        # 生成 Excel 報告
-        excel_file = report_generator.generate_excel_report(settlement_report)
+        # 生成報告檔案
+        report_file = get_report_generator().generate_report(settlement_report, report_format, profile=profile)
         
         return jsonify({
             'success': True,
             'message': '炸雞對帳報告生成成功',
-            'excel_file': excel_file,
+            'excel_file': report_file,
+            'report_file': report_file,
+            'format': report_format,
             'report_data': {
                 '期間': settlement_report['期間'],
                 '總銷售金額': settlement_report['總銷售金額'],
@@ -230,6 +266,10 @@ def download_report(filename):
         logger.error(f"下載報告時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+# 首頁內容固定，啟動時預先壓縮
+if compression is not None:
+    compression.precompress(app, ['/'])
+
 if __name__ == '__main__':
     # 確保 reports 目錄存在
     if not os.path.exists('chicken_reports'):
@@ -3,10 +3,10 @@
 不需要 API 認證，直接從公開的 CSV 連結讀取
 """
 import pandas as pd
-import requests
 from typing import Dict, List, Optional
 import logging
 from io import StringIO
+from chicken_timing import span, timed
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +34,9 @@ class DirectSheetsReader:
         Returns:
             pd.DataFrame: 讀取的資料
         """
+        # 只有實際下載時才載入 requests
+        import requests
+        
         try:
             # 使用正確的公開 Google Sheet CSV 匯出 URL 格式
             # 對於公開的 Google Sheet，使用這個格式
@@ -46,12 +49,15 @@ class DirectSheetsReader:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+            with span('sheets.download'):
+                response = requests.get(url, headers=headers, timeout=30)
+                response.raise_for_status()
             
             # 讀取 CSV 資料
-            csv_data = StringIO(response.text)
-            df = pd.read_csv(csv_data)
+            with span('sheets.read_csv') as read_span:
+                csv_data = StringIO(response.text)
+                df = pd.read_csv(csv_data)
+                read_span.rows = len(df)
             
             logger.info(f"成功讀取 {len(df)} 筆資料，{len(df.columns)} 個欄位")
             logger.info(f"欄位名稱: {list(df.columns)}")
@@ -91,6 +97,7 @@ class DirectSheetsReader:
             logger.error(f"取得工作表資訊時發生錯誤: {error}")
             return []
     
+    @timed('sheets.read_chicken_sales_data', rows=len)
     def read_chicken_sales_data(self, main_sheet_gid: str = "0", 
                                settings_sheet_gid: str = "1") -> pd.DataFrame:
         """
@@ -112,26 +119,24 @@ class DirectSheetsReader:
                 logger.warning("主要資料工作表為空")
                 return pd.DataFrame()
             
-            # 動態載入最新的價格設定
-            try:
-                # 直接讀取 JSON 檔案以獲取最新價格
-                import json
-                import os
-                price_file = 'chicken_prices.json'
-                if os.path.exists(price_file):
-                    with open(price_file, 'r', encoding='utf-8') as f:
-                        prices = json.load(f)
-                    logger.info("成功載入最新價格設定")
-                    # 轉換為炸雞銷售格式，使用最新價格
-                    chicken_data = self._convert_to_chicken_sales_format_with_prices(main_data, prices)
-                else:
-                    logger.warning("價格設定檔案不存在，使用預設價格")
+            # 使用最新的價格設定（價格檔未變更時不重新讀取）
+            with span('sheets.convert') as convert_span:
+                try:
+                    from persistent_price_config import get_price_snapshot
+                    price_snapshot = get_price_snapshot()
+                    if price_snapshot.source == 'file':
+                        logger.info(f"使用價格設定版本 {price_snapshot.version}")
+                        # 轉換為炸雞銷售格式，使用最新價格
+                        chicken_data = self._convert_to_chicken_sales_format_with_prices(main_data, price_snapshot.prices)
+                    else:
+                        logger.warning("價格設定檔案不存在，使用預設價格")
+                        settings_data = pd.DataFrame()
+                        chicken_data = self._convert_to_chicken_sales_format(main_data, settings_data)
+                except Exception as error:
+                    logger.warning(f"載入價格設定失敗，使用預設價格: {error}")
                     settings_data = pd.DataFrame()
                     chicken_data = self._convert_to_chicken_sales_format(main_data, settings_data)
-            except Exception as error:
-                logger.warning(f"載入價格設定失敗，使用預設價格: {error}")
-                settings_data = pd.DataFrame()
-                chicken_data = self._convert_to_chicken_sales_format(main_data, settings_data)
+                convert_span.rows = len(chicken_data)
             
             logger.info(f"成功轉換 {len(chicken_data)} 筆炸雞銷售資料")
             return chicken_data
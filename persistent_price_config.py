@@ -1,10 +1,25 @@
 """
 持久化價格設定檔
 將價格設定保存到 JSON 檔案中
+
+價格表由 price_registry 讀取一次後保留在記憶體中，只有價格檔的 inode、修改時間或大小
+改變（或呼叫 invalidate）時才重新讀取；每次重新讀取產生不可修改的快照，
+內容改變時版本號遞增，下游快取以版本號判斷價格是否變更
+
+寫入時取得檔案鎖，先寫入暫存檔並 fsync 後改名取代價格檔，讀取端不需取得鎖，
+也不會讀到寫到一半的檔案；每次變更同時附加到價格歷史（chicken_price_history），
+供以過去的價格結算舊的期間
 """
+import hashlib
 import json
 import os
-from typing import Dict
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, NamedTuple, Optional, Tuple
 
 # 價格設定檔案路徑
 PRICE_CONFIG_FILE = 'chicken_prices.json'
@@ -17,6 +32,175 @@ DEFAULT_PRICES = {
     '雞翅': {'cost': 105, 'price': 180}
 }
 
+class _FrozenDict(dict):
+    """不可修改的 dict（仍可直接以 JSON 序列化）"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("價格快照不可修改，請使用 to_dict() 取得複本")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return (_FrozenDict, (dict(self),))
+
+def freeze_prices(prices: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """建立不可修改的價格表"""
+    return _FrozenDict((item, _FrozenDict(price_info)) for item, price_info in prices.items())
+
+class PriceSnapshot(NamedTuple):
+    """價格表快照"""
+    # 版本號（本程序內單調遞增，內容改變時才遞增）
+    version: int
+    # 品項價格對應（不可修改）
+    prices: Dict[str, Dict[str, float]]
+    # 內容摘要（相同內容在不同程序中相同，供跨程序的 ETag 使用）
+    digest: str
+    # 'file' 表示來自價格檔，'default' 表示價格檔不存在而使用預設價格
+    source: str
+    # 讀取時間
+    loaded_at: float
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """取得可修改的價格表複本"""
+        return {item: dict(price_info) for item, price_info in self.prices.items()}
+
+def price_digest(prices: Dict[str, Dict[str, float]]) -> str:
+    """
+    計算價格表內容摘要
+
+    Args:
+        prices (Dict[str, Dict[str, float]]): 品項價格對應
+
+    Returns:
+        str: 內容摘要
+    """
+    data = json.dumps(prices, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def _read_price_file(path: str) -> Dict[str, Dict[str, float]]:
+    """讀取並驗證價格檔（檔案不存在或格式錯誤時拋出錯誤）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        prices = json.load(f)
+    if not isinstance(prices, dict) or not all(
+            isinstance(info, dict) and 'cost' in info and 'price' in info for info in prices.values()):
+        raise ValueError("價格設定格式錯誤")
+    return prices
+
+class PriceRegistry:
+    """價格表登錄類別（讀取端不需取得鎖）"""
+
+    def __init__(self, path: str = None):
+        """
+        初始化價格表登錄
+
+        Args:
+            path (str): 價格檔路徑，None 表示使用 PRICE_CONFIG_FILE
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._file_key = None
+        self._checked_at = 0.0
+        self._version = 0
+        self._stale = True
+
+    @property
+    def file_path(self) -> str:
+        """價格檔路徑"""
+        return self.path or PRICE_CONFIG_FILE
+
+    def _file_key_now(self) -> Optional[Tuple[int, int, int, int]]:
+        """價格檔的裝置、inode、修改時間與大小，檔案不存在時回傳 None"""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+    def snapshot(self, max_age_seconds: float = 0) -> PriceSnapshot:
+        """
+        取得目前的價格表快照（價格檔未變更時不重新讀取）
+
+        Args:
+            max_age_seconds (float): 距離上次檢查價格檔未超過此秒數時直接回傳快照，不檢查檔案
+
+        Returns:
+            PriceSnapshot: 價格表快照
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale:
+            if max_age_seconds > 0 and time.monotonic() - self._checked_at < max_age_seconds:
+                return snapshot
+            key = self._file_key_now()
+            if key == self._file_key:
+                self._checked_at = time.monotonic()
+                return snapshot
+        else:
+            key = self._file_key_now()
+        return self._reload(key)
+
+    @property
+    def version(self) -> int:
+        """目前的價格版本"""
+        return self.snapshot().version
+
+    def invalidate(self):
+        """下次取得快照時重新讀取價格檔（例如由其他方式寫入檔案後）"""
+        self._stale = True
+
+    def _reload(self, key) -> PriceSnapshot:
+        """重新讀取價格檔，內容改變時產生新版本的快照"""
+        with self._lock:
+            current = self._snapshot
+            if current is not None and not self._stale and key == self._file_key:
+                return current
+            self._stale = False
+
+            source = 'file'
+            if key is None:
+                print("📝 價格設定檔案不存在，使用預設價格")
+                prices, source = DEFAULT_PRICES, 'default'
+            else:
+                try:
+                    prices = _read_price_file(self.file_path)
+                except (OSError, ValueError) as error:
+                    # 讀到寫入中的檔案時保留上一份價格表，檔案寫入完成後會再次重新讀取
+                    print(f"❌ 讀取價格設定檔案失敗: {error}")
+                    if current is not None:
+                        prices, source = current.prices, current.source
+                    else:
+                        prices, source = DEFAULT_PRICES, 'default'
+
+            digest = price_digest(prices)
+            if current is not None and current.digest == digest and current.source == source:
+                snapshot = current
+            else:
+                self._version += 1
+                snapshot = PriceSnapshot(self._version, freeze_prices(prices), digest, source, time.time())
+            self._file_key = key
+            self._checked_at = time.monotonic()
+            self._snapshot = snapshot
+            return snapshot
+
+# 共用的價格表登錄
+price_registry = PriceRegistry()
+
+# 同一程序內寫入價格檔的鎖（跨程序另以價格檔旁的 .lock 檔案鎖定）
+_write_lock = threading.Lock()
+
+def get_price_snapshot(max_age_seconds: float = 0) -> PriceSnapshot:
+    """
+    取得目前的價格表快照
+
+    Args:
+        max_age_seconds (float): 距離上次檢查價格檔未超過此秒數時不檢查檔案
+
+    Returns:
+        PriceSnapshot: 價格表快照
+    """
+    return price_registry.snapshot(max_age_seconds)
+
 def load_prices() -> Dict[str, Dict[str, float]]:
     """
     從檔案載入價格設定
@@ -35,30 +219,162 @@ def load_prices() -> Dict[str, Dict[str, float]]:
         print("📝 價格設定檔案不存在，使用預設價格")
         return DEFAULT_PRICES.copy()
 
+class PriceConflictError(ValueError):
+    """價格已被其他請求更新（版本不符）"""
+
+@contextmanager
+def price_file_lock(path: str = None):
+    """
+    取得價格檔的寫入鎖（同一程序內的執行緒與多個工作程序之間互斥；讀取端不需取得）
+
+    Args:
+        path (str): 價格檔路徑，None 表示使用 PRICE_CONFIG_FILE
+    """
+    lock_path = (path or PRICE_CONFIG_FILE) + '.lock'
+    with _write_lock:
+        try:
+            import fcntl
+        except ImportError:
+            # 沒有 fcntl 的平台（Windows）只在程序內互斥
+            yield
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_json_atomic(path: str, data) -> None:
+    """
+    以暫存檔寫入 JSON 檔後改名取代（讀取端只會看到完整的舊檔或新檔）
+
+    Args:
+        path (str): 檔案路徑
+        data: 要寫入的內容
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        # 暫存檔預設只有擁有者可讀寫，沿用原檔案的權限
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    # 改名寫入目錄後才算完成（部分平台不支援開啟目錄）
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
 def save_prices(prices: Dict[str, Dict[str, float]]) -> None:
     """
-    儲存價格設定到檔案
+    儲存價格設定到檔案（取代整份價格表）
     
     Args:
         prices (Dict[str, Dict[str, float]]): 品項價格對應
     """
     try:
-        with open(PRICE_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(prices, f, ensure_ascii=False, indent=2)
+        with price_file_lock(price_registry.file_path):
+            price_registry.invalidate()
+            current = price_registry.snapshot().to_dict()
+            changes = {item: info for item, info in prices.items() if current.get(item) != info}
+            write_json_atomic(price_registry.file_path, prices)
+            if changes:
+                from chicken_price_history import price_history
+                price_history.record(changes, base_prices=current)
         print("✅ 價格設定已儲存")
     except Exception as e:
         print(f"❌ 儲存價格設定失敗: {e}")
+    finally:
+        price_registry.invalidate()
+
+def update_prices(changes: Dict[str, Dict[str, float]], expected_version: str = None,
+                  author: str = None, effective_from=None) -> PriceSnapshot:
+    """
+    一次更新多個品項的價格（只寫入一次價格檔），並附加到價格歷史
+
+    Args:
+        changes (Dict[str, Dict[str, float]]): 品項與新的 cost、price
+        expected_version (str): 呼叫端讀取時的價格版本（PriceSnapshot.digest，各工作程序相同）；
+            與目前版本不同時不更新，None 表示不檢查
+        author (str): 修改者（記錄於價格歷史）
+        effective_from: 生效日期（YYYY-MM-DD），None 表示今天；可補登過去的日期，
+            價格檔只在該品項之後沒有其他變更時更新
+
+    Returns:
+        PriceSnapshot: 更新後的價格表快照
+
+    Raises:
+        PriceConflictError: 價格已被其他請求更新
+        ValueError: 價格格式錯誤
+    """
+    normalized = {}
+    for item_name, price_info in changes.items():
+        try:
+            normalized[item_name] = {'cost': float(price_info['cost']), 'price': float(price_info['price'])}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{item_name} 的價格格式錯誤")
+    if not normalized:
+        raise ValueError("沒有要更新的品項")
+
+    from chicken_price_history import normalize_date, price_history
+    try:
+        effective_from = normalize_date(effective_from)
+    except ValueError:
+        raise ValueError(f"生效日期格式錯誤: {effective_from}")
+    if effective_from > date.today().isoformat():
+        raise ValueError("生效日期不可晚於今天")
+
+    path = price_registry.file_path
+    with price_file_lock(path):
+        # 取得鎖後重新讀取，確認期間沒有其他程序寫入
+        price_registry.invalidate()
+        current = price_registry.snapshot()
+        if expected_version is not None and expected_version != current.digest:
+            raise PriceConflictError("價格已被其他使用者更新，請重新載入後再修改")
+        # 補登過去的價格時，之後已有變更的品項維持目前價格
+        prices = current.to_dict()
+        prices.update({item: info for item, info in normalized.items()
+                       if (price_history.latest_effective_from(item) or '') <= effective_from})
+        write_json_atomic(path, prices)
+        # 價格檔取代成功後才寫入歷史，寫入失敗的變更不會留在只增不改的紀錄中
+        try:
+            price_history.record(normalized, effective_from, author, base_prices=current.to_dict())
+        except OSError as error:
+            print(f"⚠️ 價格已更新，但寫入價格歷史失敗: {error}")
+        price_registry.invalidate()
+        snapshot = price_registry.snapshot()
+    print(f"✅ 價格設定已儲存（{', '.join(normalized)}）")
+    return snapshot
 
 def get_chicken_prices() -> Dict[str, Dict[str, float]]:
     """
     取得炸雞品項價格設定
     
     Returns:
-        Dict[str, Dict[str, float]]: 品項價格對應
+        Dict[str, Dict[str, float]]: 品項價格對應（可修改的複本）
     """
-    return load_prices()
+    return price_registry.snapshot().to_dict()
 
-def update_chicken_prices(item_name: str, cost: float, price: float) -> None:
+def update_chicken_prices(item_name: str, cost: float, price: float,
+                          expected_version: str = None, author: str = None,
+                          effective_from=None) -> PriceSnapshot:
     """
     更新炸雞品項價格
     
@@ -66,10 +382,15 @@ def update_chicken_prices(item_name: str, cost: float, price: float) -> None:
         item_name (str): 品項名稱
         cost (float): 成本
         price (float): 售價
+        expected_version (str): 呼叫端讀取時的價格版本，None 表示不檢查
+        author (str): 修改者
+        effective_from: 生效日期，None 表示今天
+
+    Returns:
+        PriceSnapshot: 更新後的價格表快照
     """
-    prices = load_prices()
-    prices[item_name] = {'cost': cost, 'price': price}
-    save_prices(prices)
+    return update_prices({item_name: {'cost': cost, 'price': price}}, expected_version,
+                         author, effective_from)
 
 def print_current_prices() -> None:
     """顯示目前的價格設定"""
@@ -2,11 +2,11 @@
 真實炸雞 Google Sheets 客戶端
 讀取真實的 Google Sheet 資料並轉換為炸雞銷售格式
 """
+import threading
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
 import logging
-from chicken_sheets_client import ChickenSheetsClient
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +23,22 @@ class RealChickenSheetsClient:
             token_file (str): Token 檔案路徑
         """
         self.sheet_id = sheet_id
-        self.sheets_client = ChickenSheetsClient(credentials_file, token_file, sheet_id)
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self._sheets_client = None
+        self._lock = threading.Lock()
+    
+    @property
+    def sheets_client(self):
+        """
+        Google Sheets API 客戶端（第一次讀取資料時才進行認證並載入價格，
+        建立本物件不需要網路連線）
+        """
+        with self._lock:
+            if self._sheets_client is None:
+                from chicken_sheets_client import ChickenSheetsClient
+                self._sheets_client = ChickenSheetsClient(self.credentials_file, self.token_file, self.sheet_id)
+            return self._sheets_client
     
     def read_chicken_sales_data(self, main_sheet_name: str = '表單回應 1', 
                                settings_sheet_name: str = '設定',
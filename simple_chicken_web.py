@@ -6,284 +6,671 @@ from flask import Flask, render_template, request, jsonify, send_file
 import pandas as pd
 from datetime import datetime, timedelta
 import os
-import json
-import numpy as np
 from chicken_settlement_calculator import ChickenSettlementCalculator
 from chicken_report_generator import ChickenReportGenerator
-from chicken_config import CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG
+from chicken_report_exporters import REPORT_FORMATS
+from chicken_report_orchestrator import ChickenReportOrchestrator, EXECUTOR_THREAD
+from chicken_report_jobs import ChickenReportJobQueue, ChickenReportJobStore, ReportJobQueueFullError, JOB_DONE
+from chicken_config import (
+    CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG, REPORT_CONFIG, REPORT_PROFILES, REPORT_JOB_CONFIG,
+    REPORT_STORE_CONFIG, DATA_SERVICE_CONFIG, RESPONSE_CACHE_CONFIG, DETAIL_API_CONFIG, LIVE_UPDATES_CONFIG
+)
 from direct_sheets_reader import DirectSheetsReader
+from chicken_data_service import ChickenDataService, CircuitBreaker
+from chicken_response_cache import ChickenResponseCache, response_fingerprint
+from chicken_json import FRAME_SHAPES, SHAPE_RECORDS, dumps, serialize_frame, to_native, init_app
+import chicken_compression
+import chicken_admission
+import chicken_timing
+from chicken_timing import span
+from chicken_sales_details import CursorError, fetch_page, stream_ndjson
+from chicken_live_updates import ChickenLiveUpdates, LiveUpdatesBusyError
+from chicken_price_history import price_history
 import logging
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def convert_pandas_types(obj):
-    """轉換 pandas 數據類型為 Python 原生類型，以便 JSON 序列化"""
-    if isinstance(obj, (np.integer, np.int64, np.int32)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64, np.float32)):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, pd.DataFrame):
-        return obj.to_dict('records')
-    elif isinstance(obj, pd.Series):
-        return obj.to_dict()
-    elif isinstance(obj, dict):
-        return {key: convert_pandas_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_pandas_types(item) for item in obj]
-    else:
-        return obj
-
 app = Flask(__name__)
+init_app(app)
+compression = chicken_compression.init_app(app)
+# 成本高的 API 限制請求速率與同時執行數
+admission = chicken_admission.init_app(app)
+# 記錄每個請求與其中各階段的經過時間
+timer = chicken_timing.init_app(app)
 
 # 全域變數
-calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG)
+calculator = ChickenSettlementCalculator(CHICKEN_PRODUCTS_CONFIG, price_history)
 report_generator = ChickenReportGenerator("chicken_reports")
+# 網頁服務以多執行緒處理請求，多格式生成使用執行緒池避免在請求中 fork 程序
+report_orchestrator = ChickenReportOrchestrator(report_generator, executor=EXECUTOR_THREAD)
+# 報告檔案索引；伺服器啟動時同步一次目錄（sync_report_store），之後列表與下載只查索引
+report_store = report_generator.store
 sheets_reader = DirectSheetsReader(GOOGLE_SHEETS_CONFIG['SHEET_ID'])
+# 所有 API 共用的銷售資料與價格快取
+data_service = ChickenDataService(
+    sheets_reader,
+    sales_ttl_seconds=DATA_SERVICE_CONFIG['SALES_TTL_SECONDS'],
+    prices_ttl_seconds=DATA_SERVICE_CONFIG['PRICES_TTL_SECONDS'],
+    refresh_ahead_seconds=DATA_SERVICE_CONFIG['REFRESH_AHEAD_SECONDS'],
+    max_staleness_seconds=DATA_SERVICE_CONFIG['MAX_STALENESS_SECONDS'],
+    slow_fetch_seconds=DATA_SERVICE_CONFIG['SLOW_FETCH_SECONDS'],
+    circuit_breaker=CircuitBreaker(
+        failure_threshold=DATA_SERVICE_CONFIG['CIRCUIT_FAILURE_THRESHOLD'],
+        reset_seconds=DATA_SERVICE_CONFIG['CIRCUIT_RESET_SECONDS']
+    )
+)
+# 已序列化的 API 回應快取（以資料版本與查詢參數為鍵）
+response_cache = (ChickenResponseCache(RESPONSE_CACHE_CONFIG['MAX_ENTRIES'])
+                  if RESPONSE_CACHE_CONFIG['ENABLED'] else None)
+# 銷售資料更新時推送每日合計與應付金額的差異
+live_updates = (ChickenLiveUpdates(
+    data_service, calculator,
+    heartbeat_seconds=LIVE_UPDATES_CONFIG['HEARTBEAT_SECONDS'],
+    retry_ms=LIVE_UPDATES_CONFIG['RETRY_MS'],
+    max_clients=LIVE_UPDATES_CONFIG['MAX_CLIENTS'],
+    max_stream_seconds=LIVE_UPDATES_CONFIG['MAX_STREAM_SECONDS']
+) if LIVE_UPDATES_CONFIG['ENABLED'] else None)
+# 背景報告工作（工作狀態由所有工作程序共用，任一程序都能查詢與下載）
+report_jobs = ChickenReportJobQueue(
+    max_workers=REPORT_JOB_CONFIG['MAX_WORKERS'],
+    max_pending=REPORT_JOB_CONFIG['MAX_PENDING'],
+    max_finished=REPORT_JOB_CONFIG['MAX_FINISHED'],
+    store=(ChickenReportJobStore(os.path.join(report_generator.output_dir, REPORT_STORE_CONFIG['DB_FILE']))
+           if REPORT_JOB_CONFIG['SHARED_STATE'] else None)
+)
+
+def sync_report_store():
+    """
+    將報告目錄中尚未登錄的檔案加入報告索引（由伺服器進入點在啟動時呼叫一次；
+    需要計算每個檔案的雜湊值，匯入本模組時不執行）
+    """
+    if report_store is not None:
+        report_store.sync()
+
+def start_background_refresh():
+    """
+    依設定啟動資料背景更新（由伺服器進入點在開始接受請求時呼叫，
+    匯入本模組時不建立執行緒也不下載資料）
+    """
+    if DATA_SERVICE_CONFIG['BACKGROUND_REFRESH']:
+        data_service.start_refresher()
 
 @app.route('/')
 def index():
     """首頁"""
     return render_template('chicken_index.html')
 
+def request_date_range():
+    """
+    取得查詢的日期參數，以及納入回應指紋的日期範圍
+    （沒有提供日期時預設為最近一週，結果依今天日期而不同）
+    
+    Returns:
+        tuple: (開始日期, 結束日期, 指紋用的日期範圍)
+    """
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if start_date and end_date:
+        return start_date, end_date, (start_date, end_date)
+    return start_date, end_date, ('recent', datetime.now().date().isoformat())
+
+def request_frame_shape():
+    """
+    取得資料表的輸出形式（shape=columns 時以欄位形式回傳，資料量大時較小）
+    
+    Returns:
+        str: 'records' 或 'columns'
+    """
+    shape = request.args.get('shape', SHAPE_RECORDS)
+    if shape not in FRAME_SHAPES:
+        raise ValueError(f"不支援的資料輸出形式: {shape}")
+    return shape
+
+def json_response_entry(fingerprint, build_payload):
+    """
+    取得快取的回應，沒有時產生並序列化（相同指紋的並行請求只產生一次；未啟用快取時每次產生）
+    
+    Args:
+        fingerprint (str): 回應指紋
+        build_payload (callable): 產生回應資料的函式
+    
+    Returns:
+        dict: 回應快取項目
+    """
+    def build_body():
+        payload = build_payload()
+        with span('json.encode'):
+            return dumps(payload)
+    
+    if response_cache is None:
+        return {'body': build_body(), 'etag': fingerprint}
+    return response_cache.get_or_build(fingerprint, build_body)
+
+def cached_json_response(entry, headers=None):
+    """
+    以快取項目回應：用戶端的 If-None-Match 符合 ETag 時回應 304，否則回傳已序列化的內容
+    
+    Args:
+        entry (dict): 回應快取項目
+        headers (dict): 其他回應標頭
+    """
+    # 壓縮後的回應帶弱 ETag，以弱比對判斷；304 回應的內容類型供壓縮處理決定 ETag 強弱
+    if request.if_none_match.contains_weak(entry['etag']):
+        response = app.response_class(status=304, mimetype='application/json')
+    else:
+        response = app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = f"private, max-age={RESPONSE_CACHE_CONFIG['MAX_AGE_SECONDS']}, must-revalidate"
+    response.headers.update(headers or {})
+    return response
+
+def data_freshness_headers():
+    """資料新舊程度標頭（不放入回應內容，快取的回應內容才能保持不變）"""
+    info = data_service.cache_info()
+    return {
+        'X-Data-Age': str(info['sales_age_seconds']),
+        'X-Data-Stale': 'true' if info['stale'] else 'false'
+    }
+
 @app.route('/api/real_data')
 def get_real_data():
-    """取得真實 Google Sheet 資料"""
+    """取得真實 Google Sheet 資料（資料版本與查詢參數都相同時回傳快取的回應）"""
     try:
-        # 取得日期參數
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        # 讀取真實的 Google Sheet 資料，使用最新價格設定
-        import json
-        with open('chicken_prices.json', 'r', encoding='utf-8') as f:
-            prices = json.load(f)
-        
-        # 讀取主要資料
-        main_data = sheets_reader.read_sheet_as_csv('0')
-        
-        # 使用最新價格轉換資料
-        df = sheets_reader._convert_to_chicken_sales_format_with_prices(main_data, prices)
-        
-        if df.empty:
-            return jsonify({
-                'success': False, 
-                'error': '沒有找到炸雞銷售資料，請檢查 Google Sheet 中是否有炸雞品項的銷售記錄'
-            })
-        
-        # 根據日期篩選資料
-        if start_date and end_date:
-            df['日期'] = pd.to_datetime(df['日期'])
-            start_date = pd.to_datetime(start_date)
-            end_date = pd.to_datetime(end_date)
-            df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
-            logger.info(f"根據日期篩選資料: {start_date.date()} 到 {end_date.date()}")
-        else:
-            # 如果沒有提供日期參數，使用預設的最近一週
-            df['日期'] = pd.to_datetime(df['日期'])
-            today = pd.Timestamp.now()
-            one_week_ago = today - pd.Timedelta(days=7)
-            df = df[(df['日期'] >= one_week_ago) & (df['日期'] <= today)]
-            logger.info(f"使用預設日期篩選: {one_week_ago.date()} 到 {today.date()}")
-        
-        # 處理資料
-        processed_df = calculator.process_chicken_sales_data(df)
-        
-        # 計算各種摘要
-        daily_summary = calculator.calculate_daily_chicken_summary(processed_df)
-        product_summary = calculator.calculate_chicken_product_summary(processed_df)
-        settlement_info = calculator.calculate_chicken_settlement(processed_df)
-        
-        # 為每日摘要添加成本資訊
-        if not daily_summary.empty and '成本小計' in processed_df.columns:
-            daily_cost_summary = processed_df.groupby('日期').agg({
-                '成本小計': 'sum'
-            }).reset_index()
-            daily_summary = daily_summary.merge(daily_cost_summary, on='日期', how='left')
-            daily_summary['總成本'] = daily_summary['成本小計'].fillna(0)
-        
-        # 轉換為 JSON 格式，處理 int64 序列化問題
-        daily_summary_dict = daily_summary.astype(str).to_dict('records')
-        product_summary_dict = product_summary.astype(str).to_dict('records')
-        
-        # 處理 settlement_info 中的數值
-        settlement_info_dict = {}
-        for key, value in settlement_info.items():
-            if pd.isna(value):
-                settlement_info_dict[key] = 0
-            else:
-                settlement_info_dict[key] = float(value)
-        
-        # 處理原始資料
-        raw_data_dict = processed_df.head(10).astype(str).to_dict('records')
-        
-        # 生成文字摘要
-        text_summary = calculator.generate_text_settlement_summary(df, start_date, end_date)
-        
-        result = {
-            'success': True,
-            'data': {
-                'daily_summary': daily_summary_dict,
-                'product_summary': product_summary_dict,
-                'settlement_info': settlement_info_dict,
-                'raw_data': raw_data_dict,
-                '文字摘要': text_summary
-            }
-        }
-        
-        return jsonify(result)
+        start_date, end_date, date_range = request_date_range()
+        shape = request_frame_shape()
+        
+        # 讀取真實的 Google Sheet 資料（已使用最新價格轉換，由資料服務快取），
+        # 指紋與計算使用同一份資料，期間有背景更新時也不會錯置
+        df, data_version = data_service.get_sales_view()
+        fingerprint = response_fingerprint('real_data', data_version, shape, *date_range)
+        # 共用資料表不可修改，計算前複製
+        entry = json_response_entry(
+            fingerprint, lambda: build_real_data_payload(df.copy(), start_date, end_date, shape)
+        )
+        return cached_json_response(entry, data_freshness_headers())
         
     except Exception as error:
         logger.error(f"取得真實資料時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
-@app.route('/api/test_data')
-def get_test_data():
-    """取得測試資料（備用）"""
-    try:
-        # 取得日期參數
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        # 建立測試資料（使用當前日期範圍）
-        from datetime import datetime, timedelta
-        today = datetime.now()
-        test_dates = []
-        for i in range(7):  # 最近7天
-            date = today - timedelta(days=i)
-            test_dates.append(date.strftime('%Y-%m-%d'))
-        
-        # 確保所有陣列長度一致
-        items = ['雞排', '雞翅', '雞腿', '雞排', '雞塊', '雞米花', '雞排', '雞柳條', '雞排', '雞翅']
-        quantities = [10, 5, 3, 8, 4, 6, 12, 2, 15, 7]
-        prices = [65, 25, 55, 65, 40, 35, 65, 45, 65, 25]
-        amounts = [650, 125, 165, 520, 160, 210, 780, 90, 975, 175]
-        
-        # 重複資料以匹配日期長度
-        all_dates = test_dates + test_dates[:3]  # 10個日期
-        all_items = items
-        all_quantities = quantities
-        all_prices = prices
-        all_amounts = amounts
-        
-        test_data = {
-            '日期': all_dates,
-            '品項': all_items,
-            '數量': all_quantities,
-            '單價': all_prices,
-            '小計': all_amounts
+def build_real_data_payload(df, start_date, end_date, shape=SHAPE_RECORDS):
+    """
+    計算真實資料 API 的回應內容
+    
+    Returns:
+        dict: 回應資料
+    """
+    if df.empty:
+        return {
+            'success': False, 
+            'error': '沒有找到炸雞銷售資料，請檢查 Google Sheet 中是否有炸雞品項的銷售記錄'
         }
-        
-        df = pd.DataFrame(test_data)
+    
+    # 根據日期篩選資料
+    if start_date and end_date:
         df['日期'] = pd.to_datetime(df['日期'])
-        
-        # 根據日期篩選資料
-        if start_date and end_date:
-            start_date = pd.to_datetime(start_date)
-            end_date = pd.to_datetime(end_date)
-            df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
-            logger.info(f"測試資料根據日期篩選: {start_date.date()} 到 {end_date.date()}")
-        else:
-            # 如果沒有提供日期參數，使用預設的最近一週
-            today = pd.Timestamp.now()
-            one_week_ago = today - pd.Timedelta(days=7)
-            df = df[(df['日期'] >= one_week_ago) & (df['日期'] <= today)]
-            logger.info(f"測試資料使用預設日期篩選: {one_week_ago.date()} 到 {today.date()}")
-        
-        processed_df = calculator.process_chicken_sales_data(df)
-        
-        # 計算各種摘要
-        start_date = datetime(2025, 4, 29)
-        end_date = datetime(2025, 5, 7)
-        
-        daily_summary = calculator.calculate_daily_chicken_summary(processed_df)
-        product_summary = calculator.calculate_chicken_product_summary(processed_df)
-        settlement_info = calculator.calculate_chicken_settlement(processed_df)
-        
-        # 轉換為 JSON 格式，處理 int64 序列化問題
-        daily_summary_dict = daily_summary.astype(str).to_dict('records')
-        product_summary_dict = product_summary.astype(str).to_dict('records')
-        
-        # 處理 settlement_info 中的數值
-        settlement_info_dict = {}
-        for key, value in settlement_info.items():
-            if pd.isna(value):
-                settlement_info_dict[key] = 0
-            else:
-                settlement_info_dict[key] = float(value)
-        
-        # 處理原始資料
-        raw_data_dict = processed_df.head(10).astype(str).to_dict('records')
-        
-        result = {
-            'success': True,
-            'data': {
-                'daily_summary': daily_summary_dict,
-                'product_summary': product_summary_dict,
-                'settlement_info': settlement_info_dict,
-                'raw_data': raw_data_dict
-            }
+        start_date = pd.to_datetime(start_date)
+        end_date = pd.to_datetime(end_date)
+        df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
+        logger.info(f"根據日期篩選資料: {start_date.date()} 到 {end_date.date()}")
+    else:
+        # 如果沒有提供日期參數，使用預設的最近一週
+        df['日期'] = pd.to_datetime(df['日期'])
+        today = pd.Timestamp.now()
+        one_week_ago = today - pd.Timedelta(days=7)
+        df = df[(df['日期'] >= one_week_ago) & (df['日期'] <= today)]
+        logger.info(f"使用預設日期篩選: {one_week_ago.date()} 到 {today.date()}")
+    
+    # 處理資料
+    processed_df = calculator.process_chicken_sales_data(df)
+    
+    # 計算各種摘要
+    daily_summary = calculator.calculate_daily_chicken_summary(processed_df)
+    product_summary = calculator.calculate_chicken_product_summary(processed_df)
+    settlement_info = calculator.calculate_chicken_settlement(processed_df)
+    
+    # 為每日摘要添加成本資訊
+    if not daily_summary.empty and '成本小計' in processed_df.columns:
+        daily_cost_summary = processed_df.groupby('日期').agg({
+            '成本小計': 'sum'
+        }).reset_index()
+        daily_summary = daily_summary.merge(daily_cost_summary, on='日期', how='left')
+        daily_summary['總成本'] = daily_summary['成本小計'].fillna(0)
+    
+    # 逐欄轉換為 JSON 原生型別（數值維持數值、日期為 ISO 字串）
+    with span('real_data.serialize', len(daily_summary) + len(product_summary)):
+        daily_summary_dict = serialize_frame(daily_summary, shape)
+        product_summary_dict = serialize_frame(product_summary, shape)
+        settlement_info_dict = to_native(settlement_info, na_value=0)
+        raw_data_dict = serialize_frame(processed_df.head(10), shape)
+    
+    # 生成文字摘要
+    text_summary = calculator.generate_text_settlement_summary(df, start_date, end_date)
+    
+    result = {
+        'success': True,
+        'data': {
+            'daily_summary': daily_summary_dict,
+            'product_summary': product_summary_dict,
+            'settlement_info': settlement_info_dict,
+            'raw_data': raw_data_dict,
+            '文字摘要': text_summary
         }
+    }
+    
+    return result
+
+@app.route('/api/test_data')
+def get_test_data():
+    """取得測試資料（備用；測試資料依今天日期產生，同一天內相同查詢回傳快取的回應）"""
+    try:
+        start_date, end_date, date_range = request_date_range()
+        shape = request_frame_shape()
         
-        return jsonify(result)
+        fingerprint = response_fingerprint('test_data', datetime.now().date().isoformat(), shape, *date_range)
+        entry = json_response_entry(fingerprint, lambda: build_test_data_payload(start_date, end_date, shape))
+        return cached_json_response(entry)
         
     except Exception as error:
         logger.error(f"取得測試資料時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+def build_test_data_payload(start_date, end_date, shape=SHAPE_RECORDS):
+    """
+    計算測試資料 API 的回應內容
+    
+    Returns:
+        dict: 回應資料
+    """
+    # 建立測試資料（使用當前日期範圍）
+    from datetime import datetime, timedelta
+    today = datetime.now()
+    test_dates = []
+    for i in range(7):  # 最近7天
+        date = today - timedelta(days=i)
+        test_dates.append(date.strftime('%Y-%m-%d'))
+    
+    # 確保所有陣列長度一致
+    items = ['雞排', '雞翅', '雞腿', '雞排', '雞塊', '雞米花', '雞排', '雞柳條', '雞排', '雞翅']
+    quantities = [10, 5, 3, 8, 4, 6, 12, 2, 15, 7]
+    prices = [65, 25, 55, 65, 40, 35, 65, 45, 65, 25]
+    amounts = [650, 125, 165, 520, 160, 210, 780, 90, 975, 175]
+    
+    # 重複資料以匹配日期長度
+    all_dates = test_dates + test_dates[:3]  # 10個日期
+    all_items = items
+    all_quantities = quantities
+    all_prices = prices
+    all_amounts = amounts
+    
+    test_data = {
+        '日期': all_dates,
+        '品項': all_items,
+        '數量': all_quantities,
+        '單價': all_prices,
+        '小計': all_amounts
+    }
+    
+    df = pd.DataFrame(test_data)
+    df['日期'] = pd.to_datetime(df['日期'])
+    
+    # 根據日期篩選資料
+    if start_date and end_date:
+        start_date = pd.to_datetime(start_date)
+        end_date = pd.to_datetime(end_date)
+        df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
+        logger.info(f"測試資料根據日期篩選: {start_date.date()} 到 {end_date.date()}")
+    else:
+        # 如果沒有提供日期參數，使用預設的最近一週
+        today = pd.Timestamp.now()
+        one_week_ago = today - pd.Timedelta(days=7)
+        df = df[(df['日期'] >= one_week_ago) & (df['日期'] <= today)]
+        logger.info(f"測試資料使用預設日期篩選: {one_week_ago.date()} 到 {today.date()}")
+    
+    processed_df = calculator.process_chicken_sales_data(df)
+    
+    # 計算各種摘要
+    start_date = datetime(2025, 4, 29)
+    end_date = datetime(2025, 5, 7)
+    
+    daily_summary = calculator.calculate_daily_chicken_summary(processed_df)
+    product_summary = calculator.calculate_chicken_product_summary(processed_df)
+    settlement_info = calculator.calculate_chicken_settlement(processed_df)
+    
+    # 逐欄轉換為 JSON 原生型別（數值維持數值、日期為 ISO 字串）
+    daily_summary_dict = serialize_frame(daily_summary, shape)
+    product_summary_dict = serialize_frame(product_summary, shape)
+    settlement_info_dict = to_native(settlement_info, na_value=0)
+    raw_data_dict = serialize_frame(processed_df.head(10), shape)
+    
+    result = {
+        'success': True,
+        'data': {
+            'daily_summary': daily_summary_dict,
+            'product_summary': product_summary_dict,
+            'settlement_info': settlement_info_dict,
+            'raw_data': raw_data_dict
+        }
+    }
+    
+    return result
+
+@app.route('/api/sales_details')
+def get_sales_details():
+    """
+    取得銷售明細（依日期排序）
+    
+    查詢參數: start_date、end_date、item（可重複）、limit、cursor（上一頁的 next_cursor）、
+    format=ndjson 時以 NDJSON 串流輸出所有符合條件的明細（可搭配 cursor 與 limit）
+    """
+    try:
+        start_date = request.args.get('start_date') or None
+        end_date = request.args.get('end_date') or None
+        items = request.args.getlist('item') or None
+        cursor = request.args.get('cursor') or None
+        output_format = request.args.get('format', 'json')
+        if output_format not in ('json', 'ndjson'):
+            raise ValueError(f"不支援的輸出格式: {output_format}")
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            raise ValueError("limit 必須大於 0")
+        
+        df, data_version = data_service.get_sales_view()
+        if output_format == 'ndjson':
+            chunks = stream_ndjson(df, data_version, start_date, end_date, items, cursor, limit,
+                                   chunk_rows=DETAIL_API_CONFIG['CHUNK_ROWS'])
+            response = app.response_class(chunks, mimetype='application/x-ndjson')
+            response.headers['X-Data-Version'] = data_version
+            return response
+        
+        limit = min(limit or DETAIL_API_CONFIG['DEFAULT_LIMIT'], DETAIL_API_CONFIG['MAX_LIMIT'])
+        page = fetch_page(df, data_version, start_date, end_date, items, limit, cursor,
+                          chunk_rows=DETAIL_API_CONFIG['CHUNK_ROWS'])
+        return jsonify({'success': True, 'version': data_version, **page})
+        
+    except CursorError as error:
+        return jsonify({'success': False, 'error': str(error)}), 409
+    except ValueError as error:
+        return jsonify({'success': False, 'error': str(error)}), 400
+    except Exception as error:
+        logger.error(f"取得銷售明細時發生錯誤: {error}")
+        return jsonify({'success': False, 'error': str(error)})
+
+def parse_report_request(data):
+    """
+    解析報告請求參數
+    
+    Returns:
+        tuple: (開始日期, 結束日期, 報告格式)
+    """
+    start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+    end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+    report_format = data.get('format', REPORT_CONFIG['FORMAT'])
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"不支援的報告格式: {report_format}")
+    return start_date, end_date, report_format
+
+def parse_extra_formats(data):
+    """
+    解析要一併生成的其他報告格式
+    
+    Returns:
+        list: 報告格式列表
+    """
+    extra_formats = data.get('formats') or []
+    if not isinstance(extra_formats, list):
+        raise ValueError("formats 必須為報告格式列表")
+    for report_format in extra_formats:
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"不支援的報告格式: {report_format}")
+    return extra_formats
+
+def parse_report_profile(data):
+    """
+    解析 Excel 報告設定檔，沒有指定時使用 REPORT_CONFIG['WEB_PROFILE']
+    
+    Returns:
+        str: 報告設定檔名稱
+    """
+    profile = data.get('profile') or REPORT_CONFIG['WEB_PROFILE']
+    if profile not in REPORT_PROFILES:
+        raise ValueError(f"不支援的報告設定檔: {profile}")
+    return profile
+
+def parse_historic_prices(data):
+    """
+    解析是否以銷售當天適用的價格（價格歷史）結算，預設以目前的價格結算
+    
+    Returns:
+        bool: 是否使用過去的價格
+    """
+    value = data.get('historic_prices', False)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def build_report_file(start_date, end_date, report_format, extra_formats=None, profile=None,
+                      historic_prices=False):
+    """
+    讀取資料、計算對帳並生成報告檔案
+    
+    Args:
+        extra_formats (list): 一併同時生成的其他報告格式
+        profile (str): Excel 報告設定檔
+        historic_prices (bool): 是否以銷售當天適用的價格結算
+    
+    Returns:
+        dict: 報告檔案路徑、格式與摘要資料
+    """
+    # 讀取真實資料（資料服務快取）
+    df = data_service.get_sales_data()
+    settlement_report = calculator.generate_chicken_settlement_report(df, start_date, end_date, historic_prices)
+    
+    # 生成報告檔案
+    extra = {'profile': profile}
+    if extra_formats or (profile and REPORT_PROFILES[profile]['DETAIL_ATTACHMENT']):
+        result = report_orchestrator.generate(settlement_report, [report_format] + list(extra_formats or []),
+                                              profile=profile)
+        if report_format not in result['files']:
+            raise RuntimeError(result['errors'][report_format])
+        report_file = result['files'][report_format]
+        extra.update({'files': result['files'], 'timings': result['timings'], 'errors': result['errors']})
+    else:
+        report_file = report_generator.generate_report(settlement_report, report_format, profile=profile)
+    
+    # 轉換所有數據類型以確保 JSON 序列化成功
+    report_data = to_native(settlement_report)
+    
+    return {
+        'excel_file': report_file,
+        'report_file': report_file,
+        'format': report_format,
+        'historic_prices': historic_prices,
+        'cache': data_service.cache_info(),
+        **extra,
+        'report_data': {
+            '期間': report_data['期間'],
+            '總銷售金額': report_data['總銷售金額'],
+            '總銷售數量': report_data['總銷售數量'],
+            '炸雞老闆應付金額': report_data['炸雞老闆應付金額'],
+            '成本比例': report_data['成本比例'],
+            '利潤': report_data['利潤']
+        }
+    }
+
 @app.route('/api/generate_report', methods=['POST'])
 def generate_report():
     """生成對帳報告"""
     try:
-        data = request.json
-        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
-        
-        # 讀取真實資料
-        df = sheets_reader.read_chicken_sales_data()
-        settlement_report = calculator.generate_chicken_settlement_report(df, start_date, end_date)
-        
-        # 生成 Excel 報告
-        excel_file = report_generator.generate_excel_report(settlement_report)
-        
-        # 轉換所有數據類型以確保 JSON 序列化成功
-        report_data = convert_pandas_types(settlement_report)
+        start_date, end_date, report_format = parse_report_request(request.json)
+        extra_formats = parse_extra_formats(request.json)
+        profile = parse_report_profile(request.json)
+        historic_prices = parse_historic_prices(request.json)
+        result = build_report_file(start_date, end_date, report_format, extra_formats, profile, historic_prices)
         
         return jsonify({
             'success': True,
             'message': '炸雞對帳報告生成成功',
-            'excel_file': excel_file,
-            'report_data': {
-                '期間': report_data['期間'],
-                '總銷售金額': report_data['總銷售金額'],
-                '總銷售數量': report_data['總銷售數量'],
-                '炸雞老闆應付金額': report_data['炸雞老闆應付金額'],
-                '成本比例': report_data['成本比例'],
-                '利潤': report_data['利潤']
-            }
+            **result
         })
         
     except Exception as error:
         logger.error(f"生成報告時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+def job_to_dict(job):
+    """將背景工作資訊轉為 API 回應格式"""
+    result = {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error']
+    }
+    if job['status'] == JOB_DONE:
+        result.update(job['result'])
+        result['download_url'] = f"/api/report_jobs/{job['job_id']}/download"
+    return result
+
+@app.route('/api/report_jobs', methods=['POST'])
+def submit_report_job():
+    """提交背景報告工作，立即回傳工作 ID"""
+    try:
+        start_date, end_date, report_format = parse_report_request(request.json)
+        profile = parse_report_profile(request.json)
+        historic_prices = parse_historic_prices(request.json)
+        job_key = f"{start_date.date()}|{end_date.date()}|{report_format}|{profile}|{historic_prices}"
+        job, created = report_jobs.submit(job_key, build_report_file, start_date, end_date, report_format,
+                                          profile=profile, historic_prices=historic_prices)
+        
+        return jsonify({
+            'success': True,
+            'created': created,
+            'status_url': f"/api/report_jobs/{job['job_id']}",
+            **job_to_dict(job)
+        }), 202
+        
+    except ReportJobQueueFullError as error:
+        return jsonify({'success': False, 'error': str(error)}), 503
+    except Exception as error:
+        logger.error(f"提交報告工作時發生錯誤: {error}")
+        return jsonify({'success': False, 'error': str(error)})
+
+@app.route('/api/report_jobs/<job_id>')
+def get_report_job(job_id):
+    """查詢背景報告工作狀態"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '工作不存在'}), 404
+    return jsonify({'success': True, **job_to_dict(job)})
+
+@app.route('/api/report_jobs/<job_id>/download')
+def download_report_job(job_id):
+    """下載背景報告工作生成的檔案"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '工作不存在'}), 404
+    if job['status'] != JOB_DONE:
+        return jsonify({'success': False, 'error': f"報告尚未完成（狀態: {job['status']}）"}), 409
+    
+    return send_report_file(os.path.basename(job['result']['report_file']))
+
+@app.route('/api/live_updates')
+def get_live_updates():
+    """
+    即時更新（Server-Sent Events）
+    
+    查詢參數: start_date、end_date（與 /api/real_data 相同）；
+    連線時送出 snapshot 事件（日期範圍內的每日合計與對帳資訊），之後資料更新時送出 delta 事件
+    （有變動的每日合計、已移除的日期與更新後的對帳資訊），事件 ID 為資料版本
+    """
+    if live_updates is None:
+        return jsonify({'success': False, 'error': '即時更新未啟用'}), 404
+    try:
+        stream = live_updates.open(request.args.get('start_date') or None,
+                                   request.args.get('end_date') or None,
+                                   request.headers.get('Last-Event-ID'))
+    except LiveUpdatesBusyError as error:
+        return jsonify({'success': False, 'error': str(error)}), 503, {'Retry-After': '30'}
+    except ValueError as error:
+        return jsonify({'success': False, 'error': str(error)}), 400
+    except Exception as error:
+        logger.error(f"開啟即時更新時發生錯誤: {error}")
+        return jsonify({'success': False, 'error': str(error)}), 503
+    
+    response = app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 反向代理不緩衝，事件立即送達
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/admission_metrics')
+def get_admission_metrics():
+    """取得請求准入統計（本程序）"""
+    if admission is None:
+        return jsonify({'success': False, 'error': '准入控制未啟用'}), 404
+    return jsonify({'success': True, 'admission': admission.controller.metrics()})
+
+@app.route('/api/timings')
+def get_timings():
+    """
+    取得各處理階段的計時統計（本程序）
+    
+    查詢參數: name（只取得此階段的紀錄）、limit（最近紀錄筆數，預設 50）
+    """
+    if not timer.enabled:
+        return jsonify({'success': False, 'error': '階段計時未啟用'}), 404
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit 必須為整數'}), 400
+    records = timer.records(request.args.get('name') or None, limit)
+    return jsonify({'success': True, 'summary': timer.summary(),
+                    'recent': [record.to_dict() for record in records]})
+
 @app.route('/api/current_prices')
 def get_current_prices():
-    """取得目前價格設定"""
+    """取得目前價格設定（price_version 供更新價格時檢查是否已被其他使用者修改）"""
     try:
-        from persistent_price_config import get_chicken_prices
-        prices = get_chicken_prices()
-        return jsonify({'success': True, 'prices': prices})
+        snapshot = data_service.get_price_snapshot()
+        return jsonify({'success': True, 'prices': snapshot.prices, 'price_version': snapshot.digest,
+                        'cache': data_service.cache_info()})
     except Exception as error:
         logger.error(f"取得目前價格時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+@app.route('/api/price_history')
+def get_price_history():
+    """
+    取得價格歷史
+    
+    查詢參數: as_of（YYYY-MM-DD，回傳該日期適用的價格表）；沒有提供時回傳變更紀錄，
+    可用 item 只取得單一品項
+    """
+    try:
+        as_of = request.args.get('as_of')
+        if as_of:
+            prices = price_history.prices_as_of(as_of)
+            if prices is None:
+                # 尚無歷史紀錄，目前的價格即為所有日期的價格
+                prices = data_service.get_price_snapshot().prices
+            return jsonify({'success': True, 'as_of': as_of, 'prices': prices})
+        return jsonify({'success': True, 'changes': price_history.changes(request.args.get('item') or None)})
+    except ValueError as error:
+        return jsonify({'success': False, 'error': f"日期格式錯誤: {error}"}), 400
+    except Exception as error:
+        logger.error(f"取得價格歷史時發生錯誤: {error}")
+        return jsonify({'success': False, 'error': str(error)})
+
 @app.route('/api/update_price', methods=['POST'])
 def update_price():
-    """更新價格設定"""
+    """
+    更新價格設定（可附上 price_version，價格已被其他使用者修改時回應 409；
+    可附上 author 與 effective_from，記錄於價格歷史）
+    """
     try:
         data = request.json
         item = data['item']
@@ -291,26 +678,118 @@ def update_price():
         price = float(data['price'])
         
         from persistent_price_config import update_chicken_prices
-        update_chicken_prices(item, cost, price)
+        snapshot = update_chicken_prices(item, cost, price, data.get('price_version'),
+                                         data.get('author'), data.get('effective_from') or None)
+        # 下次讀取時以新價格重新轉換銷售資料
+        data_service.invalidate(prices_only=True)
+        
+        return jsonify({'success': True, 'message': f'{item} 價格已更新', 'price_version': snapshot.digest})
+    except Exception as error:
+        return price_update_error(error)
+
+@app.route('/api/update_prices', methods=['POST'])
+def update_prices():
+    """
+    一次更新多個品項的價格（只寫入一次價格檔）
+    
+    POST 內容: {"prices": {品項: {"cost": 成本, "price": 售價}}, "price_version": 讀取時的價格版本（可省略）,
+               "author": 修改者（可省略）, "effective_from": 生效日期 YYYY-MM-DD（可省略，預設今天）}
+    """
+    try:
+        data = request.json
+        changes = data['prices']
+        if not isinstance(changes, dict):
+            raise ValueError("prices 必須為品項與價格的對應")
         
-        return jsonify({'success': True, 'message': f'{item} 價格已更新'})
+        from persistent_price_config import update_prices as update_price_file
+        snapshot = update_price_file(changes, data.get('price_version'), data.get('author'),
+                                     data.get('effective_from') or None)
+        data_service.invalidate(prices_only=True)
+        
+        return jsonify({'success': True, 'message': f"已更新 {len(changes)} 個品項的價格",
+                        'prices': snapshot.prices, 'price_version': snapshot.digest})
     except Exception as error:
-        logger.error(f"更新價格時發生錯誤: {error}")
+        return price_update_error(error)
+
+def price_update_error(error):
+    """
+    價格更新失敗的回應
+    
+    Returns:
+        Response: 價格已被其他使用者修改時為 409
+    """
+    from persistent_price_config import PriceConflictError
+    if isinstance(error, PriceConflictError):
+        snapshot = data_service.get_price_snapshot()
+        return jsonify({'success': False, 'error': str(error), 'prices': snapshot.prices,
+                        'price_version': snapshot.digest}), 409
+    logger.error(f"更新價格時發生錯誤: {error}")
+    return jsonify({'success': False, 'error': str(error)})
+
+def send_stored_report(record):
+    """傳送報告索引中的檔案（已封存的報告自封存檔讀出）"""
+    try:
+        if record['archive'] is None:
+            return send_file(os.path.abspath(report_store.get_path(record)), as_attachment=True)
+        return send_file(report_store.open_report(record), as_attachment=True,
+                         download_name=record['filename'])
+    except FileNotFoundError:
+        # 檔案已在索引之外被刪除
+        report_store.forget(record['filename'])
+        return jsonify({'success': False, 'error': '檔案不存在'}), 404
+
+def send_report_file(filename):
+    """依檔名傳送報告檔案"""
+    if report_store is None:
+        file_path = os.path.join('chicken_reports', filename)
+        if os.path.exists(file_path):
+            return send_file(os.path.abspath(file_path), as_attachment=True)
+        return jsonify({'success': False, 'error': '檔案不存在'}), 404
+    
+    record = report_store.get_by_filename(filename)
+    if record is None:
+        return jsonify({'success': False, 'error': '檔案不存在'}), 404
+    return send_stored_report(record)
+
+@app.route('/api/reports')
+def list_reports():
+    """列出已生成的報告（依建立時間由新到舊）"""
+    try:
+        if report_store is None:
+            return jsonify({'success': False, 'error': '未啟用報告索引'}), 404
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        offset = request.args.get('offset', 0, type=int)
+        reports = report_store.list_reports(limit, offset, request.args.get('format'))
+        for record in reports:
+            record['download_url'] = f"/api/reports/{record['report_id']}/download"
+        return jsonify({'success': True, 'total': report_store.count(), 'reports': reports})
+    except Exception as error:
+        logger.error(f"列出報告時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+@app.route('/api/reports/<report_id>/download')
+def download_report_by_id(report_id):
+    """依報告 ID 下載報告檔案"""
+    if report_store is None:
+        return jsonify({'success': False, 'error': '未啟用報告索引'}), 404
+    record = report_store.get(report_id)
+    if record is None:
+        return jsonify({'success': False, 'error': '報告不存在'}), 404
+    return send_stored_report(record)
+
 @app.route('/api/download_report/<filename>')
 def download_report(filename):
     """下載報告檔案"""
     try:
-        file_path = os.path.join('chicken_reports', filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        else:
-            return jsonify({'success': False, 'error': '檔案不存在'})
+        return send_report_file(filename)
     except Exception as error:
         logger.error(f"下載報告時發生錯誤: {error}")
         return jsonify({'success': False, 'error': str(error)})
 
+# 首頁內容固定，啟動時預先壓縮
+if compression is not None:
+    compression.precompress(app, ['/'])
+
 if __name__ == '__main__':
     # 確保 reports 目錄存在
     if not os.path.exists('chicken_reports'):
@@ -324,4 +803,8 @@ if __name__ == '__main__':
     print("📱 請在瀏覽器中開啟: http://localhost:8082")
     print("⏹️  按 Ctrl+C 停止服務")
     
+    # 除錯模式的自動重新載入由子程序提供服務，監看檔案的主程序不需背景更新
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        sync_report_store()
+        start_background_refresh()
     app.run(debug=True, host='0.0.0.0', port=8082)
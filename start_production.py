@@ -2,12 +2,23 @@
 """
 生產環境啟動腳本
 用於 A2 Hosting 部署
+主程序預先載入模組與銷售資料後 fork 多個工作程序（設定見 PRODUCTION_SERVER_CONFIG）
 """
+import argparse
 import os
 import sys
-from simple_chicken_web import app
+import time
+
+STARTED_AT = time.time()
+
+def main():
+    parser = argparse.ArgumentParser(description='炸雞對帳系統生產環境伺服器')
+    parser.add_argument('--host', help='監聽位址')
+    parser.add_argument('--port', type=int, help='監聽埠號')
+    parser.add_argument('--workers', type=int, help='工作程序數（0 表示依 CPU 數量）')
+    parser.add_argument('--threads', type=int, help='每個工作程序的執行緒數')
+    args = parser.parse_args()
 
-if __name__ == '__main__':
     # 確保必要目錄存在
     if not os.path.exists('chicken_reports'):
         os.makedirs('chicken_reports')
@@ -15,7 +26,10 @@ if __name__ == '__main__':
     if not os.path.exists('templates'):
         os.makedirs('templates')
     
+    from chicken_production_server import prepare, serve
+    
     # 設定生產環境
+    app = prepare(started_at=STARTED_AT)
     app.config['DEBUG'] = False
     app.config['TESTING'] = False
     
@@ -27,4 +41,7 @@ if __name__ == '__main__':
     print("=" * 50)
     
     # 啟動應用程式
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    serve(app, started_at=STARTED_AT, host=args.host, port=args.port, workers=args.workers, threads=args.threads)
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,13 @@
 炸雞對帳系統測試工具
 不需要 Google API 認證的測試工具
 """
+import json
+import threading
+import time
 import pandas as pd
+import pytest
 from datetime import datetime, timedelta
+import persistent_price_config
 from chicken_settlement_calculator import ChickenSettlementCalculator
 from chicken_report_generator import ChickenReportGenerator
 from chicken_config import CHICKEN_PRODUCTS_CONFIG, GOOGLE_SHEETS_CONFIG
@@ -153,6 +158,492 @@ def show_expected_format():
     print(f"• 炸雞品項價格: {CHICKEN_PRODUCTS_CONFIG}")
     print()
 
+def use_temp_price_files(tmp_path, monkeypatch):
+    """價格檔與價格歷史改用暫存目錄（不影響專案目錄中的檔案）"""
+    from chicken_price_history import ChickenPriceHistory
+    import chicken_price_history
+    monkeypatch.chdir(tmp_path)
+    registry = persistent_price_config.PriceRegistry(str(tmp_path / 'chicken_prices.json'))
+    history = ChickenPriceHistory(str(tmp_path / 'chicken_price_history.jsonl'))
+    monkeypatch.setattr(persistent_price_config, 'price_registry', registry)
+    monkeypatch.setattr(chicken_price_history, 'price_history', history)
+    return registry, history
+
+def test_stale_price_version_conflict(tmp_path, monkeypatch):
+    """以舊的價格版本更新時拒絕，價格檔維持另一個請求寫入的內容"""
+    registry, _ = use_temp_price_files(tmp_path, monkeypatch)
+    stale_version = registry.snapshot().digest
+    persistent_price_config.update_prices({'雞排': {'cost': 85, 'price': 175}}, stale_version)
+
+    with pytest.raises(persistent_price_config.PriceConflictError):
+        persistent_price_config.update_prices({'雞排': {'cost': 90, 'price': 180}}, stale_version)
+    assert registry.snapshot().prices['雞排'] == {'cost': 85, 'price': 175}
+
+def test_update_price_api_conflict(tmp_path, monkeypatch):
+    """/api/update_price 與 /api/update_prices 收到舊的 price_version 時回應 409 與目前的價格"""
+    registry, _ = use_temp_price_files(tmp_path, monkeypatch)
+    import simple_chicken_web
+    client = simple_chicken_web.app.test_client()
+    stale_version = registry.snapshot().digest
+
+    response = client.post('/api/update_price', json={'item': '雞排', 'cost': 85, 'price': 175,
+                                                      'price_version': stale_version})
+    assert response.status_code == 200
+    current_version = response.get_json()['price_version']
+
+    response = client.post('/api/update_price', json={'item': '雞排', 'cost': 90, 'price': 180,
+                                                      'price_version': stale_version})
+    assert response.status_code == 409
+    assert response.get_json()['price_version'] == current_version
+    response = client.post('/api/update_prices', json={'prices': {'地瓜': {'cost': 40, 'price': 80}},
+                                                       'price_version': stale_version})
+    assert response.status_code == 409
+    assert response.get_json()['prices']['雞排'] == {'cost': 85, 'price': 175}
+
+def test_batch_update_writes_once(tmp_path, monkeypatch):
+    """一次更新多個品項只寫入一次價格檔"""
+    registry, _ = use_temp_price_files(tmp_path, monkeypatch)
+    writes = []
+    write_json_atomic = persistent_price_config.write_json_atomic
+
+    def counting_write(path, data):
+        writes.append(path)
+        write_json_atomic(path, data)
+
+    monkeypatch.setattr(persistent_price_config, 'write_json_atomic', counting_write)
+    snapshot = persistent_price_config.update_prices({
+        '雞排': {'cost': 85, 'price': 175},
+        '地瓜': {'cost': 40, 'price': 80},
+        '雞翅': {'cost': 110, 'price': 190}
+    })
+    assert writes == [registry.file_path]
+    assert snapshot.prices['地瓜'] == {'cost': 40, 'price': 80}
+
+def test_reader_never_sees_partial_price_file(tmp_path, monkeypatch):
+    """寫入價格檔期間，讀取端只會讀到完整的舊檔或新檔"""
+    registry, _ = use_temp_price_files(tmp_path, monkeypatch)
+    persistent_price_config.update_prices({'雞排': {'cost': 80, 'price': 170}})
+    done = threading.Event()
+
+    def writer():
+        try:
+            for cost in range(50):
+                persistent_price_config.update_prices({'雞排': {'cost': cost, 'price': 170}})
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    reads = 0
+    while not done.is_set() or reads == 0:
+        with open(registry.file_path, 'r', encoding='utf-8') as f:
+            prices = json.load(f)
+        assert set(prices) == set(persistent_price_config.DEFAULT_PRICES)
+        assert registry.snapshot().source == 'file'
+        reads += 1
+    thread.join()
+    assert registry.snapshot().prices['雞排']['cost'] == 49
+
+def test_prices_as_of_backdated_change(tmp_path, monkeypatch):
+    """補登過去的價格後，生效日前一天仍為舊價格，生效日起到下一次變更前為補登的價格"""
+    registry, history = use_temp_price_files(tmp_path, monkeypatch)
+    persistent_price_config.update_prices({'雞排': {'cost': 90, 'price': 180}}, effective_from='2025-05-10')
+    persistent_price_config.update_prices({'雞排': {'cost': 85, 'price': 175}}, effective_from='2025-05-01')
+
+    assert history.prices_as_of('2025-04-30')['雞排'] == {'cost': 80, 'price': 170}
+    assert history.prices_as_of('2025-05-01')['雞排'] == {'cost': 85.0, 'price': 175.0}
+    assert history.prices_as_of('2025-05-09')['雞排'] == {'cost': 85.0, 'price': 175.0}
+    assert history.prices_as_of('2025-05-10')['雞排'] == {'cost': 90.0, 'price': 180.0}
+    # 之後已有變更，補登不會改動目前的價格
+    assert registry.snapshot().prices['雞排'] == {'cost': 90.0, 'price': 180.0}
+
+def test_report_cache_shared_between_processes(tmp_path):
+    """兩個工作程序共用快取目錄：各自登錄的報告都保留在索引中，命中時不改寫索引檔"""
+    from chicken_report_cache import ChickenReportCache
+    first, second = ChickenReportCache(str(tmp_path)), ChickenReportCache(str(tmp_path))
+    for index in range(5):
+        for name, cache in (('first', first), ('second', second)):
+            path = tmp_path / f'{name}_{index}.txt'
+            path.write_text('report')
+            cache.store(f'{name}-{index}', str(path))
+
+    assert first.lookup('second-4') == str(tmp_path / 'second_4.txt')
+    assert second.lookup('first-0') == str(tmp_path / 'first_0.txt')
+    index_file = tmp_path / '.report_cache_index.json'
+    assert len(json.loads(index_file.read_text(encoding='utf-8'))) == 10
+    modified = index_file.stat().st_mtime_ns
+    assert first.lookup('first-1') is not None
+    assert index_file.stat().st_mtime_ns == modified
+
+    # 索引檔損壞或無法讀取時視為未命中
+    index_file.write_text('{broken', encoding='utf-8')
+    assert ChickenReportCache(str(tmp_path)).lookup('first-1') is None
+
+def test_report_jobs_shared_between_workers(tmp_path):
+    """兩個工作程序的佇列共用工作狀態：任一程序都能查詢工作，相同的工作不重複執行"""
+    from chicken_report_jobs import ChickenReportJobQueue, ChickenReportJobStore, JOB_DONE, JOB_RUNNING
+    db_path = str(tmp_path / '.report_store.sqlite3')
+    first = ChickenReportJobQueue(max_workers=1, store=ChickenReportJobStore(db_path))
+    second = ChickenReportJobQueue(max_workers=1, store=ChickenReportJobStore(db_path))
+    release = threading.Event()
+    try:
+        job, created = first.submit('2025-05-01|2025-05-07|excel', lambda: release.wait(5) and {'report_file': 'a.xlsx'})
+        assert created
+        duplicate, created = second.submit('2025-05-01|2025-05-07|excel', lambda: {'report_file': 'b.xlsx'})
+        assert not created and duplicate['job_id'] == job['job_id']
+        assert second.get(job['job_id'])['status'] in (JOB_RUNNING, 'queued')
+
+        release.set()
+        first.shutdown()
+        polled = second.get(job['job_id'])
+        assert polled['status'] == JOB_DONE
+        assert polled['result'] == {'report_file': 'a.xlsx'}
+    finally:
+        release.set()
+        first.shutdown()
+        second.shutdown()
+
+def test_report_store_compact_round_trip(tmp_path):
+    """封存後報告自 zip 讀出原內容，原檔案已刪除；同檔名重新生成後讀到新內容，舊紀錄仍可自封存檔讀出"""
+    from chicken_report_store import ChickenReportStore
+    store = ChickenReportStore(str(tmp_path), retention_days=0)
+    report = tmp_path / '炸雞對帳報告_20250501.txt'
+    report.write_bytes('第一版'.encode('utf-8'))
+    record = store.register(str(report), '2025-05-01 至 2025-05-07', 'text')
+
+    assert store.compact() == 1
+    assert not report.exists()
+    archived = store.get(record['report_id'])
+    assert archived['archive'] is not None
+    with store.open_report(archived) as f:
+        assert f.read() == '第一版'.encode('utf-8')
+
+    report.write_bytes('第二版'.encode('utf-8'))
+    renewed = store.register(str(report), '2025-05-01 至 2025-05-07', 'text')
+    assert store.get_by_filename(report.name)['report_id'] == renewed['report_id']
+    with store.open_report(store.get(renewed['report_id'])) as f:
+        assert f.read() == '第二版'.encode('utf-8')
+    with store.open_report(archived) as f:
+        assert f.read() == '第一版'.encode('utf-8')
+
+def test_report_store_compact_if_due_once_per_interval(tmp_path):
+    """compact_if_due 在間隔內只封存一次"""
+    from chicken_report_store import ChickenReportStore
+    store = ChickenReportStore(str(tmp_path), retention_days=0, compact_interval_seconds=3600)
+    for name in ('a.txt', 'b.txt'):
+        (tmp_path / name).write_text(name)
+        store.register(str(tmp_path / name))
+    assert store.compact_if_due() == 2
+
+    (tmp_path / 'c.txt').write_text('c')
+    store.register(str(tmp_path / 'c.txt'))
+    assert store.compact_if_due() == 0
+    assert (tmp_path / 'c.txt').exists()
+
+    store.compact_interval_seconds = 0
+    assert store.compact_if_due() == 1
+    assert not (tmp_path / 'c.txt').exists()
+
+def create_admission_app(max_concurrent=1, max_queue=1, queue_timeout_seconds=0.05):
+    """建立只有一個受限制 API 的 Flask 應用程式（時鐘固定，令牌不會自行補充）"""
+    from flask import Flask
+    from chicken_admission import ChickenAdmission, ChickenAdmissionController
+    app = Flask(__name__)
+    controller = ChickenAdmissionController(
+        {'/api/heavy': {'CLIENT_RATE': 1, 'CLIENT_BURST': 2, 'RATE': 10, 'BURST': 10, 'HEAVY': True}},
+        max_concurrent=max_concurrent, max_queue=max_queue, queue_timeout_seconds=queue_timeout_seconds,
+        clock=lambda: 1000.0
+    )
+    ChickenAdmission(controller, app)
+    request_should_fail = threading.Event()
+
+    @app.route('/api/heavy')
+    def heavy():
+        if request_should_fail.is_set():
+            raise RuntimeError('計算失敗')
+        return {'success': True}
+
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    return app, controller, request_should_fail
+
+def test_admission_rate_limit_retry_after():
+    """超過用戶端速率時回應 429 與 Retry-After"""
+    app, _, _ = create_admission_app()
+    client = app.test_client()
+    assert client.get('/api/heavy').status_code == 200
+    assert client.get('/api/heavy').status_code == 200
+    response = client.get('/api/heavy')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['reason'] == 'client_rate'
+
+def test_admission_queue_full_and_timeout():
+    """執行名額已滿時：排隊已滿回應 503，排隊逾時回應 503（時鐘固定也不會一直等待）"""
+    app, controller, _ = create_admission_app(max_queue=0)
+    controller.acquire('/api/heavy')
+    response = app.test_client().get('/api/heavy')
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'queue_full'
+    assert 'Retry-After' in response.headers
+
+    app, controller, _ = create_admission_app(max_queue=1, queue_timeout_seconds=0.05)
+    controller.acquire('/api/heavy')
+    response = app.test_client().get('/api/heavy')
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'queue_timeout'
+    assert controller.metrics()['queued'] == 0
+
+def test_admission_releases_slot_on_teardown():
+    """請求結束（包含處理時發生錯誤）後釋放執行名額"""
+    app, controller, request_should_fail = create_admission_app()
+    client = app.test_client()
+    assert client.get('/api/heavy').status_code == 200
+    assert controller.metrics()['in_flight'] == 0
+    request_should_fail.set()
+    assert client.get('/api/heavy').status_code == 500
+    assert controller.metrics()['in_flight'] == 0
+
+def test_exporters_write_missing_values_as_empty(tmp_path):
+    """缺值在 CSV 寫為空白欄位、在 NDJSON 寫為 null；逐段轉換的資料列與整個資料表相同"""
+    from chicken_report_exporters import ChickenReportModel, CsvReportExporter, NdjsonReportExporter
+    detail = pd.DataFrame({
+        '日期': pd.to_datetime(['2025-05-01', None, '2025-05-02']),
+        '品項': ['雞排', '地瓜', None],
+        '數量': [1, 2, 3],
+        '單價': [170.0, float('nan'), 75.0]
+    })
+    model = ChickenReportModel({'期間': '2025-05-01 至 2025-05-02', '成本比例': float('nan'), '詳細資料': detail})
+
+    csv_path = CsvReportExporter().export(model, str(tmp_path / 'report.csv'))
+    text = (tmp_path / 'report.csv').read_text(encoding='utf-8-sig')
+    assert 'nan' not in text.lower()
+    assert ',地瓜,2,' in text and '成本比例,' in text
+
+    NdjsonReportExporter().export(model, str(tmp_path / 'report.ndjson'))
+    lines = [json.loads(line) for line in (tmp_path / 'report.ndjson').read_text(encoding='utf-8').splitlines()]
+    assert lines[0]['成本比例'] is None
+    assert lines[2] == {'section': 'detail', '日期': None, '品項': '地瓜', '數量': 2, '單價': None}
+
+    _, rows = model.iter_rows(detail, chunk_rows=2)
+    _, all_rows = model.iter_rows(detail)
+    assert list(rows) == list(all_rows)
+    assert csv_path.endswith('report.csv')
+
+def read_workbook_layout(filepath):
+    """讀取工作簿的工作表名稱、儲存格值、字型、填色、合併儲存格與圖表數量（比較兩種生成方式用）"""
+    import zipfile
+    from openpyxl import load_workbook
+    wb = load_workbook(filepath)
+    sheets = {}
+    for ws in wb.worksheets:
+        cells = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is None:
+                    continue
+                cells[cell.coordinate] = (
+                    cell.value, cell.font.name, cell.font.size, cell.font.bold,
+                    cell.font.color.rgb if cell.font.color is not None else None,
+                    cell.fill.fill_type, cell.fill.fgColor.rgb
+                )
+        sheets[ws.title] = (cells, sorted(str(merged) for merged in ws.merged_cells.ranges))
+    with zipfile.ZipFile(filepath) as archive:
+        charts = len([name for name in archive.namelist() if name.startswith('xl/charts/chart')])
+    return wb.sheetnames, sheets, charts
+
+def test_excel_template_matches_openpyxl(tmp_path):
+    """各設定檔以樣板與 openpyxl 生成的報告內容與格式相同（含 XML 不允許的控制字元）"""
+    from chicken_benchmark import create_benchmark_report
+    from chicken_config import REPORT_PROFILES
+    from chicken_report_generator import resolve_report_profile
+    report = create_benchmark_report(7)
+    for key in ('品項摘要', '詳細資料'):
+        report[key] = report[key].copy()
+        report[key].loc[report[key].index[0], '品項'] = '雞排\x01<特價>\x0b'
+
+    template_generator = ChickenReportGenerator(str(tmp_path), use_cache=False, use_template=True, use_store=False)
+    openpyxl_generator = ChickenReportGenerator(str(tmp_path), use_cache=False, use_template=False, use_store=False)
+    for profile in REPORT_PROFILES:
+        options = resolve_report_profile(profile)
+        template_path = str(tmp_path / f'template_{profile}.xlsx')
+        openpyxl_path = str(tmp_path / f'openpyxl_{profile}.xlsx')
+        template_generator.write_excel_file(report, template_path, options)
+        openpyxl_generator.write_excel_file(report, openpyxl_path, options)
+
+        expected = read_workbook_layout(openpyxl_path)
+        assert read_workbook_layout(template_path) == expected, profile
+        assert expected[2] == (2 if options['INCLUDE_CHARTS'] else 0)
+        if options['INCLUDE_DETAILS']:
+            assert expected[1]['詳細資料'][0]['B4'][0] == '雞排<特價>'
+
+def create_sheet_data_service(tmp_path, delay=0.0, days=5, **kwargs):
+    """以模擬的 Google Sheet 讀取器建立資料服務（計算下載次數，可設定延遲與失敗）"""
+    from direct_sheets_reader import DirectSheetsReader
+    from chicken_data_service import ChickenDataService
+
+    class FakeSheetsReader(DirectSheetsReader):
+        def __init__(self):
+            super().__init__('test-sheet')
+            self.calls = 0
+            self.fail = False
+            self._calls_lock = threading.Lock()
+
+        def read_sheet_as_csv(self, sheet_name=None, gid='0'):
+            with self._calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            if self.fail:
+                raise ConnectionError('Google Sheet 無法連線')
+            today = datetime.now()
+            return pd.DataFrame([
+                {'日期': (today - timedelta(days=i)).strftime('%Y/%m/%d'),
+                 '炸物的訂購 [雞排]': f'{i % 3 + 1}份', '炸物的訂購 [地瓜]': '2'}
+                for i in range(days)
+            ])
+
+    reader = FakeSheetsReader()
+    registry = persistent_price_config.PriceRegistry(str(tmp_path / 'chicken_prices.json'))
+    return reader, ChickenDataService(reader, price_registry=registry, **kwargs)
+
+def test_data_service_concurrent_callers_share_fetch(tmp_path):
+    """快取過期時並行的執行緒與 asyncio 呼叫端只觸發一次下載"""
+    import asyncio
+    reader, service = create_sheet_data_service(tmp_path, delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(len(service.get_sales_data()))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert reader.calls == 1
+    assert len(results) == 8 and len(set(results)) == 1
+
+    reader, service = create_sheet_data_service(tmp_path, delay=0.2)
+
+    async def fetch_all():
+        return await asyncio.gather(*(service.get_sales_data_async() for _ in range(8)))
+
+    frames = asyncio.run(fetch_all())
+    assert reader.calls == 1
+    assert all(frame.equals(frames[0]) for frame in frames)
+
+def test_data_service_serves_stale_until_max_staleness(tmp_path):
+    """斷路器開啟時回應最後一份成功的資料，超過最長使用時間後引發錯誤"""
+    from chicken_data_service import CircuitBreaker, DataUnavailableError, CIRCUIT_OPEN
+    reader, service = create_sheet_data_service(
+        tmp_path, sales_ttl_seconds=0.05, max_staleness_seconds=0.5,
+        circuit_breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+    good = service.get_sales_data()
+    assert reader.calls == 1
+
+    reader.fail = True
+    time.sleep(0.1)
+    assert service.get_sales_data().equals(good)
+    assert reader.calls == 2
+    assert service.circuit_breaker.state == CIRCUIT_OPEN
+    # 斷路器開啟期間不再下載
+    assert service.get_sales_data().equals(good)
+    assert reader.calls == 2
+
+    time.sleep(0.5)
+    with pytest.raises(DataUnavailableError):
+        service.get_sales_data()
+    assert reader.calls == 2
+
+def call_asgi(app, path, headers=None):
+    """以單一 HTTP 請求呼叫 ASGI 應用程式，回傳 (狀態碼, 標頭, 內容)"""
+    import asyncio
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'http_version': '1.1',
+             'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+             'headers': [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                         for key, value in (headers or {}).items()]}
+    response = {'headers': {}, 'body': b''}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {key.decode('latin-1'): value.decode('latin-1')
+                                   for key, value in message['headers']}
+        else:
+            response['body'] += message.get('body', b'')
+
+    asyncio.run(app(scope, receive, send))
+    return response['status'], response['headers'], response['body']
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def test_cached_json_response_etag(encoding):
+    """快取的回應帶 ETag 與 Cache-Control，If-None-Match 符合時回應 304 並帶與 200 回應相同的 ETag"""
+    import simple_chicken_web
+    from chicken_asgi import app as asgi_app
+    from chicken_config import RESPONSE_CACHE_CONFIG
+    client = simple_chicken_web.app.test_client()
+    path = '/api/test_data'
+    cache_control = f"private, max-age={RESPONSE_CACHE_CONFIG['MAX_AGE_SECONDS']}, must-revalidate"
+    compressed = encoding == 'gzip' and simple_chicken_web.compression is not None
+
+    response = client.get(path, headers={'Accept-Encoding': encoding})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/') == compressed
+    assert response.headers['Cache-Control'] == cache_control
+
+    for validator in (etag, etag.replace('W/', '')):
+        revalidated = client.get(path, headers={'Accept-Encoding': encoding, 'If-None-Match': validator})
+        assert revalidated.status_code == 304
+        assert revalidated.get_data() == b''
+        assert revalidated.headers['ETag'] == etag
+        assert revalidated.headers['Cache-Control'] == cache_control
+
+    # ASGI 入口與 Flask 回應相同的 ETag
+    status, headers, _ = call_asgi(asgi_app, path, {'Accept-Encoding': encoding})
+    assert status == 200 and headers['etag'] == etag
+    status, headers, body = call_asgi(asgi_app, path, {'Accept-Encoding': encoding, 'If-None-Match': etag})
+    assert status == 304 and body == b''
+    assert headers['etag'] == etag and headers['cache-control'] == cache_control
+
+def test_sales_details_pages_match_stream(tmp_path, monkeypatch):
+    """不同的 limit 與 chunk_rows 分頁後合計恰為篩選後的明細，且與 NDJSON 串流相同"""
+    from chicken_json import dumps, frame_to_records
+    from chicken_sales_details import encode_cursor, fetch_page, stream_ndjson
+    _, service = create_sheet_data_service(tmp_path, days=40)
+    df, version = service.get_sales_view()
+    start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    end_date = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
+    mask = (df['日期'] >= pd.Timestamp(start_date)) & (df['日期'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)) \
+        & (df['品項'] == '雞排')
+    expected = json.loads(dumps(frame_to_records(df[mask])))
+    assert len(expected) == 28
+
+    for limit, chunk_rows in ((1, 1), (3, 2), (5, 7), (28, 4), (100, 500)):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page = fetch_page(df, version, start_date, end_date, ['雞排'], limit, cursor, chunk_rows=chunk_rows)
+            assert page['count'] == len(page['rows']) <= limit
+            rows.extend(page['rows'])
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert json.loads(dumps(rows)) == expected
+        assert pages == max(1, -(-len(expected) // limit))
+
+        streamed = b''.join(stream_ndjson(df, version, start_date, end_date, ['雞排'], chunk_rows=chunk_rows))
+        assert [json.loads(line) for line in streamed.splitlines()] == expected
+
+    import simple_chicken_web
+    monkeypatch.setattr(simple_chicken_web, 'data_service', service)
+    client = simple_chicken_web.app.test_client()
+    response = client.get('/api/sales_details', query_string={'limit': 5, 'cursor': encode_cursor('舊版本', 5)})
+    assert response.status_code == 409
+    assert response.get_json()['success'] is False
+    response = client.get('/api/sales_details', query_string={'start_date': '2025-13-45'})
+    assert response.status_code == 400
+    response = client.get('/api/sales_details', query_string={'limit': 5, 'item': '雞排'})
+    assert response.status_code == 200 and response.get_json()['count'] == 5
+
 def main():
     """主函數"""
     print("🧪 炸雞對帳系統測試工具")
@@ -0,0 +1,120 @@
+"""
+炸雞對帳系統匯入時間測試
+每個進入點在新的 Python 程序中匯入，檢查冷啟動時間沒有超過預算，
+且沒有提前載入 pandas、openpyxl、Google API 等用不到的大型套件，也沒有在匯入時啟動背景執行緒
+
+可直接執行（顯示各進入點的匯入時間），也可以用 pytest 執行；
+在較慢的機器上可設定環境變數 CHICKEN_IMPORT_BUDGET_SCALE 放寬時間預算（例如 2 表示兩倍）
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 進入點: (模組所在目錄, 模組名稱, 時間預算（秒）, 匯入後不應載入的套件)
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'googleapiclient', 'google_auth_oauthlib', 'requests']
+ENTRY_POINTS = {
+    'CGI 轉交程序': (PROJECT_DIR, 'chicken_cgi_daemon', 0.15, HEAVY_MODULES + ['flask']),
+    'Vercel api/index.py': (os.path.join(PROJECT_DIR, 'api'), 'index', 0.5, HEAVY_MODULES),
+    'Vercel api/simple.py': (os.path.join(PROJECT_DIR, 'api'), 'simple', 0.5, HEAVY_MODULES),
+    'app.py': (PROJECT_DIR, 'app', 0.5, HEAVY_MODULES),
+    'chicken_web_interface.py': (PROJECT_DIR, 'chicken_web_interface', 0.5, HEAVY_MODULES),
+    '報告生成器': (PROJECT_DIR, 'chicken_report_generator', 1.5,
+              ['openpyxl', 'googleapiclient', 'google_auth_oauthlib', 'requests']),
+    # 網頁應用程式需要 pandas 轉換資料，只檢查 Excel 與 Google API 套件延後載入；
+    # wsgi.py 在匯入時預先載入模組並讀取銷售資料（供預先 fork 的伺服器使用），不列入檢查
+    'simple_chicken_web.py': (PROJECT_DIR, 'simple_chicken_web', 2.0,
+                              ['openpyxl', 'googleapiclient', 'google_auth_oauthlib', 'requests']),
+}
+
+# 取最佳值的重複次數（減少機器負載造成的誤差）
+REPEAT = 3
+
+_PROBE = """
+import importlib, json, sys, threading, time
+sys.path.insert(0, {path!r})
+sys.path.insert(1, {project!r})
+started = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+threads = [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules), 'threads': threads}}))
+"""
+
+def measure_import(path, module):
+    """
+    在新的 Python 程序中匯入模組
+
+    Args:
+        path (str): 模組所在目錄
+        module (str): 模組名稱
+
+    Returns:
+        tuple: (最短匯入秒數, 匯入後已載入的模組名稱集合, 匯入時啟動的執行緒名稱)
+    """
+    best = None
+    loaded = set()
+    threads = []
+    code = _PROBE.format(path=path, project=PROJECT_DIR, module=module)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(REPEAT):
+            result = subprocess.run([sys.executable, '-c', code], cwd=work_dir,
+                                    capture_output=True, text=True, timeout=120)
+            if result.returncode != 0:
+                raise RuntimeError(f"匯入 {module} 失敗:\n{result.stderr}")
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+            best = data['seconds'] if best is None else min(best, data['seconds'])
+            loaded = {name.split('.')[0] for name in data['modules']}
+            threads = data['threads']
+    return best, loaded, threads
+
+def budget_scale():
+    """時間預算倍率"""
+    return float(os.environ.get('CHICKEN_IMPORT_BUDGET_SCALE', '1'))
+
+def check_entry_point(name):
+    """
+    檢查單一進入點
+
+    Returns:
+        tuple: (匯入秒數, 時間預算, 不應載入卻已載入的套件, 匯入時啟動的執行緒)
+    """
+    path, module, budget, forbidden = ENTRY_POINTS[name]
+    seconds, loaded, threads = measure_import(path, module)
+    return seconds, budget * budget_scale(), sorted(set(forbidden) & loaded), threads
+
+@pytest.mark.parametrize('name', list(ENTRY_POINTS))
+def test_entry_point_import(name):
+    """進入點的匯入時間不超過預算，且沒有提前載入用不到的大型套件、沒有在匯入時啟動執行緒"""
+    seconds, budget, heavy, threads = check_entry_point(name)
+    assert not heavy, f"{name} 提前載入: {heavy}"
+    assert not threads, f"{name} 匯入時啟動執行緒: {threads}"
+    assert seconds <= budget, f"{name} 匯入 {seconds:.3f} 秒，超過預算 {budget:.3f} 秒"
+
+def main():
+    """主函數"""
+    print("⏱️  炸雞對帳系統匯入時間測試")
+    print("=" * 72)
+    print(f"{'進入點':<28}{'匯入時間 (s)':>14}{'預算 (s)':>12}  結果")
+    failed = 0
+    for name in ENTRY_POINTS:
+        seconds, budget, heavy, threads = check_entry_point(name)
+        ok = not heavy and not threads and seconds <= budget
+        failed += not ok
+        if heavy:
+            note = '❌ 提前載入 ' + ', '.join(heavy)
+        elif threads:
+            note = '❌ 啟動執行緒 ' + ', '.join(threads)
+        else:
+            note = '✅' if ok else '❌ 超過預算'
+        print(f"{name:<28}{seconds:>14.3f}{budget:>12.3f}  {note}")
+    print()
+    print("✅ 全部通過" if not failed else f"❌ {failed} 個進入點未通過")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,13 @@
 """
 WSGI 應用程式入口點
 用於 A2 Hosting 部署
+匯入時預先載入模組並讀取銷售資料（可搭配 gunicorn --preload 等預先 fork 的伺服器）
 """
 import sys
 import os
+import time
+
+STARTED_AT = time.time()
 
 # 添加專案目錄到 Python 路徑
 project_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,11 +19,12 @@ if project_dir not in sys.path:
 os.environ.setdefault('FLASK_APP', 'simple_chicken_web.py')
 os.environ.setdefault('FLASK_ENV', 'production')
 
-# 導入應用程式
-from simple_chicken_web import app
+# 導入應用程式（預先載入模組並讀取銷售資料）
+from chicken_production_server import prepare, serve
+app = prepare(started_at=STARTED_AT)
 
 # WSGI 應用程式物件
 application = app
 
 if __name__ == "__main__":
-    application.run()
+    serve(application, started_at=STARTED_AT)